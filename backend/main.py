@@ -4,20 +4,43 @@ import io
 import re
 import unicodedata
 import smtplib
+import time
+import asyncio
+import hashlib
+import zlib
+import html
+import random
+import uuid
+import gzip
+import json
+import base64
+import queue
+import threading
+import atexit
+import select
+import socket
+import ipaddress
+from collections import defaultdict, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import email.utils
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
 from typing import Optional, List
 import psycopg2
+import psycopg2.errors
 import pytz
-from psycopg2.extras import RealDictCursor, Json
-from datetime import datetime, timedelta
+from psycopg2.extras import RealDictCursor, Json, execute_values
+from datetime import date, datetime, timedelta, timezone
 import jwt
+import httpx
 import bcrypt
+import numpy as np
 
 app = FastAPI()
 
@@ -42,17 +65,268 @@ load_dotenv('.env.local', override=True)  # Prefer .env.local for local testing
 load_dotenv('.env')  # Fallback to .env for live
 
 # Database connection
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_POOL_IDLE_SECONDS = float(os.getenv("DB_POOL_IDLE_SECONDS", "300"))
+# Pooled connections idle longer than this are checked with a round trip
+# before reuse (e.g. a firewall may have dropped them silently)
+DB_POOL_VALIDATE_SECONDS = float(os.getenv("DB_POOL_VALIDATE_SECONDS", "30"))
+
+class PooledConnection(psycopg2.extensions.connection):
+    """psycopg2 connection whose close() hands it back to its pool.
+
+    prepared holds the names of statements already PREPAREd on this session
+    (see PreparedStatements); discard makes close() really disconnect.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+        self.prepared = set()
+        self.discard = False
+        self.in_use = True
+        self.idle_since = None
+
+    def close(self):
+        if self.pool is not None and not self.closed:
+            if not self.in_use:
+                return  # already back in the pool
+            self.pool.release(self)
+        else:
+            super().close()
+
+class ConnectionPool:
+    """Keeps up to DB_POOL_SIZE idle connections for reuse.
+
+    Connects to the primary from the DB_* variables, or to dsn when given
+    (read replicas). A released connection is rolled back to a clean state
+    first. Connections that changed session state (autocommit, e.g. for
+    LISTEN), were marked discard, or sat idle longer than DB_POOL_IDLE_SECONDS
+    are closed instead. Before reuse, connections the server has dropped
+    (e.g. after a restart) are discarded, so no request gets a dead session.
+    Forked children never reuse the parent's sessions.
+    """
+
+    def __init__(self, size: int, idle_seconds: float, dsn: str = None):
+        self.size = size
+        self.idle_seconds = idle_seconds
+        self.dsn = dsn
+        self.idle = []
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.stats = {"opened": 0, "reused": 0, "dropped": 0}
+
+    def connect(self):
+        if self.dsn:
+            conn = psycopg2.connect(
+                self.dsn, connect_timeout=2, connection_factory=PooledConnection, cursor_factory=RealDictCursor
+            )
+        else:
+            conn = psycopg2.connect(
+                dbname=os.getenv("DB_NAME", "npp_furniture"),
+                user=os.getenv("DB_USER", "postgres"),
+                password=os.getenv("DB_PASSWORD", "26,Sheetpans!"),
+                host=os.getenv("DB_HOST", "npp_furniture-db"),
+                port=os.getenv("DB_PORT", "5432"),
+                connection_factory=PooledConnection,
+                cursor_factory=RealDictCursor
+            )
+        with self.lock:
+            self.stats["opened"] += 1
+        if os.getpid() == self.pid:
+            conn.pool = self
+        return conn
+
+    def get(self):
+        now = time.monotonic()
+        while os.getpid() == self.pid:
+            with self.lock:
+                if not self.idle:
+                    break
+                conn = self.idle.pop()
+            if now - conn.idle_since > self.idle_seconds:
+                psycopg2.extensions.connection.close(conn)
+                continue
+            if not self.usable(conn, now):
+                psycopg2.extensions.connection.close(conn)
+                with self.lock:
+                    self.stats["dropped"] += 1
+                continue
+            with self.lock:
+                self.stats["reused"] += 1
+            conn.in_use = True
+            return conn
+        return self.connect()
+
+    def usable(self, conn, now: float) -> bool:
+        if conn.closed:
+            return False
+        try:
+            # An idle session only turns readable when the server hangs up
+            # (restart, pg_terminate_backend) and says so; that check is free
+            if select.select([conn], [], [], 0)[0]:
+                return False
+            if now - conn.idle_since > DB_POOL_VALIDATE_SECONDS:
+                cur = conn.cursor()
+                cur.execute("SELECT 1")
+                cur.close()
+                conn.rollback()
+        except (psycopg2.Error, OSError, ValueError):
+            return False
+        return True
+
+    def release(self, conn):
+        conn.in_use = False
+        keep = not conn.discard and not conn.autocommit and self.size > 0
+        if keep and conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                keep = False
+        if keep:
+            conn.idle_since = time.monotonic()
+            with self.lock:
+                if len(self.idle) < self.size:
+                    self.idle.append(conn)
+                    return
+        psycopg2.extensions.connection.close(conn)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {**self.stats, "idle": len(self.idle), "size": self.size}
+
+db_pool = ConnectionPool(DB_POOL_SIZE, DB_POOL_IDLE_SECONDS)
+
 def get_db_connection():
-    return psycopg2.connect(
-        dbname=os.getenv("DB_NAME", "npp_furniture"),
-        user=os.getenv("DB_USER", "postgres"),
-        password=os.getenv("DB_PASSWORD", "26,Sheetpans!"),
-        host=os.getenv("DB_HOST", "npp_furniture-db"),
-        port=os.getenv("DB_PORT", "5432"),
-        cursor_factory=RealDictCursor
-    )
+    return db_pool.get()
+
+class PreparedStatements:
+    """Registry of hot queries run as server-side prepared statements.
+
+    Each statement is PREPAREd the first time it is used on a pooled
+    connection and EXECUTEd by name from then on, so Postgres parses it once
+    per session and can settle on a cached generic plan. Connections outside
+    a pool just run the SQL directly.
+    """
+
+    def __init__(self):
+        self.statements = {}  # name -> (sql with %s, sql with $n)
+
+    def register(self, name: str, sql: str) -> str:
+        counter = iter(range(1, sql.count("%s") + 1))
+        self.statements[name] = (sql, re.sub(r"%s", lambda _: f"${next(counter)}", sql))
+        return name
+
+    def execute(self, cur, name: str, params: tuple = ()):
+        sql, prepare_sql = self.statements[name]
+        prepared = getattr(cur.connection, "prepared", None)
+        if prepared is None:
+            cur.execute(sql, params)
+            return
+        if name not in prepared:
+            cur.execute(f"PREPARE {name} AS {prepare_sql}")
+            prepared.add(name)
+        try:
+            cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})" if params else f"EXECUTE {name}", params)
+        except psycopg2.errors.FeatureNotSupported:
+            # "cached plan must not change result type": the table changed
+            # under a SELECT * statement; drop the session rather than reuse it
+            cur.connection.discard = True
+            raise
+
+prepared_statements = PreparedStatements()
+
+# Columns a CSV import can write. products.content_hash is computed over
+# exactly these so re-imports can skip rows that would not change anything.
+PRODUCT_CONTENT_COLUMNS = [
+    ("title", "TEXT"),
+    ("category", "TEXT"),
+    ("vendor_id", "TEXT"),
+    ("vendor", "TEXT"),
+    ("price", "FLOAT"),
+    ("moq", "INTEGER"),
+    ("qty", "INTEGER"),
+    ("upc", "TEXT"),
+    ("sku", "TEXT"),
+    ("lead_time", "TEXT"),
+    ("exp_date", "TEXT"),
+    ("fob", "TEXT"),
+    ("image_url", "TEXT"),
+    ("out_of_stock", "BOOLEAN"),
+    ("offer_date", "TIMESTAMP"),
+    ("last_sent", "TIMESTAMP"),
+    ("room_type", "TEXT"),
+    ("style", "TEXT"),
+    ("material", "TEXT"),
+    ("color", "TEXT"),
+    ("brand", "TEXT"),
+    ("width", "FLOAT"),
+    ("depth", "FLOAT"),
+    ("height", "FLOAT"),
+    ("weight", "FLOAT"),
+    ("condition", "TEXT"),
+    ("warranty", "TEXT"),
+    ("assembly_required", "BOOLEAN"),
+]
+PRODUCT_CONTENT_TYPES = dict(PRODUCT_CONTENT_COLUMNS)
+# Column types for every field ProductUpdate can set
+PRODUCT_UPDATE_TYPES = {**PRODUCT_CONTENT_TYPES, "features": "TEXT[]", "secondary_images": "TEXT[]"}
+
+# Normalized SKU used for uniqueness and matching
+SKU_KEY_SQL = "lower(btrim(sku))"
+SKU_PRESENT_SQL = "btrim(sku) <> ''"
+SKU_UNIQUE_INDEX_READY = False
+
+def sku_key(sku: Optional[str]) -> str:
+    """Python twin of SKU_KEY_SQL."""
+    return (sku or "").strip(" ").lower()
 
 # Create tables
+AUDIT_PARTITION_MONTHS_AHEAD = 2
+
+def month_start(value: datetime, offset: int = 0) -> datetime:
+    index = value.year * 12 + value.month - 1 + offset
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def audit_partitions(cur) -> dict:
+    """Map partition name -> (from, to) for the monthly audit_logs partitions."""
+    cur.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) AS bound
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'audit_logs'::regclass
+    """)
+    partitions = {}
+    for row in cur.fetchall():
+        bounds = re.findall(r"'([^']+)'", row["bound"])
+        if len(bounds) == 2:
+            partitions[row["relname"]] = tuple(datetime.fromisoformat(b) for b in bounds)
+    return partitions
+
+def ensure_audit_partitions(cur, first_month: datetime = None):
+    """Create monthly audit_logs partitions from first_month (default: this month)
+    through AUDIT_PARTITION_MONTHS_AHEAD months ahead.
+
+    Each partition is built as a plain table, filled with any rows that landed in
+    audit_logs_default for its range, then attached, so a missed month never
+    blocks partition creation.
+    """
+    now = datetime.now()
+    month = month_start(first_month or now)
+    last = month_start(now, AUDIT_PARTITION_MONTHS_AHEAD)
+    existing = set(audit_partitions(cur))
+    while month <= last:
+        name = f"audit_logs_y{month.year}m{month.month:02d}"
+        upper = month_start(month, 1)
+        if name not in existing:
+            cur.execute(f"CREATE TABLE {name} (LIKE audit_logs INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+            cur.execute(f"""
+                WITH moved AS (
+                    DELETE FROM audit_logs_default WHERE timestamp >= %s AND timestamp < %s RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+            """, (month, upper))
+            cur.execute(f"ALTER TABLE audit_logs ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", (month, upper))
+        month = upper
+
 def init_db():
     conn = get_db_connection()
     cur = conn.cursor()
@@ -116,6 +390,7 @@ def init_db():
         ("features", "TEXT[]"),
         ("secondary_images", "TEXT[]"),
         ("sku", "TEXT"),  # New SKU column to replace ASIN
+        ("content_hash", "TEXT"),
     ]
     for col_name, col_type in furniture_columns:
         try:
@@ -123,6 +398,444 @@ def init_db():
         except Exception:
             pass  # Column might already exist
 
+    # Lookup indexes used by import matching and duplicate checks
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_products_sku ON products (sku)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_products_title ON products (title)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_products_upc ON products (upc)")
+
+    # Content hash over importable fields, maintained on every write
+    content_args = ", ".join(col_type for _, col_type in PRODUCT_CONTENT_COLUMNS)
+    content_row = ", ".join(f"${i}" for i in range(1, len(PRODUCT_CONTENT_COLUMNS) + 1))
+    content_columns = ", ".join(col_name for col_name, _ in PRODUCT_CONTENT_COLUMNS)
+    content_new = ", ".join(f"NEW.{col_name}" for col_name, _ in PRODUCT_CONTENT_COLUMNS)
+    cur.execute(f"""
+        CREATE OR REPLACE FUNCTION products_content_hash({content_args}) RETURNS TEXT AS $$
+            SELECT md5(ROW({content_row})::text)
+        $$ LANGUAGE sql STABLE
+    """)
+    cur.execute(f"""
+        CREATE OR REPLACE FUNCTION products_set_content_hash() RETURNS trigger AS $$
+        BEGIN
+            NEW.content_hash := products_content_hash({content_new});
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    cur.execute("DROP TRIGGER IF EXISTS products_content_hash_trg ON products")
+    cur.execute(f"""
+        CREATE TRIGGER products_content_hash_trg
+        BEFORE INSERT OR UPDATE OF {content_columns} ON products
+        FOR EACH ROW EXECUTE FUNCTION products_set_content_hash()
+    """)
+    cur.execute(f"UPDATE products SET content_hash = products_content_hash({content_columns}) WHERE content_hash IS NULL")
+
+    # Normalized category key, the SQL twin of normalize_category_value(),
+    # kept current by trigger so category pages are an index lookup
+    cur.execute("ALTER TABLE products ADD COLUMN IF NOT EXISTS category_key TEXT")
+    cur.execute(r"""
+        CREATE OR REPLACE FUNCTION category_key(value TEXT) RETURNS TEXT AS $$
+            SELECT lower(btrim(
+                regexp_replace(
+                    regexp_replace(
+                        replace(regexp_replace(normalize(COALESCE(value, ''), NFKD), '[^\x01-\x7F]', '', 'g'), '&', ' and '),
+                        '[^\w\s]', ' ', 'g'),
+                    '\s+', ' ', 'g')
+            ))
+        $$ LANGUAGE sql IMMUTABLE
+    """)
+    # "Chairs > Task Chairs" becomes the taxonomy path 'chairs/task chairs'
+    cur.execute('ALTER TABLE products ADD COLUMN IF NOT EXISTS category_path TEXT COLLATE "C"')
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION category_path(value TEXT) RETURNS TEXT AS $$
+            SELECT NULLIF(string_agg(category_key(level), '/' ORDER BY n), '')
+            FROM unnest(string_to_array(value, '>')) WITH ORDINALITY AS t(level, n)
+            WHERE category_key(level) <> ''
+        $$ LANGUAGE sql IMMUTABLE
+    """)
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION products_set_category_key() RETURNS trigger AS $$
+        BEGIN
+            NEW.category_key := category_key(NEW.category);
+            NEW.category_path := category_path(NEW.category);
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    cur.execute("DROP TRIGGER IF EXISTS products_category_key_trg ON products")
+    cur.execute("""
+        CREATE TRIGGER products_category_key_trg
+        BEFORE INSERT OR UPDATE OF category ON products
+        FOR EACH ROW EXECUTE FUNCTION products_set_category_key()
+    """)
+    cur.execute("UPDATE products SET category_key = category_key(category) WHERE category_key IS NULL AND category IS NOT NULL")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_products_category_key ON products (category_key, title)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_products_category_path ON products (category_path)")
+
+    # Orientation-free footprint (long and short side) and cubic volume in
+    # cubic inches, for the dimension-fit search
+    for column, expression in (
+        ("footprint_long", "CASE WHEN width IS NOT NULL AND depth IS NOT NULL THEN GREATEST(width, depth) END"),
+        ("footprint_short", "CASE WHEN width IS NOT NULL AND depth IS NOT NULL THEN LEAST(width, depth) END"),
+        ("volume", "width * depth * height"),
+    ):
+        cur.execute(f"ALTER TABLE products ADD COLUMN IF NOT EXISTS {column} FLOAT GENERATED ALWAYS AS ({expression}) STORED")
+    # lead_time ("5-7 Business Days", "2-3 Weeks", "In Stock") and exp_date
+    # ("6/26", "06/2026", "3/31/2026", "26-Jun") are free text; parse them on
+    # write into business-day bounds and a real expiry date
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION lead_time_days(value TEXT) RETURNS INTEGER[] AS $$
+        DECLARE
+            v TEXT := lower(btrim(COALESCE(value, '')));
+            m TEXT[];
+            factor INTEGER := 1;
+            low INTEGER;
+            high INTEGER;
+        BEGIN
+            IF v ~ '^(in ?sto|ready|immediate|same day)' THEN
+                RETURN ARRAY[0, 0];
+            END IF;
+            -- The first number or range, then the unit word right after it, so
+            -- "10 business days (2 weeks)" is read as days
+            m := regexp_match(v, '(\\d{1,4})(?:\\s*(?:-|to)\\s*(\\d{1,4}))?\\s*(?:(business|working|calendar)\\s+)?([a-z]*)');
+            IF m IS NULL THEN
+                RETURN NULL;
+            END IF;
+            low := m[1]::INTEGER;
+            high := COALESCE(m[2], m[1])::INTEGER;
+            IF m[4] ~ '^(h|hrs?|hours?)$' THEN
+                -- Anything under a day still ships the next business day
+                low := ceil(low / 24.0);
+                high := ceil(high / 24.0);
+            ELSIF m[4] ~ '^w(ee)?ks?$' THEN
+                factor := 5;
+            ELSIF m[4] ~ '^(mos?|months?)$' THEN
+                factor := 21;
+            ELSIF m[3] = 'calendar' THEN
+                low := floor(low * 5 / 7.0);
+                high := ceil(high * 5 / 7.0);
+            END IF;
+            low := low * factor;
+            high := high * factor;
+            RETURN ARRAY[LEAST(low, high), GREATEST(low, high)];
+        END
+        $$ LANGUAGE plpgsql IMMUTABLE
+    """)
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION expiry_date(value TEXT) RETURNS DATE AS $$
+        DECLARE
+            v TEXT := rtrim(lower(btrim(COALESCE(value, ''))), '+. ');
+            m TEXT[];
+            y INTEGER;
+            mo INTEGER;
+            d INTEGER;
+            month_end DATE;
+        BEGIN
+            -- Month names as in "Jun 2026" or Excel's "26-Jun" (June 2026)
+            m := regexp_match(v, '^([a-z]{3})[a-z]*[ /-]*(\\d{4}|\\d{2})$');
+            IF m IS NULL THEN
+                m := regexp_match(v, '^(\\d{2})-([a-z]{3})[a-z]*$');
+                IF m IS NOT NULL THEN
+                    m := ARRAY[m[2], m[1]];
+                END IF;
+            END IF;
+            IF m IS NOT NULL THEN
+                mo := (position(m[1] IN 'janfebmaraprmayjunjulaugsepoctnovdec') + 2) / 3;
+                IF mo = 0 OR position(m[1] IN 'janfebmaraprmayjunjulaugsepoctnovdec') % 3 <> 1 THEN
+                    RETURN NULL;
+                END IF;
+                y := m[2]::INTEGER;
+            ELSE
+                m := regexp_match(v, '^(\\d{4})-(\\d{1,2})-(\\d{1,2})');
+                IF m IS NOT NULL THEN
+                    y := m[1]::INTEGER; mo := m[2]::INTEGER; d := m[3]::INTEGER;
+                ELSE
+                    m := regexp_match(v, '^(\\d{1,2})[/-](\\d{1,2})[/-](\\d{4}|\\d{2})$');
+                    IF m IS NOT NULL THEN
+                        mo := m[1]::INTEGER; d := m[2]::INTEGER; y := m[3]::INTEGER;
+                    ELSE
+                        -- Month and year only: good through the end of that month
+                        m := regexp_match(v, '^(\\d{1,2})[/-](\\d{4}|\\d{2})$');
+                        IF m IS NOT NULL THEN
+                            mo := m[1]::INTEGER; y := m[2]::INTEGER;
+                        ELSIF v ~ '^\\d{4}$' THEN
+                            y := v::INTEGER; mo := 12;
+                        ELSE
+                            RETURN NULL;
+                        END IF;
+                    END IF;
+                END IF;
+            END IF;
+            IF y < 100 THEN
+                y := y + 2000;
+            END IF;
+            IF mo NOT BETWEEN 1 AND 12 OR y NOT BETWEEN 2000 AND 2200 THEN
+                RETURN NULL;
+            END IF;
+            month_end := (make_date(y, mo, 1) + INTERVAL '1 month' - INTERVAL '1 day')::DATE;
+            IF d IS NULL THEN
+                RETURN month_end;
+            END IF;
+            IF d NOT BETWEEN 1 AND EXTRACT(DAY FROM month_end) THEN
+                RETURN NULL;
+            END IF;
+            RETURN make_date(y, mo, d);
+        END
+        $$ LANGUAGE plpgsql IMMUTABLE
+    """)
+    cur.execute("ALTER TABLE products ADD COLUMN IF NOT EXISTS lead_time_min_days INTEGER")
+    cur.execute("ALTER TABLE products ADD COLUMN IF NOT EXISTS lead_time_max_days INTEGER")
+    cur.execute("ALTER TABLE products ADD COLUMN IF NOT EXISTS expires_on DATE")
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION products_parse_lead_expiry() RETURNS trigger AS $$
+        DECLARE
+            days INTEGER[] := lead_time_days(NEW.lead_time);
+        BEGIN
+            NEW.lead_time_min_days := days[1];
+            NEW.lead_time_max_days := days[2];
+            NEW.expires_on := expiry_date(NEW.exp_date);
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    cur.execute("DROP TRIGGER IF EXISTS products_parse_lead_expiry_trg ON products")
+    cur.execute("""
+        CREATE TRIGGER products_parse_lead_expiry_trg
+        BEFORE INSERT OR UPDATE OF lead_time, exp_date ON products
+        FOR EACH ROW EXECUTE FUNCTION products_parse_lead_expiry()
+    """)
+    # Backfill, and re-parse rows whenever the parsers above change
+    cur.execute("""
+        UPDATE products SET lead_time = lead_time
+        WHERE lead_time_min_days IS DISTINCT FROM (lead_time_days(lead_time))[1]
+           OR lead_time_max_days IS DISTINCT FROM (lead_time_days(lead_time))[2]
+           OR expires_on IS DISTINCT FROM expiry_date(exp_date)
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_products_lead_time_max ON products (lead_time_max_days)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_products_expires_on ON products (expires_on)")
+
+    # Covers every column /products/fit filters and sorts on, so matching ids
+    # and the total come from an index-only scan
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_products_fit ON products (footprint_short, footprint_long, height, weight)
+        INCLUDE (width, depth, volume, price, out_of_stock, category_path, id)
+    """)
+
+    # Category taxonomy: one node per category path level, with counts and
+    # price ranges of in-stock products kept current by statement triggers
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS categories (
+            id SERIAL PRIMARY KEY,
+            path TEXT COLLATE "C" UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            parent_id INTEGER REFERENCES categories(id) ON DELETE CASCADE,
+            depth INTEGER NOT NULL,
+            product_count INTEGER NOT NULL DEFAULT 0,
+            active_count INTEGER NOT NULL DEFAULT 0,
+            min_price FLOAT,
+            max_price FLOAT,
+            updated_at TIMESTAMP DEFAULT NOW()
+        )
+    """)
+    # Both trigger paths take a transaction-level advisory lock per category
+    # path (in key order) before touching it. A recount then can't read
+    # products while an uncommitted insert has already applied its delta to
+    # the same node and overwrite that delta when it commits.
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION lock_category_paths(paths TEXT[]) RETURNS void AS $$
+        BEGIN
+            PERFORM pg_advisory_xact_lock(k) FROM (
+                SELECT DISTINCT hashtext('categories:' || p) AS k FROM unnest(paths) p WHERE p IS NOT NULL
+            ) keys ORDER BY k;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    # Recompute the named nodes and their ancestors from products (index range scans)
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION refresh_categories(paths TEXT[]) RETURNS void AS $$
+        DECLARE
+            node RECORD;
+            stats RECORD;
+        BEGIN
+            -- Every node is recounted below in a statement that starts after
+            -- the locks are held, so it sees any insert that committed first
+            PERFORM lock_category_paths(ARRAY(
+                SELECT array_to_string(parts[1:n], '/')
+                FROM (SELECT string_to_array(p, '/') AS parts FROM unnest(paths) p WHERE p IS NOT NULL) s,
+                     generate_series(1, array_length(parts, 1)) n
+            ));
+            FOR node IN
+                SELECT DISTINCT array_to_string(parts[1:n], '/') AS path, n AS depth,
+                       array_to_string(parts[1:n - 1], '/') AS parent
+                FROM (SELECT string_to_array(p, '/') AS parts FROM unnest(paths) p WHERE p IS NOT NULL) s,
+                     generate_series(1, array_length(parts, 1)) n
+                ORDER BY n
+            LOOP
+                SELECT COUNT(*) AS product_count,
+                       COUNT(*) FILTER (WHERE NOT COALESCE(out_of_stock, FALSE)) AS active_count,
+                       MIN(price) FILTER (WHERE NOT COALESCE(out_of_stock, FALSE)) AS min_price,
+                       MAX(price) FILTER (WHERE NOT COALESCE(out_of_stock, FALSE)) AS max_price,
+                       MIN(btrim(split_part(category, '>', node.depth))) AS name
+                INTO stats
+                FROM products
+                WHERE category_path = node.path
+                   OR (category_path >= node.path || '/' AND category_path < node.path || '0');
+                IF stats.product_count = 0 THEN
+                    DELETE FROM categories WHERE path = node.path;
+                ELSE
+                    INSERT INTO categories AS c (path, name, parent_id, depth, product_count, active_count, min_price, max_price)
+                    VALUES (node.path, stats.name, (SELECT id FROM categories WHERE path = node.parent), node.depth,
+                            stats.product_count, stats.active_count, stats.min_price, stats.max_price)
+                    ON CONFLICT (path) DO UPDATE SET
+                        product_count = EXCLUDED.product_count, active_count = EXCLUDED.active_count,
+                        min_price = EXCLUDED.min_price, max_price = EXCLUDED.max_price, updated_at = NOW();
+                END IF;
+            END LOOP;
+            PERFORM pg_notify('settings_changed', 'db|categories');
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    # Inserts (the bulk import path) only ever grow a node, so apply them as deltas
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION categories_after_insert() RETURNS trigger AS $$
+        DECLARE
+            level INTEGER;
+        BEGIN
+            PERFORM lock_category_paths(ARRAY(
+                SELECT DISTINCT array_to_string(parts[1:n], '/')
+                FROM (SELECT string_to_array(category_path, '/') AS parts FROM new_rows WHERE category_path IS NOT NULL) s,
+                     generate_series(1, array_length(parts, 1)) n
+            ));
+            FOR level IN 1..COALESCE((SELECT MAX(array_length(string_to_array(category_path, '/'), 1)) FROM new_rows), 0) LOOP
+                INSERT INTO categories AS c (path, name, parent_id, depth, product_count, active_count, min_price, max_price)
+                SELECT d.path, d.name, (SELECT id FROM categories WHERE path = d.parent), level,
+                       d.product_count, d.active_count, d.min_price, d.max_price
+                FROM (
+                    SELECT array_to_string((string_to_array(category_path, '/'))[1:level], '/') AS path,
+                           array_to_string((string_to_array(category_path, '/'))[1:level - 1], '/') AS parent,
+                           MIN(btrim(split_part(category, '>', level))) AS name,
+                           COUNT(*) AS product_count,
+                           COUNT(*) FILTER (WHERE NOT COALESCE(out_of_stock, FALSE)) AS active_count,
+                           MIN(price) FILTER (WHERE NOT COALESCE(out_of_stock, FALSE)) AS min_price,
+                           MAX(price) FILTER (WHERE NOT COALESCE(out_of_stock, FALSE)) AS max_price
+                    FROM new_rows
+                    WHERE array_length(string_to_array(category_path, '/'), 1) >= level
+                    GROUP BY 1, 2
+                ) d
+                ON CONFLICT (path) DO UPDATE SET
+                    product_count = c.product_count + EXCLUDED.product_count,
+                    active_count = c.active_count + EXCLUDED.active_count,
+                    min_price = LEAST(c.min_price, EXCLUDED.min_price),
+                    max_price = GREATEST(c.max_price, EXCLUDED.max_price),
+                    updated_at = NOW();
+            END LOOP;
+            IF FOUND THEN
+                PERFORM pg_notify('settings_changed', 'db|categories');
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION categories_after_update() RETURNS trigger AS $$
+        BEGIN
+            PERFORM refresh_categories(array_agg(DISTINCT p))
+            FROM (
+                SELECT unnest(ARRAY[o.category_path, n.category_path]) AS p
+                FROM old_rows o JOIN new_rows n ON n.id = o.id
+                WHERE o.category_path IS DISTINCT FROM n.category_path
+                   OR o.price IS DISTINCT FROM n.price
+                   OR o.out_of_stock IS DISTINCT FROM n.out_of_stock
+            ) changed
+            HAVING COUNT(p) > 0;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION categories_after_delete() RETURNS trigger AS $$
+        BEGIN
+            PERFORM refresh_categories(array_agg(DISTINCT category_path))
+            FROM old_rows WHERE category_path IS NOT NULL
+            HAVING COUNT(*) > 0;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    for event, tables in (("INSERT", "NEW TABLE AS new_rows"),
+                          ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+                          ("DELETE", "OLD TABLE AS old_rows")):
+        cur.execute(f"DROP TRIGGER IF EXISTS products_categories_{event.lower()}_trg ON products")
+        cur.execute(f"""
+            CREATE TRIGGER products_categories_{event.lower()}_trg
+            AFTER {event} ON products REFERENCING {tables}
+            FOR EACH STATEMENT EXECUTE FUNCTION categories_after_{event.lower()}()
+        """)
+    # Price / qty / stock history. One row per product per UPDATE statement that
+    # actually changed one of them; unchanged fields are left NULL in both
+    # old and new. Written set-based from the statement's transition tables.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS product_history (
+            id BIGSERIAL PRIMARY KEY,
+            product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+            changed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            price_old FLOAT,
+            price_new FLOAT,
+            qty_old INTEGER,
+            qty_new INTEGER,
+            out_of_stock_old BOOLEAN,
+            out_of_stock_new BOOLEAN
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_product_history_product ON product_history (product_id, changed_at DESC, id DESC)")
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION products_record_history() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO product_history (product_id, price_old, price_new, qty_old, qty_new, out_of_stock_old, out_of_stock_new)
+            SELECT n.id,
+                   CASE WHEN o.price IS DISTINCT FROM n.price THEN o.price END,
+                   CASE WHEN o.price IS DISTINCT FROM n.price THEN n.price END,
+                   CASE WHEN o.qty IS DISTINCT FROM n.qty THEN o.qty END,
+                   CASE WHEN o.qty IS DISTINCT FROM n.qty THEN n.qty END,
+                   CASE WHEN o.out_of_stock IS DISTINCT FROM n.out_of_stock THEN o.out_of_stock END,
+                   CASE WHEN o.out_of_stock IS DISTINCT FROM n.out_of_stock THEN n.out_of_stock END
+            FROM old_rows o JOIN new_rows n ON n.id = o.id
+            WHERE o.price IS DISTINCT FROM n.price
+               OR o.qty IS DISTINCT FROM n.qty
+               OR o.out_of_stock IS DISTINCT FROM n.out_of_stock;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    cur.execute("DROP TRIGGER IF EXISTS products_history_trg ON products")
+    cur.execute("""
+        CREATE TRIGGER products_history_trg
+        AFTER UPDATE ON products REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION products_record_history()
+    """)
+
+    # Any change to products drops cached catalog-derived results ("catalog:...")
+    # in every worker; NOTIFY payloads are deduplicated per transaction
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION products_notify_catalog_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('settings_changed', 'db|catalog');
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    cur.execute("DROP TRIGGER IF EXISTS products_catalog_change_trg ON products")
+    cur.execute("""
+        CREATE TRIGGER products_catalog_change_trg
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON products
+        FOR EACH STATEMENT EXECUTE FUNCTION products_notify_catalog_change()
+    """)
+
+    # Backfill: category_path for existing rows, then build the tree once
+    cur.execute("UPDATE products SET category_path = category_path(category) WHERE category_path IS NULL AND category IS NOT NULL AND category_path(category) IS NOT NULL")
+    cur.execute("SELECT EXISTS (SELECT 1 FROM categories) AS built")
+    if not cur.fetchone()["built"]:
+        cur.execute("SELECT refresh_categories(ARRAY(SELECT DISTINCT category_path FROM products WHERE category_path IS NOT NULL))")
+
     # Commit table structure changes before attempting migrations
     conn.commit()
 
@@ -139,6 +852,20 @@ def init_db():
     except Exception as e:
         conn.rollback()  # Rollback failed transaction so subsequent queries work
         print(f"SKU migration note: {e}")
+
+    # One product per normalized, non-empty SKU. Existing duplicates block the
+    # unique index; fall back to a plain index so lookups stay fast until the
+    # duplicates are resolved.
+    global SKU_UNIQUE_INDEX_READY
+    try:
+        cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS uq_products_sku_key ON products ({SKU_KEY_SQL}) WHERE {SKU_PRESENT_SQL}")
+        conn.commit()
+        SKU_UNIQUE_INDEX_READY = True
+    except psycopg2.IntegrityError as e:
+        conn.rollback()
+        print(f"SKU unique index not created, resolve duplicate SKUs and restart: {e}")
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_products_sku_key ON products ({SKU_KEY_SQL}) WHERE {SKU_PRESENT_SQL}")
+        conn.commit()
     # Enhanced users table with roles and metadata
     cur.execute("""
         CREATE TABLE IF NOT EXISTS users (
@@ -161,6 +888,7 @@ def init_db():
         ('created_at', 'TIMESTAMP', 'NOW()'),
         ('last_login', 'TIMESTAMP', None),
         ('created_by', 'TEXT', None),
+        ('token_epoch', 'INTEGER', '0'),
     ]:
         try:
             if default:
@@ -178,17 +906,148 @@ def init_db():
         )
     """)
 
-    # Audit log table for tracking user actions
+    # Audit log table for tracking user actions, range-partitioned by month.
+    # Older databases have a plain table; move its rows into the partitioned one.
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('audit_logs')")
+    existing = cur.fetchone()
+    migrate_audit = existing is not None and existing["relkind"] != "p"
+    if migrate_audit:
+        cur.execute("ALTER TABLE audit_logs RENAME TO audit_logs_unpartitioned")
+        cur.execute("ALTER TABLE audit_logs_unpartitioned RENAME CONSTRAINT audit_logs_pkey TO audit_logs_unpartitioned_pkey")
+        cur.execute("ALTER SEQUENCE IF EXISTS audit_logs_id_seq RENAME TO audit_logs_unpartitioned_id_seq")
     cur.execute("""
         CREATE TABLE IF NOT EXISTS audit_logs (
-            id SERIAL PRIMARY KEY,
-            timestamp TIMESTAMP DEFAULT NOW(),
+            id BIGSERIAL,
+            timestamp TIMESTAMP NOT NULL DEFAULT NOW(),
             username TEXT,
             action TEXT NOT NULL,
             resource_type TEXT,
             resource_id TEXT,
             details JSONB,
-            ip_address TEXT
+            ip_address TEXT,
+            PRIMARY KEY (timestamp, id)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    cur.execute("CREATE TABLE IF NOT EXISTS audit_logs_default PARTITION OF audit_logs DEFAULT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_audit_logs_timestamp_brin ON audit_logs USING BRIN (timestamp)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_audit_logs_username ON audit_logs (username, timestamp, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_audit_logs_action ON audit_logs (action text_pattern_ops, timestamp, id)")
+    first_audit_month = None
+    if migrate_audit:
+        cur.execute("""
+            INSERT INTO audit_logs (id, timestamp, username, action, resource_type, resource_id, details, ip_address)
+            SELECT id, COALESCE(timestamp, NOW()), username, action, resource_type, resource_id, details, ip_address
+            FROM audit_logs_unpartitioned
+        """)
+        cur.execute("SELECT setval('audit_logs_id_seq', GREATEST((SELECT MAX(id) FROM audit_logs), 1))")
+        cur.execute("DROP TABLE audit_logs_unpartitioned")
+        cur.execute("SELECT MIN(timestamp) AS first FROM audit_logs")
+        first_audit_month = cur.fetchone()["first"]
+    ensure_audit_partitions(cur, first_audit_month)
+    conn.commit()
+
+    # Fingerprints of ingested import files (watch folder and uploads)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS import_files (
+            fingerprint TEXT PRIMARY KEY,
+            filename TEXT,
+            size BIGINT,
+            source TEXT,
+            inserted INTEGER,
+            updated INTEGER,
+            unchanged INTEGER,
+            skipped INTEGER,
+            imported_at TIMESTAMP DEFAULT NOW(),
+            imported_by TEXT
+        )
+    """)
+    # Watch-folder files that could not be imported are kept as 'failed' so
+    # they aren't retried on every pass
+    cur.execute("ALTER TABLE import_files ADD COLUMN IF NOT EXISTS status TEXT NOT NULL DEFAULT 'imported'")
+    cur.execute("ALTER TABLE import_files ADD COLUMN IF NOT EXISTS error TEXT")
+
+    # Candidate near-duplicate product clusters awaiting review
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS duplicate_clusters (
+            id SERIAL PRIMARY KEY,
+            product_ids INTEGER[] NOT NULL,
+            similarity FLOAT,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT NOW(),
+            reviewed_by TEXT,
+            reviewed_at TIMESTAMP,
+            kept_id INTEGER
+        )
+    """)
+
+    # Nightly nearest-neighbour "similar products". No foreign keys: the table
+    # is rewritten wholesale each night and reads join to products anyway.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS related_products (
+            product_id INTEGER NOT NULL,
+            rank SMALLINT NOT NULL,
+            related_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            computed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (product_id, rank)
+        )
+    """)
+    # One row per completed rebuild, keyed by its America/New_York date so the
+    # scheduler's "already ran today" check doesn't depend on the DB timezone
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS related_products_runs (
+            day DATE PRIMARY KEY,
+            products INTEGER NOT NULL,
+            rows INTEGER NOT NULL,
+            finished_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+
+    # Outgoing email, written by request handlers and delivered by outbox_sender
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id SERIAL PRIMARY KEY,
+            kind TEXT NOT NULL,
+            recipient TEXT NOT NULL,
+            reply_to TEXT,
+            subject TEXT NOT NULL,
+            html_body TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            next_attempt_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            claimed_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT NOW(),
+            sent_at TIMESTAMP
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (next_attempt_at) WHERE status = 'pending'")
+
+    # Nightly per-day inventory aggregates by vendor, category and condition
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS inventory_daily_rollups (
+            day DATE NOT NULL,
+            dimension TEXT NOT NULL,
+            key TEXT NOT NULL,
+            product_count INTEGER NOT NULL,
+            in_stock_count INTEGER NOT NULL,
+            qty_sum BIGINT NOT NULL,
+            inventory_value DOUBLE PRECISION NOT NULL,
+            PRIMARY KEY (dimension, key, day)
+        )
+    """)
+
+    # Audit partitions that were archived to disk and dropped
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS audit_archives (
+            partition_name TEXT PRIMARY KEY,
+            range_start TIMESTAMP NOT NULL,
+            range_end TIMESTAMP NOT NULL,
+            path TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            bytes BIGINT,
+            sha256 TEXT,
+            archived_at TIMESTAMP DEFAULT NOW()
         )
     """)
 
@@ -228,6 +1087,11 @@ def normalize_category_value(value: Optional[str]) -> str:
     ascii_only = re.sub(r"\s+", " ", ascii_only)
     return ascii_only.strip().lower()
 
+def category_path_value(value: Optional[str]) -> str:
+    """Python twin of the category_path() SQL function: "Chairs > Task Chairs" -> "chairs/task chairs"."""
+    levels = (normalize_category_value(level) for level in (value or "").split(">"))
+    return "/".join(level for level in levels if level)
+
 
 # Initialize database
 init_db()
@@ -236,6 +1100,7 @@ init_db()
 SECRET_KEY = os.getenv("SECRET_KEY", "a-very-strong-secret-key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "720"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
@@ -313,6 +1178,25 @@ class ProductUpdate(BaseModel):
     features: Optional[List[str]] = None
     secondary_images: Optional[List[str]] = None
 
+class ProductBulkUpdateItem(ProductUpdate):
+    id: int
+
+class DuplicateCheckRequest(BaseModel):
+    skus: List[str] = []
+    upcs: List[str] = []
+
+class ProductIdList(BaseModel):
+    ids: List[int]
+
+class ProductBulkDelete(BaseModel):
+    ids: Optional[List[int]] = None
+    vendor: Optional[str] = None
+    vendor_id: Optional[str] = None
+    out_of_stock: Optional[bool] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 class UserSettings(BaseModel):
     theme: Optional[str] = "light"
     textScale: Optional[float] = 1.0
@@ -340,6 +1224,9 @@ class UserResponse(BaseModel):
     last_login: Optional[datetime]
     created_by: Optional[str]
 
+class DuplicateMerge(BaseModel):
+    keep_id: int
+
 class CompanySettingsUpdate(BaseModel):
     company_name: Optional[str] = None
     contact_email: Optional[str] = None
@@ -362,25 +1249,221 @@ def check_permission(role: str, permission: str) -> bool:
     return permission in ROLE_PERMISSIONS.get(role, [])
 
 # Audit logging helper
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_MS = int(os.getenv("AUDIT_FLUSH_MS", "500"))
+
+class AuditWriter:
+    """Buffers audit events in a bounded queue and writes them in batches.
+
+    A daemon thread flushes every AUDIT_FLUSH_MS or once AUDIT_BATCH_SIZE events
+    are waiting, using one multi-row INSERT per batch. When the queue is full new
+    events are dropped and counted rather than blocking the request.
+    """
+
+    def __init__(self, maxsize: int, batch_size: int, flush_ms: int):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000.0
+        self.stats = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0}
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.stopping.clear()
+                self.thread = threading.Thread(target=self.run, name="audit-writer", daemon=True)
+                self.thread.start()
+
+    def put(self, event: tuple):
+        if self.thread is None:
+            self.start()
+        try:
+            self.queue.put_nowait(event)
+            counter = "enqueued"
+        except queue.Full:
+            counter = "dropped"
+        with self.lock:
+            self.stats[counter] += 1
+
+    def take_batch(self, timeout: float) -> list:
+        batch = []
+        deadline = time.monotonic() + timeout
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self.queue.get_nowait())
+                else:
+                    batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def write(self, batch: list):
+        now = time.time()
+        # Keep the time the event happened, not the time it was flushed
+        rows = [(now - queued_at,) + event for queued_at, event in batch]
+        for attempt in range(2):
+            try:
+                conn = get_db_connection()
+                try:
+                    cur = conn.cursor()
+                    execute_values(cur, """
+                        INSERT INTO audit_logs (timestamp, username, action, resource_type, resource_id, details, ip_address)
+                        VALUES %s
+                    """, rows, template="(NOW() - %s * interval '1 second', %s, %s, %s, %s, %s, %s)",
+                        page_size=self.batch_size)
+                    conn.commit()
+                    cur.close()
+                finally:
+                    conn.close()
+                with self.lock:
+                    self.stats["written"] += len(rows)
+                return
+            except Exception as e:
+                print(f"Audit log error: {e}")
+        with self.lock:
+            self.stats["failed"] += len(rows)
+
+    def run(self):
+        while not self.stopping.is_set():
+            batch = self.take_batch(self.flush_interval)
+            if batch:
+                self.write(batch)
+        # Drain whatever is left on shutdown
+        while True:
+            batch = self.take_batch(0)
+            if not batch:
+                break
+            self.write(batch)
+
+    def close(self, timeout: float = 10.0):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "queued": self.queue.qsize(), "capacity": self.queue.maxsize}
+
+audit_writer = AuditWriter(AUDIT_QUEUE_SIZE, AUDIT_BATCH_SIZE, AUDIT_FLUSH_MS)
+atexit.register(audit_writer.close)
+
 def log_audit(username: str, action: str, resource_type: str = None, resource_id: str = None, details: dict = None, ip_address: str = None):
-    """Log an action to the audit trail"""
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO audit_logs (username, action, resource_type, resource_id, details, ip_address)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (username, action, resource_type, resource_id, Json(details) if details else None, ip_address))
-        conn.commit()
-        cur.close()
-        conn.close()
-    except Exception as e:
-        print(f"Audit log error: {e}")
+    """Queue an action for the audit trail; written in the background by audit_writer"""
+    audit_writer.put((time.time(), (
+        username, action, resource_type, resource_id,
+        Json(details) if details else None, ip_address
+    )))
 
 # Authentication
 def verify_password(plain_password, hashed_password):
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
+def hash_password(plain_password):
+    return bcrypt.hashpw(plain_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+# bcrypt takes ~250ms of CPU; run it on a small dedicated pool so logins
+# never block the event loop and a burst can't saturate every thread
+password_hash_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+    thread_name_prefix="bcrypt"
+)
+
+async def verify_password_async(plain_password, hashed_password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_hash_pool, verify_password, plain_password, hashed_password)
+
+async def hash_password_async(plain_password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_hash_pool, hash_password, plain_password)
+
+class TokenBucketLimiter:
+    """In-process token buckets keyed by client IP or username."""
+
+    def __init__(self, capacity: int, per_minute: float, max_keys: int = 10000):
+        self.capacity = capacity
+        self.rate = per_minute / 60.0
+        self.max_keys = max_keys
+        self.buckets = {}  # key -> (tokens, updated_at)
+
+    def consume(self, key: str) -> float:
+        """Take one token. Returns 0 if allowed, else seconds until a token is free."""
+        now = time.monotonic()
+        tokens, updated_at = self.buckets.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated_at) * self.rate)
+        if tokens < 1:
+            self.buckets[key] = (tokens, now)
+            return (1 - tokens) / self.rate
+        if len(self.buckets) >= self.max_keys and key not in self.buckets:
+            # Drop keys that have refilled completely; they carry no state
+            self.buckets = {
+                k: v for k, v in self.buckets.items()
+                if v[0] + (now - v[1]) * self.rate < self.capacity
+            }
+        self.buckets[key] = (tokens - 1, now)
+        return 0
+
+login_ip_limiter = TokenBucketLimiter(
+    capacity=int(os.getenv("LOGIN_IP_BURST", "20")),
+    per_minute=float(os.getenv("LOGIN_IP_PER_MINUTE", "10"))
+)
+login_user_limiter = TokenBucketLimiter(
+    capacity=int(os.getenv("LOGIN_USER_BURST", "5")),
+    per_minute=float(os.getenv("LOGIN_USER_PER_MINUTE", "2"))
+)
+# nginx sets X-Real-IP, but the backend port is published too, so the header
+# is only believed on connections from TRUSTED_PROXIES: comma-separated IPs,
+# CIDR ranges or host names (e.g. the nginx container's service name).
+CLIENT_IP_HEADER = os.getenv("CLIENT_IP_HEADER", "X-Real-IP")
+TRUSTED_PROXIES = [entry.strip() for entry in os.getenv("TRUSTED_PROXIES", "").split(",") if entry.strip()]
+
+class TrustedProxies:
+    """Matches peer addresses against TRUSTED_PROXIES; host names are re-resolved every minute."""
+
+    def __init__(self, entries: list, refresh_seconds: float = 60):
+        self.entries = entries
+        self.refresh_seconds = refresh_seconds
+        self.networks = []
+        self.resolved_at = None
+
+    def resolve(self):
+        networks = []
+        for entry in self.entries:
+            try:
+                networks.append(ipaddress.ip_network(entry, strict=False))
+                continue
+            except ValueError:
+                pass
+            try:
+                infos = socket.getaddrinfo(entry, None)
+            except socket.gaierror:
+                continue  # not up yet; tried again on the next refresh
+            networks.extend(ipaddress.ip_network(info[4][0].split("%")[0]) for info in infos)
+        self.networks = list(dict.fromkeys(networks))
+        self.resolved_at = time.monotonic()
+
+    def __contains__(self, host: str) -> bool:
+        if not self.entries or not host:
+            return False
+        if self.resolved_at is None or time.monotonic() - self.resolved_at > self.refresh_seconds:
+            self.resolve()
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return host in self.entries
+        return any(address in network for network in self.networks)
+
+trusted_proxies = TrustedProxies(TRUSTED_PROXIES)
+
+def get_client_ip(request: Request) -> str:
+    peer = request.client.host if request.client else None
+    if CLIENT_IP_HEADER and request.headers.get(CLIENT_IP_HEADER) and peer in trusted_proxies:
+        return request.headers[CLIENT_IP_HEADER]
+    return peer or "unknown"
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -391,7 +1474,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+def decode_access_token(token: str) -> dict:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -399,25 +1482,289 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     )
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+        if payload.get("sub") is None or payload.get("type") == "refresh":
             raise credentials_exception
     except jwt.PyJWTError:
         raise credentials_exception
-    return username
+    return payload
+
+# ============= READ REPLICAS =============
+
+# Optional streaming replicas for read-only endpoints, as libpq DSNs separated
+# by ";" (e.g. "host=replica1 dbname=npp_furniture user=postgres password=...").
+# With none configured every read goes to the primary as before.
+DB_REPLICA_DSNS = [dsn.strip() for dsn in os.getenv("DB_REPLICA_DSNS", "").split(";") if dsn.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", "2"))
+# After a client's own write its reads stay on the primary for this long
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+
+def lsn_to_int(lsn: str) -> int:
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+class ReplicaRouter:
+    """Hands out pooled replica connections for reads, falling back to the primary.
+
+    A daemon thread polls every replica each REPLICA_CHECK_SECONDS. A replica
+    whose replay position has reached the primary's WAL position counts as
+    zero lag (so an idle primary doesn't make replicas look stale); otherwise
+    lag is the age of its last replayed transaction. Replicas that are
+    unreachable or lag more than REPLICA_MAX_LAG_SECONDS are skipped until
+    the next check says otherwise.
+    """
 
-async def get_current_user_with_role(token: str = Depends(oauth2_scheme)):
-    """Get current user with their role information"""
-    username = await get_current_user(token)
+    def __init__(self, dsns: list, max_lag: float, check_interval: float, sticky_seconds: float):
+        self.replicas = [
+            {
+                "dsn": dsn, "pool": ConnectionPool(DB_POOL_SIZE, DB_POOL_IDLE_SECONDS, dsn=dsn),
+                "lag": None, "caught_up": False, "error": None, "checked_at": None, "checked_since": 0.0
+            }
+            for dsn in dsns
+        ]
+        # monotonic time of the last committed change announced on
+        # SETTINGS_CHANNEL; see mark_changed()
+        self.changed_at = 0.0
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.sticky_seconds = sticky_seconds
+        self.sticky = {}  # client key -> monotonic time its reads may leave the primary
+        self.stats = {"replica": 0, "sticky": 0, "fallback": 0}
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.next_index = 0
+
+    def start(self):
+        with self.lock:
+            if self.replicas and (self.thread is None or not self.thread.is_alive()):
+                self.stopping.clear()
+                self.thread = threading.Thread(target=self.run, name="replica-monitor", daemon=True)
+                self.thread.start()
+
+    def close(self, timeout: float = 5.0):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def connect_replica(self, replica: dict):
+        return replica["pool"].get()
+
+    def primary_lsn(self) -> int:
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT pg_current_wal_lsn()::text AS lsn")
+            return lsn_to_int(cur.fetchone()["lsn"])
+        finally:
+            conn.close()
+
+    def replica_position(self, conn) -> dict:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT pg_is_in_recovery() AS in_recovery,
+                   pg_last_wal_replay_lsn()::text AS replay_lsn,
+                   COALESCE(EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()), 0) AS replay_age
+        """)
+        position = cur.fetchone()
+        cur.close()
+        return position
+
+    def check(self):
+        started = time.monotonic()
+        try:
+            primary_lsn = self.primary_lsn()
+        except psycopg2.Error:
+            primary_lsn = None
+        for replica in self.replicas:
+            lag, caught_up, error = None, False, None
+            try:
+                conn = self.connect_replica(replica)
+                try:
+                    position = self.replica_position(conn)
+                finally:
+                    conn.close()
+                if not position["in_recovery"]:
+                    # not a standby (e.g. a logical subscriber); nothing to measure
+                    lag, caught_up = 0.0, True
+                elif primary_lsn is not None and position["replay_lsn"] and lsn_to_int(position["replay_lsn"]) >= primary_lsn:
+                    lag, caught_up = 0.0, True
+                else:
+                    lag = float(position["replay_age"])
+            except psycopg2.Error as e:
+                error = str(e).strip()
+            with self.lock:
+                replica.update(
+                    lag=lag, caught_up=caught_up, error=error,
+                    checked_at=datetime.utcnow(), checked_since=started
+                )
+
+    def run(self):
+        while not self.stopping.is_set():
+            self.check()
+            self.stopping.wait(self.check_interval)
+
+    def mark_changed(self):
+        """Called for every change announced on SETTINGS_CHANNEL.
+
+        Consistent reads then stay on the primary until a check that started
+        afterwards has seen a replica caught up with the primary.
+        """
+        with self.lock:
+            self.changed_at = time.monotonic()
+
+    def mark_write(self, keys: list):
+        deadline = time.monotonic() + self.sticky_seconds
+        with self.lock:
+            for key in keys:
+                self.sticky[key] = deadline
+
+    def is_sticky(self, keys: list) -> bool:
+        now = time.monotonic()
+        with self.lock:
+            if len(self.sticky) > 10000:
+                self.sticky = {k: v for k, v in self.sticky.items() if v > now}
+            return any(self.sticky.get(key, 0) > now for key in keys)
+
+    def candidates(self, consistent: bool = False) -> list:
+        with self.lock:
+            if consistent:
+                healthy = [r for r in self.replicas if r["caught_up"] and r["checked_since"] > self.changed_at]
+            else:
+                healthy = [r for r in self.replicas if r["lag"] is not None and r["lag"] <= self.max_lag]
+            if not healthy:
+                return []
+            start = self.next_index % len(healthy)
+            self.next_index += 1
+        return healthy[start:] + healthy[:start]
+
+    def count(self, route: str):
+        with self.lock:
+            self.stats[route] += 1
+
+    def connect(self, keys: list, consistent: bool = False):
+        """Connection for a read-only request from the client identified by keys.
+
+        consistent=True only accepts a replica that the monitor saw fully
+        caught up with the primary after the last change announced on
+        SETTINGS_CHANNEL; loaders that fill NOTIFY-invalidated caches use it
+        so a stale read can't be cached. It costs no extra queries: until the
+        next check the loader simply reads from the primary.
+        """
+        if not self.replicas:
+            return get_db_connection()
+        if keys and self.is_sticky(keys):
+            self.count("sticky")
+            return get_db_connection()
+        for replica in self.candidates(consistent):
+            try:
+                conn = self.connect_replica(replica)
+            except psycopg2.Error as e:
+                with self.lock:
+                    replica.update(lag=None, caught_up=False, error=str(e).strip(), checked_at=datetime.utcnow())
+                continue
+            self.count("replica")
+            return conn
+        self.count("fallback")
+        return get_db_connection()
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            replicas = [
+                {
+                    # Don't echo passwords back
+                    "dsn": re.sub(r"password=\S+", "password=***", r["dsn"]),
+                    "lag_seconds": r["lag"],
+                    "healthy": r["lag"] is not None and r["lag"] <= self.max_lag,
+                    "error": r["error"],
+                    "checked_at": r["checked_at"],
+                    "pool": r["pool"].snapshot()
+                }
+                for r in self.replicas
+            ]
+            return {"replicas": replicas, "max_lag_seconds": self.max_lag, "routed": dict(self.stats)}
+
+replica_router = ReplicaRouter(DB_REPLICA_DSNS, REPLICA_MAX_LAG_SECONDS, REPLICA_CHECK_SECONDS, READ_YOUR_WRITES_SECONDS)
+atexit.register(replica_router.close)
+
+def client_keys(request: Request) -> list:
+    """Identify the caller for read-your-writes: by user when a valid token is sent, and by IP."""
+    keys = ["ip:" + get_client_ip(request)]
+    authorization = request.headers.get("Authorization", "")
+    if authorization.lower().startswith("bearer "):
+        try:
+            keys.append("user:" + decode_access_token(authorization[7:])["sub"])
+        except HTTPException:
+            pass
+    return keys
+
+def get_read_connection(request: Request, consistent: bool = False):
+    """Connection for read-only endpoints; a replica when one is configured and fresh enough."""
+    if not replica_router.replicas:
+        return get_db_connection()
+    return replica_router.connect(client_keys(request), consistent)
+
+@app.middleware("http")
+async def track_client_writes(request: Request, call_next):
+    response = await call_next(request)
+    if replica_router.replicas and request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        replica_router.mark_write(client_keys(request))
+    return response
+
+# Role/active-status cache for permission checks. Entries expire after the
+# TTL and are dropped immediately when an admin changes or deletes the user.
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+user_state_cache = {}  # username -> (expires_at, state or None)
+USER_STATE_SQL = prepared_statements.register(
+    "user_state", "SELECT role, is_active, token_epoch FROM users WHERE username = %s"
+)
+
+def get_user_state(username: str):
+    """Return {"role", "is_active", "token_epoch"} for a user, or None if it doesn't exist."""
+    if settings_cache.listener is None:
+        settings_cache.start_listener()  # other workers announce user changes there
+    now = time.monotonic()
+    cached = user_state_cache.get(username)
+    if cached and cached[0] > now:
+        return cached[1]
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute("SELECT username, role, is_active FROM users WHERE username = %s", (username,))
-    user = cur.fetchone()
+    prepared_statements.execute(cur, USER_STATE_SQL, (username,))
+    state = cur.fetchone()
     cur.close()
     conn.close()
+    user_state_cache[username] = (now + USER_CACHE_TTL_SECONDS, state)
+    return state
+
+def user_state_key(username: str) -> str:
+    return f"user_state:{username}"
+
+def invalidate_user_state(username: str):
+    user_state_cache.pop(username, None)
+
+def authenticate_token(token: str):
+    """Return (username, user state) for a valid access token of an active user."""
+    payload = decode_access_token(token)
+    username = payload["sub"]
+    user = get_user_state(username)
     if not user or not user.get("is_active", True):
         raise HTTPException(status_code=403, detail="User account is disabled")
-    return {"username": user["username"], "role": user.get("role", "viewer")}
+    # Role, status or password changes bump the epoch and revoke older tokens
+    if payload.get("epoch", 0) != (user.get("token_epoch") or 0):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Session expired. Please log in again.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return username, user
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    return authenticate_token(token)[0]
+
+async def get_current_user_with_role(token: str = Depends(oauth2_scheme)):
+    """Get current user with their role information"""
+    username, user = authenticate_token(token)
+    return {"username": username, "role": user.get("role") or "viewer"}
 
 def require_permission(permission: str):
     """Dependency to check if user has required permission"""
@@ -427,14 +1774,43 @@ def require_permission(permission: str):
         return user
     return check
 
+def issue_tokens(username: str, role: str, epoch: int) -> dict:
+    access_token = create_access_token(
+        data={"sub": username, "role": role, "epoch": epoch},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    refresh_token = create_access_token(
+        data={"sub": username, "epoch": epoch, "type": "refresh"},
+        expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "username": username,
+        "role": role
+    }
+
 @app.post("/login")
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    # Throttle before touching bcrypt so floods cost almost nothing
+    retry_after = max(
+        login_ip_limiter.consume(get_client_ip(request)),
+        login_user_limiter.consume(form_data.username.lower())
+    )
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts. Try again later.",
+            headers={"Retry-After": str(int(retry_after) + 1)},
+        )
+
     conn = get_db_connection()
     cur = conn.cursor()
     cur.execute("SELECT * FROM users WHERE username = %s", (form_data.username,))
     user = cur.fetchone()
 
-    if not user or not verify_password(form_data.password, user["password"]):
+    if not user or not await verify_password_async(form_data.password, user["password"]):
         log_audit(form_data.username, "login_failed", details={"reason": "invalid_credentials"})
         cur.close()
         conn.close()
@@ -464,27 +1840,79 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     # Log successful login
     log_audit(user["username"], "login_success")
 
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user["username"], "role": user.get("role", "viewer")},
-        expires_delta=access_token_expires
+    return issue_tokens(user["username"], user.get("role", "viewer"), user.get("token_epoch") or 0)
+
+@app.post("/token/refresh")
+async def refresh_access_token(body: RefreshRequest):
+    """Exchange a refresh token for a new token pair without re-checking the password."""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
     )
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "username": user["username"],
-        "role": user.get("role", "viewer")
-    }
+    try:
+        payload = jwt.decode(body.refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        raise credentials_exception
+    if payload.get("type") != "refresh" or not payload.get("sub"):
+        raise credentials_exception
+    user = get_user_state(payload["sub"])
+    if not user or not user.get("is_active", True) or payload.get("epoch", 0) != (user.get("token_epoch") or 0):
+        raise credentials_exception
+    return issue_tokens(payload["sub"], user.get("role") or "viewer", user.get("token_epoch") or 0)
 
 # Product routes
+PRODUCT_LIST_SQL = prepared_statements.register("product_list", "SELECT * FROM products ORDER BY date_added DESC")
+PUBLIC_PRODUCT_LIST_SQL = prepared_statements.register(
+    "public_product_list", "SELECT * FROM products WHERE out_of_stock = FALSE ORDER BY date_added DESC"
+)
+
+PRODUCT_LIST_SORTS = {
+    "date_added": "date_added DESC",
+    "ships": "lead_time_max_days ASC NULLS LAST, date_added DESC",
+    "expires": "expires_on ASC NULLS LAST, date_added DESC",
+}
+
+def fetch_product_list(cur, statement: str, base_condition: str, ships_within: Optional[int],
+                       expires_before: Optional[date], sort: str):
+    """Run a product list query; the unfiltered default goes through its prepared statement.
+
+    ships_within keeps products whose parsed lead time is at most that many
+    business days; expires_before keeps products expiring before that date.
+    """
+    if sort not in PRODUCT_LIST_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(PRODUCT_LIST_SORTS)}")
+    if ships_within is None and expires_before is None and sort == "date_added":
+        prepared_statements.execute(cur, statement)
+        return cur.fetchall()
+    conditions, params = [base_condition], []
+    if ships_within is not None:
+        conditions.append("lead_time_max_days <= %s")
+        params.append(ships_within)
+    if expires_before is not None:
+        conditions.append("expires_on < %s")
+        params.append(expires_before)
+    cur.execute(
+        f"SELECT * FROM products WHERE {' AND '.join(conditions)} ORDER BY {PRODUCT_LIST_SORTS[sort]}",
+        params
+    )
+    return cur.fetchall()
+
 @app.get("/products")
-async def get_products(current_user: str = Depends(get_current_user)):
-    conn = get_db_connection()
+async def get_products(
+    request: Request,
+    ships_within: Optional[int] = None,
+    expires_before: Optional[date] = None,
+    sort: str = "date_added",
+    current_user: str = Depends(get_current_user)
+):
+    conn = get_read_connection(request)
     cur = conn.cursor()
-    cur.execute("SELECT * FROM products ORDER BY date_added DESC")
-    products = cur.fetchall()
-    cur.close()
-    conn.close()
+    try:
+        products = fetch_product_list(cur, PRODUCT_LIST_SQL, "TRUE", ships_within, expires_before, sort)
+    finally:
+        cur.close()
+        conn.close()
     return {"products": products}
 
 def extract_unique_values(rows, field_name):
@@ -508,51 +1936,59 @@ def extract_unique_values(rows, field_name):
                     unique_values.add(part)
     return sorted(list(unique_values))
 
+# (response key, products column) in the order /products/filters reports them
+FILTER_FIELDS = [
+    ("categories", "category"),
+    ("room_types", "room_type"),
+    ("styles", "style"),
+    ("materials", "material"),
+    ("colors", "color"),
+    ("brands", "brand"),
+    ("conditions", "condition"),
+    ("fob_locations", "fob"),
+]
+FILTER_DISTINCT_FIELDS = {"category", "condition", "fob"}
+for _key, _field in FILTER_FIELDS:
+    if _field in FILTER_DISTINCT_FIELDS:
+        prepared_statements.register(
+            f"filter_{_field}",
+            f"SELECT DISTINCT {_field} FROM products WHERE {_field} IS NOT NULL AND {_field} != '' AND out_of_stock = FALSE ORDER BY {_field}"
+        )
+    else:
+        prepared_statements.register(
+            f"filter_{_field}",
+            f"SELECT {_field} FROM products WHERE {_field} IS NOT NULL AND {_field} != '' AND out_of_stock = FALSE"
+        )
+prepared_statements.register(
+    "filter_price_range",
+    "SELECT MIN(price) as min_price, MAX(price) as max_price FROM products WHERE out_of_stock = FALSE AND price IS NOT NULL"
+)
+
 @app.get("/products/filters")
-async def get_product_filters():
+async def get_product_filters(request: Request):
     """Get all available filter options from the database.
 
     Supports comma-separated multi-values in fields like room_type, style, material, color.
     For example, a product with room_type="Office, Living Room" will contribute both
     "Office" and "Living Room" as separate filter options.
     """
-    conn = get_db_connection()
+    conn = get_read_connection(request)
     cur = conn.cursor()
 
     # Get distinct values for each filter field
     filters = {}
 
-    # Categories (single value, no comma parsing needed)
-    cur.execute("SELECT DISTINCT category FROM products WHERE category IS NOT NULL AND category != '' AND out_of_stock = FALSE ORDER BY category")
-    filters["categories"] = [row["category"] for row in cur.fetchall()]
-
-    # Multi-value fields - fetch all values and parse comma-separated entries
-    cur.execute("SELECT room_type FROM products WHERE room_type IS NOT NULL AND room_type != '' AND out_of_stock = FALSE")
-    filters["room_types"] = extract_unique_values(cur.fetchall(), "room_type")
-
-    cur.execute("SELECT style FROM products WHERE style IS NOT NULL AND style != '' AND out_of_stock = FALSE")
-    filters["styles"] = extract_unique_values(cur.fetchall(), "style")
-
-    cur.execute("SELECT material FROM products WHERE material IS NOT NULL AND material != '' AND out_of_stock = FALSE")
-    filters["materials"] = extract_unique_values(cur.fetchall(), "material")
-
-    cur.execute("SELECT color FROM products WHERE color IS NOT NULL AND color != '' AND out_of_stock = FALSE")
-    filters["colors"] = extract_unique_values(cur.fetchall(), "color")
-
-    # Brands (single value typically, but support multi-value just in case)
-    cur.execute("SELECT brand FROM products WHERE brand IS NOT NULL AND brand != '' AND out_of_stock = FALSE")
-    filters["brands"] = extract_unique_values(cur.fetchall(), "brand")
-
-    # Conditions (single value, no comma parsing needed)
-    cur.execute("SELECT DISTINCT condition FROM products WHERE condition IS NOT NULL AND condition != '' AND out_of_stock = FALSE ORDER BY condition")
-    filters["conditions"] = [row["condition"] for row in cur.fetchall()]
-
-    # FOB locations (single value, no comma parsing needed)
-    cur.execute("SELECT DISTINCT fob FROM products WHERE fob IS NOT NULL AND fob != '' AND out_of_stock = FALSE ORDER BY fob")
-    filters["fob_locations"] = [row["fob"] for row in cur.fetchall()]
+    # Categories, conditions and FOB locations are single values; the other
+    # fields can hold comma-separated multi-values and are split in Python
+    for key, field in FILTER_FIELDS:
+        prepared_statements.execute(cur, f"filter_{field}")
+        if field in FILTER_DISTINCT_FIELDS:
+            filters[key] = [row[field] for row in cur.fetchall()]
+        else:
+            filters[key] = extract_unique_values(cur.fetchall(), field)
 
     # Price range
-    cur.execute("SELECT MIN(price) as min_price, MAX(price) as max_price FROM products WHERE out_of_stock = FALSE AND price IS NOT NULL")
+    prepared_statements.execute(cur, "filter_price_range")
     price_range = cur.fetchone()
     filters["price_range"] = {"min": price_range["min_price"] or 0, "max": price_range["max_price"] or 10000}
 
@@ -561,53 +1997,99 @@ async def get_product_filters():
     return filters
 
 @app.get("/products/public")
-async def get_public_products():
-    conn = get_db_connection()
+async def get_public_products(
+    request: Request,
+    ships_within: Optional[int] = None,
+    expires_before: Optional[date] = None,
+    sort: str = "date_added"
+):
+    conn = get_read_connection(request)
     cur = conn.cursor()
-    cur.execute("SELECT * FROM products WHERE out_of_stock = FALSE ORDER BY date_added DESC")
-    products = cur.fetchall()
-    cur.close()
-    conn.close()
-    return products
-
+    try:
+        products = fetch_product_list(cur, PUBLIC_PRODUCT_LIST_SQL, "out_of_stock = FALSE", ships_within, expires_before, sort)
+    finally:
+        cur.close()
+        conn.close()
+    return products
+
 @app.get("/products/category/{category}")
-async def get_products_by_category(category: str):
+async def get_products_by_category(request: Request, category: str, limit: int = 200, offset: int = 0):
     normalized_query = normalize_category_value(category)
-    conn = get_db_connection()
+    limit = max(1, min(limit, 500))
+    conn = get_read_connection(request)
     cur = conn.cursor()
     cur.execute(
         """
-        SELECT title, price, COALESCE(image_url, '') AS image_url, category
+        SELECT id, title, price, COALESCE(image_url, '') AS image_url, category,
+               COUNT(*) OVER () AS total
         FROM products
-        WHERE category IS NOT NULL
+        WHERE category_key = %s
         ORDER BY title ASC
-        """
+        LIMIT %s OFFSET %s
+        """,
+        (normalized_query, limit, max(offset, 0))
     )
     rows = cur.fetchall()
+    if not rows and offset > 0:
+        cur.execute("SELECT COUNT(*) AS total FROM products WHERE category_key = %s", (normalized_query,))
+        total = cur.fetchone()["total"]
+    else:
+        total = rows[0]["total"] if rows else 0
     cur.close()
     conn.close()
 
-    filtered = [
-        row for row in rows
-        if normalize_category_value(row.get("category")) == normalized_query
-    ]
-    if not filtered:
+    if not total:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"No products found in category {category}",
         )
 
-    display_category = (filtered[0].get("category") or category).strip()
+    display_category = ((rows[0].get("category") if rows else None) or category).strip()
 
     simplified = [
         {
+            "id": row.get("id"),
             "title": row.get("title"),
             "price": row.get("price"),
             "image_url": row.get("image_url") or "https://via.placeholder.com/150",
         }
-        for row in filtered
+        for row in rows
     ]
-    return {"category": display_category, "products": simplified}
+    return {
+        "category": display_category,
+        "products": simplified,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "has_more": offset + len(rows) < total
+    }
+
+def load_category_tree():
+    conn = replica_router.connect([], consistent=True)
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT id, path, name, parent_id, depth, product_count, active_count, min_price, max_price
+        FROM categories ORDER BY depth, name
+    """)
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    nodes = {row["id"]: {**row, "children": []} for row in rows}
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node["parent_id"])
+        (parent["children"] if parent else roots).append(node)
+    return roots
+
+@app.get("/categories")
+async def get_categories(request: Request, response: Response):
+    """Category taxonomy with per-node product counts and in-stock price ranges.
+
+    Served from the in-process cache; the products triggers keep the
+    categories table current and notify every worker when it changes.
+    """
+    tree, etag = settings_cache.get("categories", load_category_tree)
+    return etag_response(request, response, tree, etag)
 
 @app.get("/products/check-duplicate")
 async def check_duplicate(sku: Optional[str] = None, upc: Optional[str] = None, current_user: str = Depends(get_current_user)):
@@ -620,7 +2102,10 @@ async def check_duplicate(sku: Optional[str] = None, upc: Optional[str] = None,
 
     duplicates = []
     if sku and sku.strip():
-        cur.execute("SELECT id, title, sku, upc, vendor FROM products WHERE sku = %s AND sku != ''", (sku.strip(),))
+        cur.execute(
+            f"SELECT id, title, sku, upc, vendor FROM products WHERE {SKU_KEY_SQL} = %s AND {SKU_PRESENT_SQL}",
+            (sku_key(sku),)
+        )
         duplicates.extend(cur.fetchall())
 
     if upc and upc.strip():
@@ -635,15 +2120,16 @@ async def check_duplicate(sku: Optional[str] = None, upc: Optional[str] = None,
 
     return {"duplicate": len(duplicates) > 0, "products": duplicates}
 
-@app.post("/products")
-async def create_product(product: Product, current_user: str = Depends(get_current_user)):
-    conn = get_db_connection()
-    cur = conn.cursor()
+PRODUCT_INSERT_COLUMNS = """
+          title, category, vendor_id, vendor, price, moq, qty, upc, sku, lead_time,
+          exp_date, fob, image_url, out_of_stock, offer_date, last_sent, date_added,
+          room_type, style, material, color, brand, width, depth, height, weight,
+          condition, warranty, assembly_required, features, secondary_images
+"""
 
+def product_insert_values(product: Product, est_tz, current_est):
+    """Values for PRODUCT_INSERT_COLUMNS, resolving offer_date like the create form expects."""
     # Use current EST time for offer_date if not provided or if it's a date without time
-    est_tz = pytz.timezone('America/New_York')
-    current_est = datetime.now(est_tz)
-
     offer_date = product.offer_date
     if offer_date:
         # If offer_date is provided but has midnight time (12:00 AM), use current EST time
@@ -653,29 +2139,266 @@ async def create_product(product: Product, current_user: str = Depends(get_curre
     else:
         # If no offer_date provided, use current EST time
         offer_date = current_est
+    # Missing FOB / lead time fall back to the company defaults
+    return (
+        product.title, product.category, product.vendor_id, product.vendor, product.price,
+        product.moq, product.qty, product.upc, product.sku,
+        product.lead_time or company_default("default_lead_time", product.lead_time), product.exp_date,
+        product.fob or company_default("default_fob", product.fob),
+        product.image_url, product.out_of_stock, offer_date, product.last_sent, current_est,
+        product.room_type, product.style, product.material, product.color, product.brand,
+        product.width, product.depth, product.height, product.weight,
+        product.condition, product.warranty, product.assembly_required, product.features, product.secondary_images
+    )
 
-    cur.execute("""
-        INSERT INTO products (
-          title, category, vendor_id, vendor, price, moq, qty, upc, sku, lead_time,
-          exp_date, fob, image_url, out_of_stock, offer_date, last_sent, date_added,
-          room_type, style, material, color, brand, width, depth, height, weight,
-          condition, warranty, assembly_required, features, secondary_images
-        )
+BULK_MAX_ITEMS = 5000
+
+@app.post("/products/check-duplicates")
+async def check_duplicates(request: DuplicateCheckRequest, current_user: str = Depends(get_current_user)):
+    """Resolve many SKUs/UPCs to their existing products in one indexed query.
+
+    Returns maps from each identifier as sent to its matching products;
+    identifiers with no match map to an empty list.
+    """
+    skus = [sku for sku in request.skus if sku_key(sku)]
+    upcs = [upc for upc in request.upcs if upc and upc.strip()]
+    if len(skus) + len(upcs) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_ITEMS} identifiers per request")
+    sku_matches = {sku: [] for sku in request.skus}
+    upc_matches = {upc: [] for upc in request.upcs}
+    if not skus and not upcs:
+        return {"duplicate": False, "skus": sku_matches, "upcs": upc_matches}
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT id, title, sku, upc, vendor FROM products
+        WHERE ({SKU_KEY_SQL} = ANY(%s) AND {SKU_PRESENT_SQL})
+           OR (upc = ANY(%s) AND upc != '')
+        ORDER BY id
+    """, ([sku_key(sku) for sku in skus], [upc.strip() for upc in upcs]))
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+
+    by_sku = defaultdict(list)
+    by_upc = defaultdict(list)
+    for row in rows:
+        if sku_key(row["sku"]):
+            by_sku[sku_key(row["sku"])].append(row)
+        if row["upc"]:
+            by_upc[row["upc"]].append(row)
+    for sku in skus:
+        sku_matches[sku] = by_sku.get(sku_key(sku), [])
+    for upc in upcs:
+        upc_matches[upc] = by_upc.get(upc.strip(), [])
+    return {"duplicate": bool(rows), "skus": sku_matches, "upcs": upc_matches}
+
+@app.post("/products")
+async def create_product(product: Product, on_conflict: str = "reject", current_user: str = Depends(get_current_user)):
+    """Create a product, resolving a normalized-SKU conflict in the same statement.
+
+    on_conflict="reject" returns 409 with the existing product id;
+    on_conflict="update" overwrites the existing product with the fields sent.
+    """
+    if on_conflict not in ("reject", "update"):
+        raise HTTPException(status_code=400, detail="on_conflict must be 'reject' or 'update'")
+    conn = get_db_connection()
+    cur = conn.cursor()
+    est_tz = pytz.timezone('America/New_York')
+    current_est = datetime.now(est_tz)
+    conflict_clause = ""
+    conflict_params = ()
+    if SKU_UNIQUE_INDEX_READY:
+        if on_conflict == "update":
+            columns = [column for column in product.dict(exclude_unset=True) if column in PRODUCT_UPDATE_TYPES] or ["sku"]
+            assignments = []
+            for column in columns:
+                if column in ("lead_time", "fob"):
+                    # EXCLUDED holds the company default when these are blank;
+                    # an existing product keeps its own value instead
+                    assignments.append(f"{column} = COALESCE(NULLIF(%s, ''), products.{column})")
+                    conflict_params += (getattr(product, column),)
+                else:
+                    assignments.append(f"{column} = EXCLUDED.{column}")
+            action = "DO UPDATE SET " + ", ".join(assignments)
+        else:
+            action = "DO NOTHING"
+        conflict_clause = f"ON CONFLICT ({SKU_KEY_SQL}) WHERE {SKU_PRESENT_SQL} {action}"
+    cur.execute(f"""
+        INSERT INTO products ({PRODUCT_INSERT_COLUMNS})
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        RETURNING id
-        """, (
-            product.title, product.category, product.vendor_id, product.vendor, product.price,
-            product.moq, product.qty, product.upc, product.sku, product.lead_time, product.exp_date, product.fob,
-            product.image_url, product.out_of_stock, offer_date, product.last_sent, current_est,
-            product.room_type, product.style, product.material, product.color, product.brand,
-            product.width, product.depth, product.height, product.weight,
-            product.condition, product.warranty, product.assembly_required, product.features, product.secondary_images
-        ))
-    product_id = cur.fetchone()['id']
+        {conflict_clause}
+        RETURNING id, (xmax = 0) AS inserted
+        """, product_insert_values(product, est_tz, current_est) + conflict_params)
+    row = cur.fetchone()
+    if row is None:
+        # DO NOTHING hit an existing SKU
+        cur.execute(f"SELECT id FROM products WHERE {SKU_KEY_SQL} = %s AND {SKU_PRESENT_SQL}", (sku_key(product.sku),))
+        existing = cur.fetchone()
+        conn.rollback()
+        cur.close()
+        conn.close()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": f"A product with SKU '{product.sku}' already exists",
+                "action": "rejected",
+                "product_id": existing["id"] if existing else None,
+            },
+        )
     conn.commit()
     cur.close()
     conn.close()
-    return {"message": "Product created successfully", "product_id": product_id}
+    if row["inserted"]:
+        return {"message": "Product created successfully", "product_id": row["id"], "action": "inserted"}
+    return {"message": "Existing product updated", "product_id": row["id"], "action": "updated"}
+
+def check_bulk_size(count: int):
+    if count == 0:
+        raise HTTPException(status_code=400, detail="No items provided")
+    if count > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_ITEMS} items per request")
+
+# Batch endpoints: registered before /products/{id} so "bulk" is not parsed as an id
+@app.post("/products/bulk")
+async def bulk_create_products(products: List[Product], current_user: str = Depends(get_current_user)):
+    """Create many products in one transaction and one multi-row INSERT."""
+    check_bulk_size(len(products))
+    est_tz = pytz.timezone('America/New_York')
+    current_est = datetime.now(est_tz)
+    conflict_clause = f"ON CONFLICT ({SKU_KEY_SQL}) WHERE {SKU_PRESENT_SQL} DO NOTHING" if SKU_UNIQUE_INDEX_READY else ""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    # RETURNING order is not guaranteed, so each item gets its id up front and
+    # the ids that come back say which items were inserted
+    cur.execute("SELECT nextval(pg_get_serial_sequence('products', 'id')) AS id FROM generate_series(1, %s)",
+                (len(products),))
+    ids = [row["id"] for row in cur.fetchall()]
+    rows = execute_values(
+        cur,
+        f"INSERT INTO products (id, {PRODUCT_INSERT_COLUMNS}) VALUES %s {conflict_clause} RETURNING id",
+        [(product_id,) + product_insert_values(product, est_tz, current_est) for product_id, product in zip(ids, products)],
+        page_size=len(products),
+        fetch=True
+    )
+    conn.commit()
+    cur.close()
+    conn.close()
+    created = {row["id"] for row in rows}
+    results = []
+    for index, product_id in enumerate(ids):
+        if product_id in created:
+            results.append({"index": index, "product_id": product_id, "status": "created"})
+        else:
+            results.append({"index": index, "product_id": None, "status": "duplicate_sku"})
+    return {"created": len(created), "results": results}
+
+@app.patch("/products/bulk")
+async def bulk_update_products(items: List[ProductBulkUpdateItem], current_user: str = Depends(get_current_user)):
+    """Apply per-item field sets in one transaction.
+
+    Items that touch the same set of fields share one UPDATE ... FROM (VALUES ...).
+    """
+    check_bulk_size(len(items))
+    ids = [item.id for item in items]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Each product id may appear only once")
+    groups = defaultdict(list)
+    results = {}
+    for item in items:
+        fields = item.dict(exclude_none=True, exclude={"id"})
+        if not fields:
+            results[item.id] = "no_fields"
+            continue
+        groups[tuple(sorted(fields))].append(item.id)
+    conn = get_db_connection()
+    cur = conn.cursor()
+    by_id = {item.id: item for item in items}
+    for columns, group_ids in groups.items():
+        template = "(" + ", ".join(["%s::integer"] + [f"%s::{PRODUCT_UPDATE_TYPES[column]}" for column in columns]) + ")"
+        rows = [[product_id] + [getattr(by_id[product_id], column) for column in columns] for product_id in group_ids]
+        try:
+            updated = execute_values(
+                cur,
+                f"UPDATE products AS p SET {', '.join(f'{column} = v.{column}' for column in columns)} "
+                f"FROM (VALUES %s) AS v(id, {', '.join(columns)}) WHERE p.id = v.id RETURNING p.id",
+                rows,
+                template=template,
+                page_size=len(rows),
+                fetch=True
+            )
+        except psycopg2.errors.UniqueViolation as e:
+            conn.rollback()
+            cur.close()
+            conn.close()
+            raise HTTPException(status_code=409, detail=f"SKU conflict, no changes applied: {e.diag.message_detail}")
+        updated_ids = {row["id"] for row in updated}
+        for product_id in group_ids:
+            results[product_id] = "updated" if product_id in updated_ids else "not_found"
+    conn.commit()
+    cur.close()
+    conn.close()
+    return {
+        "updated": sum(1 for result in results.values() if result == "updated"),
+        "results": [{"id": product_id, "status": results[product_id]} for product_id in ids],
+    }
+
+@app.post("/products/bulk/mark-out-of-stock")
+async def bulk_mark_out_of_stock(request: ProductIdList, current_user: str = Depends(get_current_user)):
+    check_bulk_size(len(request.ids))
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("UPDATE products SET out_of_stock = true WHERE id = ANY(%s) RETURNING id", (request.ids,))
+    updated_ids = {row["id"] for row in cur.fetchall()}
+    conn.commit()
+    cur.close()
+    conn.close()
+    return {
+        "updated": len(updated_ids),
+        "results": [{"id": product_id, "status": "updated" if product_id in updated_ids else "not_found"} for product_id in request.ids],
+    }
+
+@app.post("/products/bulk/delete")
+async def bulk_delete_products(request: ProductBulkDelete, current_user: str = Depends(get_current_user)):
+    """Delete products by id list and/or predicate (vendor, vendor_id, out_of_stock).
+
+    All given criteria must match.
+    """
+    conditions = []
+    values = []
+    if request.ids is not None:
+        check_bulk_size(len(request.ids))
+        conditions.append("id = ANY(%s)")
+        values.append(request.ids)
+    if request.vendor is not None:
+        conditions.append("vendor = %s")
+        values.append(request.vendor)
+    if request.vendor_id is not None:
+        conditions.append("vendor_id = %s")
+        values.append(request.vendor_id)
+    if request.out_of_stock is not None:
+        conditions.append("out_of_stock = %s")
+        values.append(request.out_of_stock)
+    if not conditions:
+        raise HTTPException(status_code=400, detail="Provide ids or at least one filter")
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(f"DELETE FROM products WHERE {' AND '.join(conditions)} RETURNING id", values)
+    deleted_ids = [row["id"] for row in cur.fetchall()]
+    conn.commit()
+    cur.close()
+    conn.close()
+
+    log_audit(current_user, "products_bulk_deleted", "product", None,
+              {"criteria": request.dict(exclude_none=True, exclude={"ids"}), "count": len(deleted_ids)})
+
+    if request.ids is not None:
+        deleted = set(deleted_ids)
+        results = [{"id": product_id, "status": "deleted" if product_id in deleted else "not_found"} for product_id in request.ids]
+    else:
+        results = [{"id": product_id, "status": "deleted"} for product_id in deleted_ids]
+    return {"deleted": len(deleted_ids), "results": results}
 
 @app.patch("/products/{id}")
 async def update_product(id: int, product: ProductUpdate, current_user: str = Depends(get_current_user)):
@@ -780,7 +2503,13 @@ async def update_product(id: int, product: ProductUpdate, current_user: str = De
         raise HTTPException(status_code=400, detail="No fields to update")
     values.append(id)
     query = f"UPDATE products SET {', '.join(update_fields)} WHERE id = %s"
-    cur.execute(query, values)
+    try:
+        cur.execute(query, values)
+    except psycopg2.errors.UniqueViolation:
+        conn.rollback()
+        cur.close()
+        conn.close()
+        raise HTTPException(status_code=409, detail=f"A product with SKU '{product.sku}' already exists")
     if cur.rowcount == 0:
         cur.close()
         conn.close()
@@ -818,10 +2547,157 @@ async def mark_product_out_of_stock(id: int, current_user: str = Depends(get_cur
     conn.close()
     return {"message": "Product marked as out-of-stock"}
 
-@app.get("/products/search")
-async def search_products(query: str, current_user: str = Depends(get_current_user)):
+@app.get("/products/{id}/history")
+async def get_product_history(id: int, limit: int = 100, current_user: str = Depends(get_current_user)):
+    """Price, qty and stock changes for a product, newest first.
+
+    Each entry only carries the fields that changed in that update; the
+    others are null in both their _old and _new values.
+    """
     conn = get_db_connection()
     cur = conn.cursor()
+    cur.execute("SELECT id, price, qty, out_of_stock FROM products WHERE id = %s", (id,))
+    product = cur.fetchone()
+    if not product:
+        cur.close()
+        conn.close()
+        raise HTTPException(status_code=404, detail="Product not found")
+    cur.execute("""
+        SELECT changed_at, price_old, price_new, qty_old, qty_new, out_of_stock_old, out_of_stock_new
+        FROM product_history
+        WHERE product_id = %s
+        ORDER BY changed_at DESC, id DESC
+        LIMIT %s
+    """, (id, max(1, min(limit, 1000))))
+    history = cur.fetchall()
+    cur.close()
+    conn.close()
+    return {"product_id": id, "current": product, "history": history}
+
+FIT_SORTS = {
+    "volume": "volume ASC NULLS LAST, id",
+    "-volume": "volume DESC NULLS LAST, id",
+    "price": "price ASC NULLS LAST, id",
+    "-price": "price DESC NULLS LAST, id",
+}
+
+@app.get("/products/fit")
+async def get_fitting_products(
+    request: Request,
+    max_width: Optional[float] = None,
+    max_depth: Optional[float] = None,
+    max_height: Optional[float] = None,
+    max_weight: Optional[float] = None,
+    min_width: Optional[float] = None,
+    min_depth: Optional[float] = None,
+    min_height: Optional[float] = None,
+    min_weight: Optional[float] = None,
+    min_volume: Optional[float] = None,
+    max_volume: Optional[float] = None,
+    rotate: bool = True,
+    category: Optional[str] = None,
+    in_stock: bool = True,
+    sort: str = "volume",
+    limit: int = 100,
+    offset: int = 0
+):
+    """Products whose dimensions (inches / lbs) fall within the given ranges.
+
+    With rotate (the default) width and depth describe a footprint in either
+    orientation: a 30x60 desk fits max_width=60&max_depth=30. Volume is in
+    cubic inches. Products missing a constrained dimension are excluded.
+    """
+    if sort not in FIT_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(FIT_SORTS)}")
+    limit = max(1, min(limit, 500))
+    conditions, params = [], []
+
+    def bound(expression, value, operator):
+        if value is not None:
+            conditions.append(f"{expression} {operator} %s")
+            params.append(value)
+
+    # The footprint bounds also hold for a fixed orientation (width <= W and
+    # depth <= D imply short side <= min(W, D)), so they always lead and use
+    # idx_products_fit; the exact per-axis check follows
+    upper = [value for value in (max_width, max_depth) if value is not None]
+    lower = [value for value in (min_width, min_depth) if value is not None]
+    if len(upper) == 2:
+        bound("footprint_short", min(upper), "<=")
+        bound("footprint_long", max(upper), "<=")
+    elif upper:
+        bound("footprint_short", upper[0], "<=")
+    if len(lower) == 2:
+        bound("footprint_short", min(lower), ">=")
+        bound("footprint_long", max(lower), ">=")
+    elif lower:
+        bound("footprint_long", lower[0], ">=")
+    # With both minimums and maximums the footprint alone lets through shapes
+    # that fit neither way (15x55 for width 10-60, depth 20-30), so recheck
+    # each orientation on the width/depth the index carries
+    orientations = [("width", "depth"), ("depth", "width")] if rotate else [("width", "depth")]
+    checks = []
+    for across, deep in orientations:
+        axis = [
+            (across, max_width, "<="), (deep, max_depth, "<="),
+            (across, min_width, ">="), (deep, min_depth, ">="),
+        ]
+        checks.append(" AND ".join(f"{column} {operator} %s" for column, value, operator in axis if value is not None))
+        params.extend(value for _, value, _ in axis if value is not None)
+    if checks[0]:
+        conditions.append("(" + " OR ".join(f"({check})" for check in checks) + ")")
+    bound("height", max_height, "<=")
+    bound("height", min_height, ">=")
+    bound("weight", max_weight, "<=")
+    bound("weight", min_weight, ">=")
+    bound("volume", max_volume, "<=")
+    bound("volume", min_volume, ">=")
+    if category:
+        # A category and everything beneath it
+        path = category_path_value(category)
+        conditions.append("(category_path = %s OR category_path LIKE %s)")
+        params.extend([path, path.replace("_", "\\_") + "/%"])
+    if in_stock:
+        conditions.append("out_of_stock = FALSE")
+    where = " AND ".join(conditions) or "TRUE"
+
+    conn = get_read_connection(request)
+    cur = conn.cursor()
+    # Page of ids from idx_products_fit alone, then the full rows for just that page
+    cur.execute(f"""
+        SELECT id, COUNT(*) OVER () AS total
+        FROM products
+        WHERE {where}
+        ORDER BY {FIT_SORTS[sort]}
+        LIMIT %s OFFSET %s
+    """, params + [limit, max(offset, 0)])
+    page = cur.fetchall()
+    if not page and offset > 0:
+        cur.execute(f"SELECT COUNT(*) AS total FROM products WHERE {where}", params)
+        total = cur.fetchone()["total"]
+    else:
+        total = page[0]["total"] if page else 0
+    products = []
+    if page:
+        cur.execute("SELECT * FROM products WHERE id = ANY(%s)", ([row["id"] for row in page],))
+        by_id = {product["id"]: product for product in cur.fetchall()}
+        products = [by_id[row["id"]] for row in page if row["id"] in by_id]
+    cur.close()
+    conn.close()
+    for product in products:
+        product["volume_cu_ft"] = round(product["volume"] / 1728, 2) if product["volume"] else None
+    return {
+        "products": products,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "has_more": offset + len(products) < total
+    }
+
+@app.get("/products/search")
+async def search_products(request: Request, query: str, current_user: str = Depends(get_current_user)):
+    conn = get_read_connection(request)
+    cur = conn.cursor()
     search_query = f"%{query}%"
     cur.execute("""
         SELECT * FROM products
@@ -837,112 +2713,334 @@ async def search_products(query: str, current_user: str = Depends(get_current_us
     conn.close()
     return {"products": products}
 
-@app.post("/products/import")
-async def import_products(file: UploadFile = File(...), current_user: str = Depends(get_current_user)):
-    contents = await file.read()
+# CSV header (lowercased) -> products column
+IMPORT_FIELD_MAP = {
+    "date": "offer_date",
+    "offer date": "offer_date",
+    "last sent": "last_sent",
+    "sku": "sku",
+    "price": "price",
+    "moq": "moq",
+    "qty": "qty",
+    "upc": "upc",
+    "vendor": "vendor",
+    "lead time": "lead_time",
+    "exp date": "exp_date",
+    "fob": "fob",
+    "vendor id": "vendor_id",
+    "image url": "image_url",
+    "title": "title",
+    "category": "category",
+    "out of stock": "out_of_stock",
+    # Furniture-specific fields
+    "room type": "room_type",
+    "style": "style",
+    "material": "material",
+    "color": "color",
+    "brand": "brand",
+    "width": "width",
+    "depth": "depth",
+    "height": "height",
+    "weight": "weight",
+    "condition": "condition",
+    "warranty": "warranty",
+    "assembly required": "assembly_required",
+}
+IMPORT_FLOAT_FIELDS = {"price", "width", "depth", "height", "weight"}
+IMPORT_INT_FIELDS = {"moq", "qty"}
+IMPORT_BOOL_FIELDS = {"out_of_stock", "assembly_required"}
+IMPORT_DATE_FIELDS = {"offer_date", "last_sent"}
+IMPORT_DATE_PATTERNS = [
+    "%m/%d/%Y, %I:%M:%S %p",  # 11/21/2025, 12:00:00 AM
+    "%m/%d/%Y %I:%M:%S %p",   # 11/21/2025 12:00:00 AM
+    "%m/%d/%Y",               # 11/21/2025
+    "%Y-%m-%d",               # 2025-11-21
+    "%m-%d-%Y",               # 11-21-2025
+    "%Y-%m-%d %H:%M:%S",      # 2025-11-21 00:00:00
+    "%m/%d/%Y %H:%M:%S",      # 11/21/2025 00:00:00
+]
+
+IMPORT_ISO_DATE_PATTERNS = {"%Y-%m-%d", "%Y-%m-%d %H:%M:%S"}
+IMPORT_CURRENCY_SYMBOLS = "$€£¥"
+IMPORT_INFER_SAMPLE_SIZE = 200
+DECIMAL_COMMA_RE = re.compile(r"\d,\d{1,2}$")            # 1.234,50 / 12,5
+DECIMAL_POINT_RE = re.compile(r"\d\.\d{1,2}$|\d,\d{3}(\.|$)")  # 1,234.50 / 12.5 / 1,234
+
+def infer_date_pattern(samples):
+    """Pick the date pattern that parses the most sample values."""
+    best_pattern, best_hits = None, 0
+    for pattern in IMPORT_DATE_PATTERNS:
+        hits = 0
+        for value in samples:
+            try:
+                datetime.strptime(value, pattern)
+                hits += 1
+            except ValueError:
+                pass
+        if hits > best_hits:
+            best_pattern, best_hits = pattern, hits
+            if hits == len(samples):
+                break
+    return best_pattern
+
+def infer_numeric_format(samples):
+    """Detect currency symbols and the decimal separator used by a column."""
+    currency = "".join(ch for ch in IMPORT_CURRENCY_SYMBOLS if any(ch in value for value in samples))
+    decimal_comma = (
+        any(DECIMAL_COMMA_RE.search(value) for value in samples)
+        and not any(DECIMAL_POINT_RE.search(value) for value in samples)
+    )
+    strip = IMPORT_CURRENCY_SYMBOLS + " " + ("." if decimal_comma else ",")
+    return {"strip": strip, "decimal_comma": decimal_comma, "currency": currency}
+
+def build_import_plan(headers, raw_rows):
+    """Resolve the header mapping and per-column formats once per file."""
+    positions = {}
+    for index, header in enumerate(headers):
+        key = (header or "").strip().lower()
+        if key:
+            positions[key] = index  # Last duplicate header wins, like DictReader
+    fields = []
+    for header, column in IMPORT_FIELD_MAP.items():
+        index = positions.get(header)
+        if index is None:
+            continue
+        samples = []
+        for _, values in raw_rows:
+            if index < len(values) and values[index].strip():
+                samples.append(values[index].strip())
+                if len(samples) >= IMPORT_INFER_SAMPLE_SIZE:
+                    break
+        if column in IMPORT_FLOAT_FIELDS:
+            kind, fmt = "float", infer_numeric_format(samples)
+        elif column in IMPORT_INT_FIELDS:
+            kind, fmt = "int", infer_numeric_format(samples)
+        elif column in IMPORT_BOOL_FIELDS:
+            kind, fmt = "bool", None
+        elif column in IMPORT_DATE_FIELDS:
+            kind, fmt = "date", infer_date_pattern(samples)
+        else:
+            kind, fmt = "text", None
+        fields.append({"header": headers[index].strip(), "index": index, "column": column, "kind": kind, "format": fmt})
+    return {"sku_index": positions.get("sku"), "title_index": positions.get("title"), "fields": fields}
+
+def compile_import_converter(field):
+    """Build a fast converter for one column. Returns (convert, fallback)."""
+    kind, fmt = field["kind"], field["format"]
+    if kind in ("float", "int"):
+        table = {ord(ch): None for ch in fmt["strip"]}
+        decimal_comma = fmt["decimal_comma"]
+        cast = float if kind == "float" else (lambda text: int(float(text)))
+
+        def convert(value):
+            text = value.translate(table)
+            if decimal_comma:
+                text = text.replace(",", ".")
+            return cast(text)
+        # Original behaviour: only thousands separators stripped
+        return convert, lambda value: cast(value.replace(",", ""))
+    if kind == "bool":
+        return (lambda value: value.lower() in ("true", "1", "yes", "y")), None
+    if kind == "date":
+        def fallback(value):
+            for pattern in IMPORT_DATE_PATTERNS:
+                try:
+                    return datetime.strptime(value, pattern)
+                except ValueError:
+                    continue
+            raise ValueError(value)
+        if fmt in IMPORT_ISO_DATE_PATTERNS:
+            return datetime.fromisoformat, fallback
+        if fmt == "%m/%d/%Y":
+            def convert(value):
+                month, day, year = value.split("/")
+                if len(year) != 4:
+                    raise ValueError(value)
+                return datetime(int(year), int(month), int(day))
+            return convert, fallback
+        if fmt:
+            return (lambda value: datetime.strptime(value, fmt)), fallback
+        return fallback, None
+    return (lambda value: value), None
+
+def convert_import_rows(plan, raw_rows):
+    """Convert raw CSV rows into product records using a prepared plan."""
+    converters = [(field, *compile_import_converter(field)) for field in plan["fields"]]
+    stats = {field["column"]: {"parsed": 0, "empty": 0, "invalid": 0, "fallback": 0} for field in plan["fields"]}
+    sku_index, title_index = plan["sku_index"], plan["title_index"]
+    rows = []
+    skipped_rows = []
+    for line, values in raw_rows:
+        width = len(values)
+        sku_value = values[sku_index].strip() if sku_index is not None and sku_index < width else ""
+        title_value = values[title_index].strip() if title_index is not None and title_index < width else ""
+        if not sku_value and not title_value:
+            skipped_rows.append({"line": line, "reason": "missing sku and title"})
+            continue
+        record = {}
+        for field, convert, fallback in converters:
+            column = field["column"]
+            index = field["index"]
+            value = values[index].strip() if index < width else ""
+            column_stats = stats[column]
+            if not value:
+                column_stats["empty"] += 1
+                continue
+            try:
+                record[column] = convert(value)
+                column_stats["parsed"] += 1
+            except (ValueError, TypeError):
+                if fallback is None:
+                    column_stats["invalid"] += 1
+                    continue
+                try:
+                    record[column] = fallback(value)
+                    column_stats["fallback"] += 1
+                except (ValueError, TypeError):
+                    column_stats["invalid"] += 1
+        rows.append({"line": line, "sku": sku_value or None, "title": title_value or None, "record": record})
+    return rows, skipped_rows, stats
+
+def parse_import_file(contents: bytes):
+    """Decode an uploaded CSV and convert each row into a product record.
+
+    Header mapping, date patterns and numeric formats are inferred once per
+    file, then every row is converted with the compiled per-column parsers.
+    Returns (rows, skipped_rows, column_stats). Each row is a dict with the
+    CSV line number, the SKU/title used for matching and the typed column
+    values to write.
+    """
     if not contents:
         raise HTTPException(status_code=400, detail="Uploaded file is empty")
     try:
         text = contents.decode("utf-8-sig")
     except UnicodeDecodeError:
         text = contents.decode("latin-1")
-    reader = csv.DictReader(io.StringIO(text))
-    if reader.fieldnames is None:
+    reader = csv.reader(io.StringIO(text))
+    headers = next(reader, None)
+    if headers is None:
         raise HTTPException(status_code=400, detail="CSV file is missing headers")
-    field_map = {
-        "date": "offer_date",
-        "offer date": "offer_date",
-        "last sent": "last_sent",
-        "sku": "sku",
-        "price": "price",
-        "moq": "moq",
-        "qty": "qty",
-        "upc": "upc",
-        "vendor": "vendor",
-        "lead time": "lead_time",
-        "exp date": "exp_date",
-        "fob": "fob",
-        "vendor id": "vendor_id",
-        "image url": "image_url",
-        "title": "title",
-        "category": "category",
-        "out of stock": "out_of_stock",
-        # Furniture-specific fields
-        "room type": "room_type",
-        "style": "style",
-        "material": "material",
-        "color": "color",
-        "brand": "brand",
-        "width": "width",
-        "depth": "depth",
-        "height": "height",
-        "weight": "weight",
-        "condition": "condition",
-        "warranty": "warranty",
-        "assembly required": "assembly_required",
-    }
-    float_fields = {"price", "width", "depth", "height", "weight"}
-    int_fields = {"moq", "qty"}
-    bool_fields = {"out_of_stock", "assembly_required"}
-    conn = get_db_connection()
-    cur = conn.cursor()
-    inserted = updated = skipped = 0
-    for raw_row in reader:
-        row = {(key or "").strip(): (value or "").strip() for key, value in raw_row.items()}
-        normalized = {key.lower(): value for key, value in row.items() if key}
-        sku_value = normalized.get("sku") or None
-        title_value = normalized.get("title") or None
-        if not sku_value and not title_value:
-            skipped += 1
+    raw_rows = [(reader.line_num, values) for values in reader if values]
+    plan = build_import_plan(headers, raw_rows)
+
+    rows, skipped_rows, totals = convert_import_rows(plan, raw_rows)
+    column_stats = {}
+    for field in plan["fields"]:
+        fmt = field["format"]
+        column_stats[field["column"]] = {
+            "header": field["header"],
+            "kind": field["kind"],
+            "format": fmt if not isinstance(fmt, dict) else {"decimal_comma": fmt["decimal_comma"], "currency": fmt["currency"]},
+            **totals[field["column"]],
+        }
+    return rows, skipped_rows, column_stats
+
+def build_import_preview(cur, rows, skipped_rows, preview_limit: int):
+    """Compute what an import would do without writing anything.
+
+    Every product the file could match is fetched in one query, then the rows
+    are replayed in order against that snapshot so repeated SKUs inside the
+    file resolve exactly as they would during the real import.
+    """
+    skus = list({sku_key(row["sku"]) for row in rows if row["sku"]})
+    titles = list({row["title"] for row in rows if row["title"]})
+    columns = sorted(set(IMPORT_FIELD_MAP.values()))
+    cur.execute(
+        f"SELECT id, {', '.join(columns)} FROM products "
+        f"WHERE ({SKU_KEY_SQL} = ANY(%s) AND {SKU_PRESENT_SQL}) OR title = ANY(%s) ORDER BY id",
+        (skus, titles)
+    )
+    state = {}
+    by_sku = {}
+    by_title = {}
+    for product in cur.fetchall():
+        state[product["id"]] = dict(product)
+        if sku_key(product["sku"]):
+            by_sku.setdefault(sku_key(product["sku"]), product["id"])
+        if product["title"]:
+            by_title.setdefault(product["title"], product["id"])
+
+    inserts = []
+    updates = []
+    skipped = list(skipped_rows)
+    unchanged = price_changes = 0
+    for row in rows:
+        record = row["record"]
+        key = by_sku.get(sku_key(row["sku"])) if row["sku"] else None
+        if key is None and row["title"]:
+            key = by_title.get(row["title"])
+        if not record:
+            skipped.append({"line": row["line"], "reason": "no importable fields"})
             continue
-        record = {}
-        for header, column in field_map.items():
-            value = normalized.get(header)
-            if value in (None, ""):
+        if key is None:
+            # Later rows in the same file can match this pending insert
+            key = f"new:{row['line']}"
+            state[key] = dict(record)
+            inserts.append({"line": row["line"], "sku": row["sku"], "title": row["title"], "record": record})
+        else:
+            current = state[key]
+            changes = {
+                column: {"before": current.get(column), "after": value}
+                for column, value in record.items()
+                if current.get(column) != value
+            }
+            current.update(record)
+            if not changes:
+                unchanged += 1
                 continue
-            if column in float_fields:
-                try:
-                    record[column] = float(value.replace(",", ""))
-                except ValueError:
-                    continue
-            elif column in int_fields:
-                try:
-                    record[column] = int(float(value.replace(",", "")))
-                except ValueError:
-                    continue
-            elif column in bool_fields:
-                # Handle boolean values: "true", "false", "1", "0", etc.
-                record[column] = value.lower() in ("true", "1", "yes", "y")
-            elif column in ("offer_date", "last_sent"):
-                parsed = None
-                # Try multiple date formats including ones with time
-                patterns = [
-                    "%m/%d/%Y, %I:%M:%S %p",  # 11/21/2025, 12:00:00 AM
-                    "%m/%d/%Y %I:%M:%S %p",   # 11/21/2025 12:00:00 AM
-                    "%m/%d/%Y",               # 11/21/2025
-                    "%Y-%m-%d",               # 2025-11-21
-                    "%m-%d-%Y",               # 11-21-2025
-                    "%Y-%m-%d %H:%M:%S",      # 2025-11-21 00:00:00
-                    "%m/%d/%Y %H:%M:%S",      # 11/21/2025 00:00:00
-                ]
-                for pattern in patterns:
-                    try:
-                        parsed = datetime.strptime(value, pattern)
-                        break
-                    except ValueError:
-                        continue
-                if parsed:
-                    record[column] = parsed
-            else:
-                record[column] = value
+            if "price" in changes:
+                price_changes += 1
+            updates.append({
+                "line": row["line"],
+                "product_id": key if isinstance(key, int) else None,
+                "sku": current.get("sku"),
+                "title": current.get("title"),
+                "changes": changes,
+            })
+        if record.get("sku"):
+            by_sku.setdefault(sku_key(record["sku"]), key)
+        if record.get("title"):
+            by_title.setdefault(record["title"], key)
+
+    return {
+        "dry_run": True,
+        "summary": {
+            "rows": len(rows) + len(skipped_rows),
+            "inserts": len(inserts),
+            "updates": len(updates),
+            "unchanged": unchanged,
+            "skipped": len(skipped),
+            "price_changes": price_changes,
+        },
+        "inserts": inserts[:preview_limit],
+        "updates": updates[:preview_limit],
+        "skipped": skipped[:preview_limit],
+    }
+
+IMPORT_SKU_LOOKUP_SQL = prepared_statements.register(
+    "import_sku_lookup", f"SELECT id FROM products WHERE {SKU_KEY_SQL} = %s AND {SKU_PRESENT_SQL}"
+)
+IMPORT_TITLE_LOOKUP_SQL = prepared_statements.register("import_title_lookup", "SELECT id FROM products WHERE title = %s")
+
+def apply_import_rows(cur, rows):
+    """Write parsed import rows, matching existing products by SKU then title.
+
+    Updates carry a content-hash guard so rows whose importable fields would
+    not change are skipped without writing a new tuple.
+    """
+    inserted = updated = unchanged = skipped = 0
+    for row in rows:
+        sku_value = row["sku"]
+        title_value = row["title"]
+        record = row["record"]
         product_id = None
         if sku_value:
-            cur.execute("SELECT id FROM products WHERE sku = %s", (sku_value,))
+            prepared_statements.execute(cur, IMPORT_SKU_LOOKUP_SQL, (sku_key(sku_value),))
             match = cur.fetchone()
             if match:
                 product_id = match["id"]
         if product_id is None and title_value:
-            cur.execute("SELECT id FROM products WHERE title = %s", (title_value,))
+            prepared_statements.execute(cur, IMPORT_TITLE_LOOKUP_SQL, (title_value,))
             match = cur.fetchone()
             if match:
                 product_id = match["id"]
@@ -954,15 +3052,31 @@ async def import_products(file: UploadFile = File(...), current_user: str = Depe
                     update_fields.append(f"{column} = %s")
                     values.append(value)
                 values.append(product_id)
+                # Hash of the row as it would look after the update
+                hash_args = []
+                for column, col_type in PRODUCT_CONTENT_COLUMNS:
+                    if column in record:
+                        hash_args.append(f"%s::{col_type}")
+                        values.append(record[column])
+                    else:
+                        hash_args.append(column)
                 cur.execute(
-                    f"UPDATE products SET {', '.join(update_fields)} WHERE id = %s",
+                    f"UPDATE products SET {', '.join(update_fields)} WHERE id = %s "
+                    f"AND content_hash IS DISTINCT FROM products_content_hash({', '.join(hash_args)})",
                     values
                 )
-                updated += 1
+                if cur.rowcount:
+                    updated += 1
+                else:
+                    unchanged += 1
             else:
                 skipped += 1
         else:
             if record:
+                record = dict(record)
+                for column, setting in (("fob", "default_fob"), ("lead_time", "default_lead_time")):
+                    if not record.get(column) and company_default(setting):
+                        record[column] = company_default(setting)
                 columns = list(record.keys())
                 placeholders = ["%s"] * len(columns)
                 values = [record[column] for column in columns]
@@ -976,94 +3090,523 @@ async def import_products(file: UploadFile = File(...), current_user: str = Depe
                 inserted += 1
             else:
                 skipped += 1
-    conn.commit()
-    cur.close()
-    conn.close()
-    return {"inserted": inserted, "updated": updated, "skipped": skipped}
-
-@app.get("/user/settings")
-async def get_user_settings(current_user: str = Depends(get_current_user)):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT settings FROM user_settings WHERE username = %s", (current_user,))
-    settings = cur.fetchone()
-    cur.close()
-    conn.close()
-    if settings and "settings" in settings:
-        return settings["settings"]
-    return {"theme": "light", "textScale": 1.0, "columnVisibility": {"title": True, "price": True}}
+    return {"inserted": inserted, "updated": updated, "unchanged": unchanged, "skipped": skipped}
 
-@app.patch("/user/settings")
-async def update_user_settings(settings: UserSettings, current_user: str = Depends(get_current_user)):
+@app.post("/products/import")
+async def import_products(
+    file: UploadFile = File(...),
+    dry_run: bool = False,
+    preview_limit: int = 500,
+    current_user: str = Depends(get_current_user)
+):
+    contents = await file.read()
+    # Parsing is CPU-bound; keep it off the event loop
+    rows, skipped_rows, column_stats = await run_in_threadpool(parse_import_file, contents)
     conn = get_db_connection()
     cur = conn.cursor()
+    if dry_run:
+        preview = build_import_preview(cur, rows, skipped_rows, preview_limit)
+        cur.close()
+        conn.close()
+        preview["columns"] = column_stats
+        return preview
+    try:
+        counts = apply_import_rows(cur, rows)
+    except psycopg2.errors.UniqueViolation as e:
+        conn.rollback()
+        cur.close()
+        conn.close()
+        raise HTTPException(status_code=409, detail=f"SKU conflict, import rolled back: {e.diag.message_detail}")
+    counts["skipped"] += len(skipped_rows)
     cur.execute("""
-        INSERT INTO user_settings (username, settings)
-        VALUES (%s, %s)
-        ON CONFLICT (username) DO UPDATE SET settings = EXCLUDED.settings
-    """, (current_user, Json(settings.dict())))
+        INSERT INTO import_files (fingerprint, filename, size, source, inserted, updated, unchanged, skipped, imported_by)
+        VALUES (%s, %s, %s, 'upload', %s, %s, %s, %s, %s)
+        ON CONFLICT (fingerprint) DO UPDATE SET imported_at = NOW(), imported_by = EXCLUDED.imported_by,
+            status = 'imported', error = NULL, inserted = EXCLUDED.inserted, updated = EXCLUDED.updated,
+            unchanged = EXCLUDED.unchanged, skipped = EXCLUDED.skipped
+    """, (hashlib.sha256(contents).hexdigest(), file.filename, len(contents), counts["inserted"],
+          counts["updated"], counts["unchanged"], counts["skipped"], current_user))
     conn.commit()
     cur.close()
     conn.close()
-    return {"message": "Settings updated", "settings": settings.dict()}
+    return {**counts, "columns": column_stats}
 
-@app.post("/user/settings")
-async def create_user_settings(settings: UserSettings, current_user: str = Depends(get_current_user)):
+@app.get("/products/import/history")
+async def get_import_history(limit: int = 50, current_user: str = Depends(get_current_user)):
+    """List recently ingested import files, newest first."""
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute("INSERT INTO user_settings (username, settings) VALUES (%s, %s) ON CONFLICT (username) DO NOTHING", (current_user, Json(settings.dict())))
-    conn.commit()
+    cur.execute("SELECT * FROM import_files ORDER BY imported_at DESC LIMIT %s", (limit,))
+    files = cur.fetchall()
     cur.close()
     conn.close()
-    return {"message": "Settings created", "settings": settings.dict()}
+    return {"files": files}
 
+# Optional watch folder: CSV files dropped here are imported automatically
+IMPORT_WATCH_DIR = os.getenv("IMPORT_WATCH_DIR", "")
+IMPORT_WATCH_INTERVAL = int(os.getenv("IMPORT_WATCH_INTERVAL", "30"))
 
-# Invoice Request Models and Endpoint
-class InvoiceRequest(BaseModel):
-    customer_name: str
-    customer_email: str
-    customer_company: Optional[str] = None
-    customer_phone: Optional[str] = None
-    product_ids: List[int]
+def move_watched_file(path: str, subdir: str, fingerprint: str):
+    """Move a processed watch-folder file into done/ or failed/, keeping both copies on a name clash."""
+    target_dir = os.path.join(IMPORT_WATCH_DIR, subdir)
+    name = os.path.basename(path)
+    try:
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, name)
+        if os.path.exists(target):
+            stem, ext = os.path.splitext(name)
+            target = os.path.join(target_dir, f"{stem}.{fingerprint[:8]}{ext}")
+        os.replace(path, target)
+    except OSError as e:
+        # Another worker may have moved it already
+        if os.path.exists(path):
+            print(f"Import watch folder error moving {name}: {e}")
+
+def ingest_watch_dir():
+    """Import every new CSV in IMPORT_WATCH_DIR once.
+
+    Files are fingerprinted by content, so renamed or re-dropped copies of an
+    already ingested file are skipped. Files modified within the last polling
+    interval are left for the next pass in case they are still being written.
+    Processed files are moved into done/, and files that fail (or copies of
+    a file that failed before) into failed/ with the error kept in
+    import_files.
+    """
+    results = []
+    try:
+        names = sorted(os.listdir(IMPORT_WATCH_DIR))
+    except OSError as e:
+        print(f"Import watch folder error: {e}")
+        return results
+    for name in names:
+        path = os.path.join(IMPORT_WATCH_DIR, name)
+        if not name.lower().endswith(".csv") or not os.path.isfile(path):
+            continue
+        if datetime.now().timestamp() - os.path.getmtime(path) < IMPORT_WATCH_INTERVAL:
+            continue
+        with open(path, "rb") as handle:
+            contents = handle.read()
+        fingerprint = hashlib.sha256(contents).hexdigest()
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            # Claim the fingerprint first so concurrent workers skip this file
+            cur.execute("""
+                INSERT INTO import_files (fingerprint, filename, size, source, imported_by)
+                VALUES (%s, %s, %s, 'watch', 'system')
+                ON CONFLICT (fingerprint) DO NOTHING
+            """, (fingerprint, name, len(contents)))
+            if cur.rowcount == 0:
+                conn.rollback()
+                cur.execute("SELECT status FROM import_files WHERE fingerprint = %s", (fingerprint,))
+                previous = cur.fetchone()
+                conn.rollback()
+                move_watched_file(path, "failed" if previous and previous["status"] == "failed" else "done", fingerprint)
+                continue
+            rows, skipped_rows, _ = parse_import_file(contents)
+            counts = apply_import_rows(cur, rows)
+            counts["skipped"] += len(skipped_rows)
+            cur.execute("""
+                UPDATE import_files SET inserted = %s, updated = %s, unchanged = %s, skipped = %s
+                WHERE fingerprint = %s
+            """, (counts["inserted"], counts["updated"], counts["unchanged"], counts["skipped"], fingerprint))
+            conn.commit()
+            results.append({"filename": name, **counts})
+            log_audit("system", "watch_import", "import_file", name, counts)
+            move_watched_file(path, "done", fingerprint)
+        except Exception as e:
+            conn.rollback()
+            error = str(getattr(e, "detail", None) or e).strip()
+            print(f"Import watch folder error for {name}: {error}")
+            try:
+                # The claim was rolled back with the import; record the failure on its own
+                cur.execute("""
+                    INSERT INTO import_files (fingerprint, filename, size, source, imported_by, status, error)
+                    VALUES (%s, %s, %s, 'watch', 'system', 'failed', %s)
+                    ON CONFLICT (fingerprint) DO UPDATE SET status = 'failed', error = EXCLUDED.error,
+                        filename = EXCLUDED.filename, imported_at = NOW()
+                    WHERE import_files.status = 'failed'
+                """, (fingerprint, name, len(contents), error[:1000]))
+                conn.commit()
+                results.append({"filename": name, "error": error})
+                log_audit("system", "watch_import_failed", "import_file", name, {"error": error[:1000]})
+                move_watched_file(path, "failed", fingerprint)
+            except psycopg2.Error as record_error:
+                conn.rollback()
+                print(f"Import watch folder error recording {name}: {record_error}")
+        finally:
+            cur.close()
+            conn.close()
+    return results
 
+async def watch_import_dir():
+    while True:
+        await run_in_threadpool(ingest_watch_dir)
+        await asyncio.sleep(IMPORT_WATCH_INTERVAL)
 
-def send_invoice_email(customer_info: dict, products: list):
-    """Send invoice request email to NPP sales team."""
-    smtp_host = os.getenv("SMTP_HOST", "smtp.gmail.com")
-    smtp_port = int(os.getenv("SMTP_PORT", "587"))
-    smtp_user = os.getenv("SMTP_USER", "")
-    smtp_pass = os.getenv("SMTP_PASS", "")
-    recipient_email = os.getenv("INVOICE_RECIPIENT", "sales@npp-office-furniture.com")
+@app.on_event("startup")
+async def start_import_watcher():
+    if IMPORT_WATCH_DIR:
+        asyncio.create_task(watch_import_dir())
 
-    if not smtp_user or not smtp_pass:
-        print("SMTP credentials not configured, skipping email")
-        return False
+@app.on_event("startup")
+async def start_audit_writer():
+    audit_writer.start()
 
-    # Build product table HTML
-    product_rows = ""
-    for p in products:
-        product_rows += f"""
-        <tr>
-            <td style="padding: 8px; border: 1px solid #ddd;">{p.get('title', 'N/A')}</td>
-            <td style="padding: 8px; border: 1px solid #ddd;">{p.get('vendor', 'N/A')}</td>
-            <td style="padding: 8px; border: 1px solid #ddd;">${p.get('price', 0):.2f}</td>
-            <td style="padding: 8px; border: 1px solid #ddd;">{p.get('moq', 'N/A')}</td>
-            <td style="padding: 8px; border: 1px solid #ddd;">{p.get('qty', 0)}</td>
-            <td style="padding: 8px; border: 1px solid #ddd;">{p.get('fob', 'N/A')}</td>
-        </tr>
-        """
+@app.on_event("startup")
+async def start_outbox_sender():
+    outbox_sender.start()
 
-    html_body = f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; color: #333;">
-        <div style="background: #003087; color: white; padding: 20px; text-align: center;">
-            <h1 style="margin: 0;">New Quote Request - NPP Office Furniture</h1>
-        </div>
-        <div style="padding: 20px;">
-            <h2 style="color: #003087;">Customer Information</h2>
-            <table style="width: 100%; margin-bottom: 20px;">
-                <tr><td><strong>Name:</strong></td><td>{customer_info.get('name', 'N/A')}</td></tr>
-                <tr><td><strong>Email:</strong></td><td>{customer_info.get('email', 'N/A')}</td></tr>
+@app.on_event("startup")
+async def start_replica_monitor():
+    replica_router.start()
+
+@app.on_event("shutdown")
+async def stop_outbox_sender():
+    await run_in_threadpool(outbox_sender.close)
+
+AUDIT_MAINTENANCE_INTERVAL = int(os.getenv("AUDIT_MAINTENANCE_INTERVAL", str(6 * 3600)))
+
+# Monthly partitions older than this are archived to AUDIT_ARCHIVE_DIR; 0 keeps everything
+AUDIT_RETENTION_MONTHS = int(os.getenv("AUDIT_RETENTION_MONTHS", "12"))
+AUDIT_ARCHIVE_DIR = os.getenv("AUDIT_ARCHIVE_DIR", "audit_archive")
+
+def archive_audit_partition(name: str, range_start: datetime, range_end: datetime) -> dict:
+    """Write one partition to gzipped NDJSON (newest first), record it in
+    audit_archives, then detach and drop it.
+
+    The file is complete and fsynced before the partition is dropped, and the
+    index row, detach and drop share one transaction.
+    """
+    os.makedirs(AUDIT_ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(AUDIT_ARCHIVE_DIR, f"{name}.ndjson.gz")
+    tmp_path = path + ".tmp"
+    digest = hashlib.sha256()
+    row_count = 0
+
+    conn = get_db_connection()
+    try:
+        reader = conn.cursor(name=f"archive_{name}")
+        reader.itersize = 5000
+        reader.execute(f"SELECT * FROM {name} ORDER BY timestamp DESC, id DESC")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as out:
+            for row in reader:
+                line = json.dumps(row, default=str) + "\n"
+                out.write(line)
+                digest.update(line.encode("utf-8"))
+                row_count += 1
+        reader.close()
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO audit_archives (partition_name, range_start, range_end, path, row_count, bytes, sha256)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (partition_name) DO UPDATE SET
+                path = EXCLUDED.path, row_count = EXCLUDED.row_count, bytes = EXCLUDED.bytes,
+                sha256 = EXCLUDED.sha256, archived_at = NOW()
+        """, (name, range_start, range_end, path, row_count, os.path.getsize(path), digest.hexdigest()))
+        cur.execute(f"ALTER TABLE audit_logs DETACH PARTITION {name}")
+        cur.execute(f"DROP TABLE {name}")
+        conn.commit()
+        cur.close()
+    except Exception:
+        conn.rollback()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        conn.close()
+    return {"partition": name, "rows": row_count, "path": path}
+
+def archive_old_audit_partitions(retention_months: int = None) -> list:
+    retention_months = AUDIT_RETENTION_MONTHS if retention_months is None else retention_months
+    if retention_months <= 0:
+        return []
+    cutoff = month_start(datetime.now(), -retention_months)
+    conn = get_db_connection()
+    cur = conn.cursor()
+    partitions = audit_partitions(cur)
+    cur.close()
+    conn.close()
+    archived = []
+    for name, (range_start, range_end) in sorted(partitions.items(), key=lambda item: item[1]):
+        if range_end <= cutoff:
+            archived.append(archive_audit_partition(name, range_start, range_end))
+    return archived
+
+def run_audit_maintenance():
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        ensure_audit_partitions(cur)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"Audit partition maintenance error: {e}")
+    finally:
+        cur.close()
+        conn.close()
+    try:
+        for result in archive_old_audit_partitions():
+            print(f"Archived {result['rows']} audit rows from {result['partition']} to {result['path']}")
+    except Exception as e:
+        print(f"Audit archival error: {e}")
+
+async def maintain_audit_logs():
+    while True:
+        await asyncio.sleep(AUDIT_MAINTENANCE_INTERVAL)
+        await run_in_threadpool(run_audit_maintenance)
+
+@app.on_event("startup")
+async def start_audit_maintenance():
+    asyncio.create_task(maintain_audit_logs())
+
+@app.on_event("shutdown")
+async def stop_audit_writer():
+    await run_in_threadpool(audit_writer.close)
+
+SETTINGS_CACHE_TTL = int(os.getenv("SETTINGS_CACHE_TTL", "300"))
+SETTINGS_CACHE_SIZE = int(os.getenv("SETTINGS_CACHE_SIZE", "2000"))
+SETTINGS_CHANNEL = "settings_changed"
+DEFAULT_USER_SETTINGS = {"theme": "light", "textScale": 1.0, "columnVisibility": {"title": True, "price": True}}
+
+class SettingsCache:
+    """In-process cache for user_settings, company_settings and the category tree.
+
+    Writers update the cache directly and NOTIFY SETTINGS_CHANNEL in the same
+    transaction; a listener thread in every worker drops the named entry when
+    another process changes it ("user_state:<username>" drops that user's
+    entry in user_state_cache instead). SETTINGS_CACHE_TTL bounds staleness
+    if the listener connection is down, and SETTINGS_CACHE_SIZE bounds memory:
+    past it, expired entries go first, then the least recently used.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()  # key -> (expires_at, value, etag), least recently used first
+        self.lock = threading.Lock()
+        self.origin = uuid.uuid4().hex  # lets the listener ignore our own writes
+        self.listener = None
+
+    @staticmethod
+    def etag(value) -> str:
+        return '"' + hashlib.md5(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest() + '"'
+
+    def get(self, key: str, loader):
+        if self.listener is None:
+            self.start_listener()
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > now:
+                self.entries.move_to_end(key)
+                return entry[1], entry[2]
+        value = loader()
+        return self.put(key, value)
+
+    def put(self, key: str, value):
+        etag = self.etag(value)
+        with self.lock:
+            now = time.monotonic()
+            self.entries[key] = (now + SETTINGS_CACHE_TTL, value, etag)
+            self.entries.move_to_end(key)
+            if len(self.entries) > SETTINGS_CACHE_SIZE:
+                for name in [k for k, entry in self.entries.items() if entry[0] <= now]:
+                    del self.entries[name]
+                while len(self.entries) > SETTINGS_CACHE_SIZE:
+                    self.entries.popitem(last=False)
+        return value, etag
+
+    def peek(self, key: str):
+        entry = self.entries.get(key)
+        return entry[1] if entry else None
+
+    def invalidate(self, key: str = None):
+        """Drop one entry, plus any derived entries named "<key>:..."; None clears all."""
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                for name in [k for k in self.entries if k == key or k.startswith(key + ":")]:
+                    del self.entries[name]
+
+    def notify(self, cur, key: str):
+        cur.execute("SELECT pg_notify(%s, %s)", (SETTINGS_CHANNEL, f"{self.origin}|{key}"))
+        replica_router.mark_changed()
+
+    def start_listener(self):
+        with self.lock:
+            if self.listener is None or not self.listener.is_alive():
+                self.listener = threading.Thread(target=self.listen, name="settings-listener", daemon=True)
+                self.listener.start()
+
+    def listen(self):
+        while True:
+            conn = None
+            try:
+                conn = get_db_connection()
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {SETTINGS_CHANNEL}")
+                # Anything cached before LISTEN may have missed a notification
+                self.invalidate()
+                user_state_cache.clear()
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        # Our own notifications too: this is the first point
+                        # the change is known to be committed
+                        replica_router.mark_changed()
+                        origin, _, key = conn.notifies.pop(0).payload.partition("|")
+                        if origin != self.origin:
+                            self.invalidate(key)
+                            if key.startswith("user_state:"):
+                                invalidate_user_state(key.partition(":")[2])
+            except Exception as e:
+                print(f"Settings listener error: {e}")
+                time.sleep(5)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+settings_cache = SettingsCache()
+
+def user_settings_key(username: str) -> str:
+    return f"user:{username}"
+
+def get_cached_user_settings(username: str):
+    """Return (settings, etag) for a user, falling back to the defaults."""
+    def load():
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT settings FROM user_settings WHERE username = %s", (username,))
+        row = cur.fetchone()
+        cur.close()
+        conn.close()
+        return row["settings"] if row and row.get("settings") else DEFAULT_USER_SETTINGS
+    return settings_cache.get(user_settings_key(username), load)
+
+def get_cached_company_settings():
+    """Return (settings, etag) for the company_settings key/value table."""
+    def load():
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT key, value FROM company_settings")
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+        return {row["key"]: row["value"] for row in rows}
+    return settings_cache.get("company", load)
+
+def company_default(key: str, fallback=None):
+    """Read a company setting from the cache; safe to call on hot paths."""
+    value = get_cached_company_settings()[0].get(key)
+    return fallback if value in (None, "") else value
+
+def etag_response(request: Request, response: Response, value, etag: str):
+    """Return 304 when the client already has this version, else the value with its ETag."""
+    presented = [tag.strip().replace("W/", "", 1) for tag in request.headers.get("If-None-Match", "").split(",")]
+    if etag in presented:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return value
+
+@app.get("/user/settings")
+async def get_user_settings(request: Request, response: Response, current_user: str = Depends(get_current_user)):
+    settings, etag = get_cached_user_settings(current_user)
+    return etag_response(request, response, settings, etag)
+
+@app.patch("/user/settings")
+async def update_user_settings(settings: UserSettings, current_user: str = Depends(get_current_user)):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO user_settings (username, settings)
+        VALUES (%s, %s)
+        ON CONFLICT (username) DO UPDATE SET settings = EXCLUDED.settings
+    """, (current_user, Json(settings.dict())))
+    settings_cache.notify(cur, user_settings_key(current_user))
+    conn.commit()
+    cur.close()
+    conn.close()
+    settings_cache.put(user_settings_key(current_user), settings.dict())
+    return {"message": "Settings updated", "settings": settings.dict()}
+
+@app.post("/user/settings")
+async def create_user_settings(settings: UserSettings, current_user: str = Depends(get_current_user)):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("INSERT INTO user_settings (username, settings) VALUES (%s, %s) ON CONFLICT (username) DO NOTHING", (current_user, Json(settings.dict())))
+    settings_cache.notify(cur, user_settings_key(current_user))
+    conn.commit()
+    cur.close()
+    conn.close()
+    settings_cache.invalidate(user_settings_key(current_user))
+    return {"message": "Settings created", "settings": settings.dict()}
+
+
+# Invoice Request Models and Endpoint
+class InvoiceRequest(BaseModel):
+    customer_name: str
+    customer_email: str
+    customer_company: Optional[str] = None
+    customer_phone: Optional[str] = None
+    product_ids: List[int]
+
+
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER", "")
+SMTP_PASS = os.getenv("SMTP_PASS", "")
+SMTP_FROM = os.getenv("SMTP_FROM", "") or SMTP_USER
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes")
+INVOICE_RECIPIENT = os.getenv("INVOICE_RECIPIENT", "sales@npp-office-furniture.com")
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_RETRY_BASE_SECONDS = int(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "30"))
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "60"))
+# A 'sending' claim older than this belongs to a sender that died mid-batch;
+# keep it above OUTBOX_BATCH_SIZE x the 30s SMTP timeout
+OUTBOX_CLAIM_TIMEOUT_SECONDS = int(os.getenv("OUTBOX_CLAIM_TIMEOUT_SECONDS", "900"))
+
+
+def smtp_configured() -> bool:
+    # Credentials, or an explicitly configured relay (e.g. a local stand-in)
+    return bool((SMTP_USER and SMTP_PASS) or os.getenv("SMTP_HOST"))
+
+
+def build_invoice_email(customer_info: dict, products: list):
+    """Return (subject, html_body) for an invoice request to the NPP sales team."""
+    # Build product table HTML
+    product_rows = ""
+    for p in products:
+        product_rows += f"""
+        <tr>
+            <td style="padding: 8px; border: 1px solid #ddd;">{p.get('title', 'N/A')}</td>
+            <td style="padding: 8px; border: 1px solid #ddd;">{p.get('vendor', 'N/A')}</td>
+            <td style="padding: 8px; border: 1px solid #ddd;">${p.get('price') or 0:.2f}</td>
+            <td style="padding: 8px; border: 1px solid #ddd;">{p.get('moq', 'N/A')}</td>
+            <td style="padding: 8px; border: 1px solid #ddd;">{p.get('qty', 0)}</td>
+            <td style="padding: 8px; border: 1px solid #ddd;">{p.get('fob', 'N/A')}</td>
+        </tr>
+        """
+
+    html_body = f"""
+    <html>
+    <body style="font-family: Arial, sans-serif; color: #333;">
+        <div style="background: #003087; color: white; padding: 20px; text-align: center;">
+            <h1 style="margin: 0;">New Quote Request - NPP Office Furniture</h1>
+        </div>
+        <div style="padding: 20px;">
+            <h2 style="color: #003087;">Customer Information</h2>
+            <table style="width: 100%; margin-bottom: 20px;">
+                <tr><td><strong>Name:</strong></td><td>{customer_info.get('name', 'N/A')}</td></tr>
+                <tr><td><strong>Email:</strong></td><td>{customer_info.get('email', 'N/A')}</td></tr>
                 <tr><td><strong>Company:</strong></td><td>{customer_info.get('company', 'N/A')}</td></tr>
                 <tr><td><strong>Phone:</strong></td><td>{customer_info.get('phone', 'N/A')}</td></tr>
             </table>
@@ -1093,23 +3636,165 @@ def send_invoice_email(customer_info: dict, products: list):
     </html>
     """
 
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = f"Quote Request from {customer_info.get('name', 'Customer')} - {len(products)} Products"
-    msg["From"] = smtp_user
-    msg["To"] = recipient_email
-    msg["Reply-To"] = customer_info.get('email', smtp_user)
+    subject = f"Quote Request from {customer_info.get('name', 'Customer')} - {len(products)} Products"
+    return subject, html_body
 
-    msg.attach(MIMEText(html_body, "html"))
 
-    try:
-        with smtplib.SMTP(smtp_host, smtp_port) as server:
+def queue_email(cur, kind: str, recipient: str, subject: str, html_body: str, reply_to: str = None) -> int:
+    cur.execute("""
+        INSERT INTO email_outbox (kind, recipient, reply_to, subject, html_body)
+        VALUES (%s, %s, %s, %s, %s)
+        RETURNING id
+    """, (kind, recipient, reply_to, subject, html_body))
+    return cur.fetchone()["id"]
+
+
+class OutboxSender:
+    """Delivers email_outbox rows from a background thread.
+
+    Keeps one SMTP session open between batches (closed after SMTP_IDLE_SECONDS
+    idle), claims due rows with FOR UPDATE SKIP LOCKED, and reschedules failures
+    with exponential backoff until OUTBOX_MAX_ATTEMPTS. Every poll also reclaims
+    rows stuck in 'sending' for longer than OUTBOX_CLAIM_TIMEOUT_SECONDS.
+    """
+
+    def __init__(self):
+        self.server = None
+        self.last_used = 0.0
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.stopping.clear()
+                self.thread = threading.Thread(target=self.run, name="email-outbox", daemon=True)
+                self.thread.start()
+
+    def notify(self):
+        if self.thread is None:
+            self.start()
+        self.wakeup.set()
+
+    def close(self, timeout: float = 10.0):
+        self.stopping.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        self.disconnect()
+
+    def connect(self):
+        if self.server is not None:
+            if time.monotonic() - self.last_used < SMTP_IDLE_SECONDS:
+                return self.server
+            try:
+                self.server.noop()
+                return self.server
+            except smtplib.SMTPException:
+                self.disconnect()
+        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
+        if SMTP_STARTTLS:
             server.starttls()
-            server.login(smtp_user, smtp_pass)
-            server.sendmail(smtp_user, [recipient_email], msg.as_string())
-        return True
-    except Exception as e:
-        print(f"Failed to send email: {e}")
-        return False
+        if SMTP_USER and SMTP_PASS:
+            server.login(SMTP_USER, SMTP_PASS)
+        self.server = server
+        return server
+
+    def disconnect(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+            self.server = None
+
+    def claim(self, cur) -> list:
+        cur.execute("""
+            UPDATE email_outbox SET status = 'sending', claimed_at = NOW()
+            WHERE id IN (
+                SELECT id FROM email_outbox
+                WHERE (status = 'pending' AND next_attempt_at <= NOW())
+                   OR (status = 'sending' AND claimed_at < NOW() - %s * interval '1 second')
+                ORDER BY next_attempt_at, id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING *
+        """, (OUTBOX_CLAIM_TIMEOUT_SECONDS, OUTBOX_BATCH_SIZE))
+        return cur.fetchall()
+
+    def send(self, message: dict):
+        msg = MIMEMultipart("alternative")
+        msg["Subject"] = message["subject"]
+        msg["From"] = SMTP_FROM
+        msg["To"] = message["recipient"]
+        msg["Reply-To"] = message["reply_to"] or SMTP_FROM
+        msg.attach(MIMEText(message["html_body"], "html"))
+        for attempt in range(2):
+            server = self.connect()
+            try:
+                server.sendmail(SMTP_FROM, [message["recipient"]], msg.as_string())
+                self.last_used = time.monotonic()
+                return
+            except smtplib.SMTPServerDisconnected:
+                # The pooled session went away between batches; reconnect once
+                self.disconnect()
+                if attempt:
+                    raise
+
+    def process_batch(self) -> int:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            messages = self.claim(cur)
+            conn.commit()
+            sent, failed = [], []
+            for message in messages:
+                try:
+                    self.send(message)
+                    sent.append((message["id"],))
+                except Exception as e:
+                    self.disconnect()
+                    attempts = message["attempts"] + 1
+                    status_ = "failed" if attempts >= OUTBOX_MAX_ATTEMPTS else "pending"
+                    delay = min(OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), 6 * 3600)
+                    failed.append((message["id"], status_, attempts, str(e)[:1000], delay))
+            if sent:
+                execute_values(cur, """
+                    UPDATE email_outbox SET status = 'sent', sent_at = NOW(), attempts = attempts + 1,
+                        last_error = NULL, claimed_at = NULL
+                    FROM (VALUES %s) AS v(id) WHERE email_outbox.id = v.id
+                """, sent, template="(%s::integer)")
+            if failed:
+                execute_values(cur, """
+                    UPDATE email_outbox SET status = v.status, attempts = v.attempts, last_error = v.error,
+                        next_attempt_at = NOW() + v.delay * interval '1 second', claimed_at = NULL
+                    FROM (VALUES %s) AS v(id, status, attempts, error, delay) WHERE email_outbox.id = v.id
+                """, failed, template="(%s::integer, %s, %s::integer, %s, %s::integer)")
+            conn.commit()
+            return len(messages)
+        finally:
+            cur.close()
+            conn.close()
+
+    def run(self):
+        while not self.stopping.is_set():
+            processed = 0
+            if smtp_configured():
+                try:
+                    processed = self.process_batch()
+                except Exception as e:
+                    print(f"Email outbox error: {e}")
+            if processed < OUTBOX_BATCH_SIZE:
+                if self.server is not None and time.monotonic() - self.last_used > SMTP_IDLE_SECONDS:
+                    self.disconnect()
+                self.wakeup.wait(OUTBOX_POLL_SECONDS)
+                self.wakeup.clear()
+
+outbox_sender = OutboxSender()
+atexit.register(outbox_sender.close)
 
 
 @app.post("/request-invoice")
@@ -1124,10 +3809,10 @@ async def request_invoice(request: InvoiceRequest):
     placeholders = ','.join(['%s'] * len(request.product_ids))
     cur.execute(f"SELECT * FROM products WHERE id IN ({placeholders})", request.product_ids)
     products = cur.fetchall()
-    cur.close()
-    conn.close()
 
     if not products:
+        cur.close()
+        conn.close()
         raise HTTPException(status_code=404, detail="No products found")
 
     customer_info = {
@@ -1137,15 +3822,480 @@ async def request_invoice(request: InvoiceRequest):
         "phone": request.customer_phone or "Not provided",
     }
 
-    # Send email
-    email_sent = send_invoice_email(customer_info, products)
+    # Queue the email; outbox_sender delivers it in the background
+    subject, html_body = build_invoice_email(customer_info, products)
+    outbox_id = queue_email(cur, "invoice_request", INVOICE_RECIPIENT, subject, html_body, request.customer_email)
+    conn.commit()
+    cur.close()
+    conn.close()
+    outbox_sender.notify()
 
     return {
         "message": "Invoice request submitted successfully",
         "products_count": len(products),
-        "email_sent": email_sent,
+        "email_queued": True,
+        "outbox_id": outbox_id,
+    }
+
+
+@app.get("/admin/email-outbox")
+async def get_email_outbox(
+    status_filter: Optional[str] = None,
+    limit: int = 50,
+    user: dict = Depends(require_permission("manage_settings"))
+):
+    """Delivery status of queued emails (admin only)"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT status, COUNT(*) AS count FROM email_outbox GROUP BY status")
+    counts = {row["status"]: row["count"] for row in cur.fetchall()}
+    query = """
+        SELECT id, kind, recipient, reply_to, subject, status, attempts, last_error,
+               next_attempt_at, created_at, sent_at
+        FROM email_outbox
+    """
+    params = []
+    if status_filter:
+        query += " WHERE status = %s"
+        params.append(status_filter)
+    query += " ORDER BY id DESC LIMIT %s"
+    params.append(max(1, min(limit, 500)))
+    cur.execute(query, params)
+    messages = cur.fetchall()
+    cur.close()
+    conn.close()
+    return {"counts": counts, "messages": messages, "smtp_configured": smtp_configured()}
+
+
+@app.post("/admin/email-outbox/{message_id}/retry")
+async def retry_outbox_email(message_id: int, user: dict = Depends(require_permission("manage_settings"))):
+    """Reschedule a failed email for immediate delivery"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE email_outbox SET status = 'pending', next_attempt_at = NOW(), attempts = 0
+        WHERE id = %s AND status IN ('failed', 'pending')
+        RETURNING id
+    """, (message_id,))
+    updated = cur.fetchone()
+    conn.commit()
+    cur.close()
+    conn.close()
+    if not updated:
+        raise HTTPException(status_code=404, detail="Email not found or already sent")
+    outbox_sender.notify()
+    return {"message": "Email rescheduled", "id": message_id}
+
+
+# ============= BROADCAST ENDPOINTS =============
+
+KIT_API_URL = os.getenv("KIT_API_URL", "https://api.kit.com/v4/broadcasts")
+KIT_API_KEY = os.getenv("KIT_API_KEY", "")
+KIT_CONCURRENCY = int(os.getenv("KIT_CONCURRENCY", "4"))
+KIT_REQUESTS_PER_MINUTE = int(os.getenv("KIT_REQUESTS_PER_MINUTE", "100"))
+KIT_MAX_RETRIES = int(os.getenv("KIT_MAX_RETRIES", "4"))
+BROADCAST_CACHE_SIZE = 5000
+
+# Fields that appear in a deal email; render_key hashes exactly these so the
+# cached fragment survives unrelated edits such as last_sent stamping
+BROADCAST_FIELDS = ["title", "image_url", "price", "moq", "qty", "sku", "fob", "lead_time",
+                    "brand", "material", "color", "width", "depth", "height", "condition"]
+
+broadcast_fragment_cache = OrderedDict()  # (product id, render_key) -> html
+broadcast_jobs = {}
+
+
+class BroadcastRequest(BaseModel):
+    product_ids: List[int]
+    mode: str = "individual"  # "individual": one broadcast per product, "group": one for all
+
+
+def render_deal_fragment(product: dict) -> str:
+    """HTML block for one product, same layout the catalog has always sent."""
+    key = (product["id"], product["render_key"])
+    cached = broadcast_fragment_cache.get(key)
+    if cached is not None:
+        broadcast_fragment_cache.move_to_end(key)
+        return cached
+
+    esc = lambda value: html.escape(str(value), quote=True)
+    title = product.get("title") or ""
+    lead_time = (product.get("lead_time") or "").replace("Days", "Business Days")
+    dimensions = " x ".join(
+        f'{product[field]:g}"{label}' for field, label in (("width", "W"), ("depth", "D"), ("height", "H"))
+        if product.get(field)
+    )
+    fragment = f"""
+    <div style="text-align:center; padding:20px;">
+        <h2 style="font-size:18px; margin-bottom:20px;">{esc(title)}</h2>
+        <img src="{esc(product.get('image_url') or '')}" alt="{esc(title)}" style="max-width:300px; max-height:300px; object-fit:contain; display:block; margin:auto; margin-top:40px; margin-bottom:40px;"/>
+        <p style="font-size:18px; margin-top:40px;">${product.get('price') or 0:.2f} EA, MOQ {product.get('moq') or 0}, {product.get('qty') or 0} Available.</p>
+  """
+    for label, value in (("SKU", product.get("sku")), ("Brand", product.get("brand")),
+                         ("Material", product.get("material")), ("Color", product.get("color")),
+                         ("Dimensions", dimensions), ("Condition", product.get("condition")),
+                         ("FOB", product.get("fob")), ("Lead Time", lead_time)):
+        if value:
+            fragment += f'<p style="font-size:18px;">{label}: {esc(value)}</p>'
+    fragment += "</div>"
+
+    broadcast_fragment_cache[key] = fragment
+    if len(broadcast_fragment_cache) > BROADCAST_CACHE_SIZE:
+        broadcast_fragment_cache.popitem(last=False)
+    return fragment
+
+
+def retry_after_seconds(value: Optional[str], default: float) -> float:
+    """Seconds to wait per a Retry-After header, which is delta-seconds or an HTTP-date."""
+    if not value:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class KitClient:
+    """Posts broadcasts to Kit with bounded concurrency, request pacing, and
+    retries. A 429 pauses every worker until Retry-After has passed."""
+
+    def __init__(self, client):
+        self.client = client
+        self.semaphore = asyncio.Semaphore(KIT_CONCURRENCY)
+        self.interval = 60.0 / max(KIT_REQUESTS_PER_MINUTE, 1)
+        self.next_slot = 0.0
+        self.paused_until = 0.0
+
+    async def wait_for_slot(self):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self.next_slot, self.paused_until)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def create_broadcast(self, subject: str, content: str):
+        payload = {"subject": subject.strip(), "content": content, "public": False, "email_template_id": None}
+        async with self.semaphore:
+            for attempt in range(KIT_MAX_RETRIES + 1):
+                await self.wait_for_slot()
+                try:
+                    response = await self.client.post(KIT_API_URL, json=payload)
+                except httpx.HTTPError as e:
+                    error = str(e)
+                else:
+                    if response.status_code < 300:
+                        return
+                    error = f"HTTP {response.status_code}: {response.text[:200]}"
+                    if response.status_code == 429:
+                        retry_after = retry_after_seconds(response.headers.get("Retry-After"), 2 ** attempt)
+                        self.paused_until = asyncio.get_running_loop().time() + retry_after
+                        continue
+                    if response.status_code < 500:
+                        raise RuntimeError(error)
+                if attempt < KIT_MAX_RETRIES:
+                    await asyncio.sleep(min(2 ** attempt, 30) * (0.5 + random.random()))
+            raise RuntimeError(error)
+
+
+async def run_broadcast_job(job: dict, products: list, mode: str):
+    headers = {"Accept": "application/json", "X-Kit-Api-Key": KIT_API_KEY}
+    sent_ids = []
+    try:
+        async with httpx.AsyncClient(headers=headers, timeout=30) as client:
+            kit = KitClient(client)
+            if mode == "group":
+                content = "<hr>".join(render_deal_fragment(p) for p in products) + "<hr>"
+                try:
+                    await kit.create_broadcast(f"Group Deal: {len(products)} Products Available!", content)
+                    sent_ids = [p["id"] for p in products]
+                except Exception as e:
+                    job["errors"].append({"error": str(e)})
+            else:
+                async def send_one(product):
+                    try:
+                        await kit.create_broadcast(product["title"] or "", render_deal_fragment(product))
+                        sent_ids.append(product["id"])
+                    except Exception as e:
+                        job["errors"].append({"product_id": product["id"], "error": str(e)})
+                    job["processed"] += 1
+                await asyncio.gather(*(send_one(p) for p in products))
+
+        if sent_ids:
+            current_est = datetime.now(pytz.timezone('America/New_York'))
+            def stamp():
+                conn = get_db_connection()
+                cur = conn.cursor()
+                cur.execute("UPDATE products SET last_sent = %s WHERE id = ANY(%s)", (current_est, sent_ids))
+                conn.commit()
+                cur.close()
+                conn.close()
+            await run_in_threadpool(stamp)
+        job["sent"] = len(sent_ids)
+        job["processed"] = len(products)
+        job["status"] = "completed" if not job["errors"] else "completed_with_errors"
+    except Exception as e:
+        job["status"] = "failed"
+        job["errors"].append({"error": str(e)})
+    finally:
+        job["finished_at"] = datetime.now()
+        log_audit(job["username"], "broadcast_sent", "broadcast", job["id"],
+                  {"mode": mode, "products": len(products), "sent": len(sent_ids), "errors": len(job["errors"])})
+
+
+@app.post("/broadcasts", status_code=202)
+async def create_broadcasts(request: BroadcastRequest, current_user: str = Depends(get_current_user)):
+    """Render deal emails and create Kit broadcast drafts in the background.
+
+    Returns a job to poll at GET /broadcasts/{job_id}; the send carries on even
+    if the browser goes away. last_sent is stamped once for every product that
+    was accepted by Kit.
+    """
+    if request.mode not in ("individual", "group"):
+        raise HTTPException(status_code=400, detail="mode must be 'individual' or 'group'")
+    if not request.product_ids:
+        raise HTTPException(status_code=400, detail="No products selected")
+    if not KIT_API_KEY:
+        raise HTTPException(status_code=503, detail="Kit API key not configured")
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    fields = ", ".join(BROADCAST_FIELDS)
+    cur.execute(f"""
+        SELECT id, {fields}, md5(ROW({fields})::text) AS render_key
+        FROM products WHERE id = ANY(%s) AND COALESCE(title, '') <> ''
+        ORDER BY array_position(%s, id)
+    """, (request.product_ids, request.product_ids))
+    products = cur.fetchall()
+    cur.close()
+    conn.close()
+    if not products:
+        raise HTTPException(status_code=404, detail="No products found")
+
+    # Forget finished jobs after a day
+    cutoff = datetime.now() - timedelta(days=1)
+    for job_id in [k for k, j in broadcast_jobs.items() if j["finished_at"] and j["finished_at"] < cutoff]:
+        del broadcast_jobs[job_id]
+
+    job = {
+        "id": uuid.uuid4().hex,
+        "username": current_user,
+        "mode": request.mode,
+        "status": "running",
+        "total": len(products),
+        "processed": 0,
+        "sent": 0,
+        "errors": [],
+        "started_at": datetime.now(),
+        "finished_at": None,
     }
+    broadcast_jobs[job["id"]] = job
+    job["task"] = asyncio.create_task(run_broadcast_job(job, products, request.mode))
+    return {k: v for k, v in job.items() if k != "task"}
+
+
+@app.get("/broadcasts/{job_id}")
+async def get_broadcast_job(job_id: str, current_user: str = Depends(get_current_user)):
+    job = broadcast_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Broadcast job not found")
+    return {k: v for k, v in job.items() if k != "task"}
+
+
+# ============= ANALYTICS ENDPOINTS =============
+
+def offer_date_filter(start: Optional[date], end: Optional[date]):
+    """SQL condition and params for an inclusive offer_date range."""
+    conditions, params = ["TRUE"], []
+    if start:
+        conditions.append("offer_date >= %s")
+        params.append(start)
+    if end:
+        conditions.append("offer_date < %s")
+        params.append(end + timedelta(days=1))
+    return " AND ".join(conditions), params
+
+@app.get("/analytics/vendors")
+async def get_vendor_analytics(
+    request: Request,
+    response: Response,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: str = Depends(get_current_user)
+):
+    """Per-vendor product counts, active rate, average MOQ and most common lead time.
+
+    start/end filter on offer_date (inclusive). The unfiltered result is
+    cached until the catalog next changes; date ranges are computed per request.
+    """
+    def load():
+        where, params = offer_date_filter(start, end)
+        conn = replica_router.connect([], consistent=True)
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT COALESCE(NULLIF(vendor, ''), 'Unknown') AS name,
+                   COUNT(*) AS total_products,
+                   COUNT(*) FILTER (WHERE NOT COALESCE(out_of_stock, FALSE)) AS active_products,
+                   COUNT(*) FILTER (WHERE out_of_stock) AS out_of_stock,
+                   COALESCE(ROUND(AVG(moq) FILTER (WHERE moq <> 0)), 0)::INTEGER AS avg_moq,
+                   mode() WITHIN GROUP (ORDER BY lead_time) FILTER (WHERE lead_time <> '') AS common_lead_time
+            FROM products
+            WHERE {where}
+            GROUP BY 1
+            ORDER BY total_products DESC, name
+        """, params)
+        vendors = cur.fetchall()
+        cur.close()
+        conn.close()
+        for vendor in vendors:
+            vendor["active_rate"] = round(100 * vendor["active_products"] / vendor["total_products"])
+        return vendors
+
+    if start or end:
+        vendors = await run_in_threadpool(load)
+        return etag_response(request, response, vendors, settings_cache.etag(vendors))
+    vendors, etag = settings_cache.get("catalog:vendors", load)
+    return etag_response(request, response, vendors, etag)
+
+ROLLUP_HOUR = int(os.getenv("ROLLUP_HOUR", "1"))  # local time the nightly rollup runs
+ROLLUP_DIMENSIONS = {
+    "vendor": "COALESCE(NULLIF(btrim(vendor), ''), 'Unknown')",
+    "category": "COALESCE(NULLIF(btrim(category), ''), 'Uncategorized')",
+    "condition": "COALESCE(NULLIF(btrim(condition), ''), 'Unspecified')",
+}
+
+def run_inventory_rollup(day: date = None) -> int:
+    """Write one day's aggregates (overall and per vendor/category/condition) in a
+    single scan of products. Re-running a day replaces it."""
+    day = day or datetime.now(pytz.timezone('America/New_York')).date()
+    in_stock = "NOT COALESCE(out_of_stock, FALSE)"
+    select_key = "CASE " + " ".join(
+        f"WHEN GROUPING({expr}) = 0 THEN {expr}" for expr in ROLLUP_DIMENSIONS.values()
+    ) + " ELSE 'all' END"
+    select_dimension = "CASE " + " ".join(
+        f"WHEN GROUPING({expr}) = 0 THEN '{name}'" for name, expr in ROLLUP_DIMENSIONS.items()
+    ) + " ELSE 'total' END"
+    grouping_sets = ", ".join(["()"] + [f"({expr})" for expr in ROLLUP_DIMENSIONS.values()])
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        # Serialize concurrent runs from several workers
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('inventory_daily_rollups'))")
+        cur.execute("DELETE FROM inventory_daily_rollups WHERE day = %s", (day,))
+        cur.execute(f"""
+            INSERT INTO inventory_daily_rollups
+                (day, dimension, key, product_count, in_stock_count, qty_sum, inventory_value)
+            SELECT %s, {select_dimension}, {select_key},
+                   COUNT(*),
+                   COUNT(*) FILTER (WHERE {in_stock}),
+                   COALESCE(SUM(qty) FILTER (WHERE {in_stock}), 0),
+                   COALESCE(SUM(price * qty) FILTER (WHERE {in_stock}), 0)
+            FROM products
+            GROUP BY GROUPING SETS ({grouping_sets})
+        """, (day,))
+        written = cur.rowcount
+        settings_cache.notify(cur, "rollups")
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    settings_cache.invalidate("rollups")
+    return written
+
+def inventory_rollup_done(day: date) -> bool:
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM inventory_daily_rollups WHERE day = %s LIMIT 1", (day,))
+    done = cur.fetchone() is not None
+    cur.close()
+    conn.close()
+    return done
 
+async def schedule_inventory_rollups():
+    est_tz = pytz.timezone('America/New_York')
+    while True:
+        now = datetime.now(est_tz)
+        try:
+            # Catch up on today's row if the process was down at ROLLUP_HOUR
+            if now.hour >= ROLLUP_HOUR and not await run_in_threadpool(inventory_rollup_done, now.date()):
+                await run_in_threadpool(run_inventory_rollup, now.date())
+        except Exception as e:
+            print(f"Inventory rollup error: {e}")
+        next_run = est_tz.localize(datetime.combine(now.date(), datetime.min.time()).replace(hour=ROLLUP_HOUR))
+        if next_run <= now:
+            next_run = est_tz.localize(datetime.combine(now.date() + timedelta(days=1), datetime.min.time()).replace(hour=ROLLUP_HOUR))
+        await asyncio.sleep((next_run - now).total_seconds())
+
+@app.on_event("startup")
+async def start_inventory_rollups():
+    asyncio.create_task(schedule_inventory_rollups())
+
+@app.get("/analytics/inventory")
+async def get_inventory_timeseries(
+    request: Request,
+    response: Response,
+    dimension: str = "total",
+    key: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: str = Depends(get_current_user)
+):
+    """Daily inventory time series from the rollup table.
+
+    dimension is total, vendor, category or condition; key picks one vendor
+    (etc.), otherwise every key of the dimension is returned. Defaults to the
+    last 90 days; only that default view of each dimension is cached.
+    """
+    if dimension != "total" and dimension not in ROLLUP_DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"dimension must be one of: total, {', '.join(ROLLUP_DIMENSIONS)}")
+    default_view = key is None and start is None and end is None
+    end = end or datetime.now(pytz.timezone('America/New_York')).date()
+    start = start or end - timedelta(days=90)
+
+    def load():
+        query = """
+            SELECT key, day, product_count, in_stock_count, qty_sum, inventory_value
+            FROM inventory_daily_rollups
+            WHERE dimension = %s AND day BETWEEN %s AND %s
+        """
+        params = [dimension, start, end]
+        if key:
+            query += " AND key = %s"
+            params.append(key)
+        conn = replica_router.connect([], consistent=True)
+        cur = conn.cursor()
+        cur.execute(query + " ORDER BY key, day", params)
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+        series = {}
+        for row in rows:
+            series.setdefault(row.pop("key"), []).append(row)
+        return {
+            "dimension": dimension,
+            "start": start,
+            "end": end,
+            "series": [{"key": k, "points": points} for k, points in series.items()]
+        }
+
+    if not default_view:
+        result = await run_in_threadpool(load)
+        return etag_response(request, response, result, settings_cache.etag(result))
+    result, etag = settings_cache.get(f"rollups:{dimension}:{end}", load)
+    return etag_response(request, response, result, etag)
+
+@app.post("/admin/analytics/rollup")
+async def run_inventory_rollup_now(user: dict = Depends(require_permission("manage_settings"))):
+    """Recompute today's inventory rollup immediately"""
+    written = await run_in_threadpool(run_inventory_rollup)
+    return {"message": "Inventory rollup updated", "rows": written}
 
 # ============= USER MANAGEMENT ENDPOINTS =============
 
@@ -1183,16 +4333,18 @@ async def create_user(new_user: UserCreate, user: dict = Depends(require_permiss
         raise HTTPException(status_code=400, detail=f"Invalid role. Must be one of: {list(ROLE_PERMISSIONS.keys())}")
 
     # Hash password and create user
-    hashed_password = bcrypt.hashpw(new_user.password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    hashed_password = await hash_password_async(new_user.password)
 
     cur.execute("""
         INSERT INTO users (username, password, email, role, is_active, created_at, created_by)
         VALUES (%s, %s, %s, %s, TRUE, NOW(), %s)
     """, (new_user.username, hashed_password, new_user.email, new_user.role, user["username"]))
+    settings_cache.notify(cur, user_state_key(new_user.username))
 
     conn.commit()
     cur.close()
     conn.close()
+    invalidate_user_state(new_user.username)
 
     # Log the action
     log_audit(user["username"], "user_created", "user", new_user.username,
@@ -1263,14 +4415,20 @@ async def update_user(username: str, user_update: UserUpdate, user: dict = Depen
         values.append(user_update.is_active)
 
     if user_update.password is not None:
-        hashed_password = bcrypt.hashpw(user_update.password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        hashed_password = await hash_password_async(user_update.password)
         updates.append("password = %s")
         values.append(hashed_password)
 
+    # Revoke existing tokens when access-relevant fields change
+    if user_update.role is not None or user_update.is_active is not None or user_update.password is not None:
+        updates.append("token_epoch = COALESCE(token_epoch, 0) + 1")
+
     if updates:
         values.append(username)
         cur.execute(f"UPDATE users SET {', '.join(updates)} WHERE username = %s", values)
+        settings_cache.notify(cur, user_state_key(username))
         conn.commit()
+        invalidate_user_state(username)
 
         # Log the action
         log_audit(user["username"], "user_updated", "user", username,
@@ -1302,9 +4460,13 @@ async def delete_user(username: str, user: dict = Depends(require_permission("ma
 
     # Delete user settings first (foreign key constraint)
     cur.execute("DELETE FROM user_settings WHERE username = %s", (username,))
+    settings_cache.notify(cur, user_settings_key(username))
     # Delete user
     cur.execute("DELETE FROM users WHERE username = %s", (username,))
+    settings_cache.notify(cur, user_state_key(username))
     conn.commit()
+    invalidate_user_state(username)
+    settings_cache.invalidate(user_settings_key(username))
     cur.close()
     conn.close()
 
@@ -1315,70 +4477,210 @@ async def delete_user(username: str, user: dict = Depends(require_permission("ma
 
 # ============= AUDIT LOG ENDPOINTS =============
 
+AUDIT_EXACT_COUNT_LIMIT = 10000
+
+def encode_audit_cursor(row: dict) -> str:
+    raw = f"{row['timestamp'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_audit_cursor(cursor: str):
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def count_audit_logs(cur, where: str, params: list):
+    """Exact count for small result sets, planner estimate for large ones."""
+    cur.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM audit_logs WHERE {where}", params)
+    plan = cur.fetchone()["QUERY PLAN"][0]["Plan"]
+    if plan["Plan Rows"] > AUDIT_EXACT_COUNT_LIMIT:
+        return int(plan["Plan Rows"]), True
+    cur.execute(f"""
+        SELECT COUNT(*) AS count FROM (
+            SELECT 1 FROM audit_logs WHERE {where} LIMIT {AUDIT_EXACT_COUNT_LIMIT + 1}
+        ) capped
+    """, params)
+    count = cur.fetchone()["count"]
+    return count, count > AUDIT_EXACT_COUNT_LIMIT
+
 @app.get("/admin/audit-logs")
 async def get_audit_logs(
     limit: int = 100,
     offset: int = 0,
+    cursor: Optional[str] = None,
     username: Optional[str] = None,
     action: Optional[str] = None,
+    action_prefix: Optional[str] = None,
     user: dict = Depends(require_permission("view_audit_logs"))
 ):
-    """Get audit logs (admin/manager only)"""
-    conn = get_db_connection()
-    cur = conn.cursor()
+    """Get audit logs (admin/manager only), newest first.
 
-    query = "SELECT * FROM audit_logs WHERE 1=1"
+    Pass the returned next_cursor back as `cursor` to page; offset is only
+    honoured for the first page. `action` matches exactly, `action_prefix`
+    matches the start of the action. Totals above AUDIT_EXACT_COUNT_LIMIT are
+    planner estimates (total_is_estimate).
+    """
+    limit = max(1, min(limit, 1000))
+    conditions = ["TRUE"]
     params = []
 
     if username:
-        query += " AND username = %s"
+        conditions.append("username = %s")
         params.append(username)
     if action:
-        query += " AND action LIKE %s"
-        params.append(f"%{action}%")
+        conditions.append("action = %s")
+        params.append(action)
+    if action_prefix:
+        escaped = action_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        conditions.append("action LIKE %s")
+        params.append(escaped + "%")
+    where = " AND ".join(conditions)
 
-    query += " ORDER BY timestamp DESC LIMIT %s OFFSET %s"
-    params.extend([limit, offset])
+    conn = get_db_connection()
+    cur = conn.cursor()
 
-    cur.execute(query, params)
-    logs = cur.fetchall()
+    query = f"SELECT * FROM audit_logs WHERE {where}"
+    page_params = list(params)
+    if cursor:
+        query += " AND (timestamp, id) < (%s, %s)"
+        page_params.extend(decode_audit_cursor(cursor))
+        offset = 0
+    query += " ORDER BY timestamp DESC, id DESC LIMIT %s OFFSET %s"
+    page_params.extend([limit, max(offset, 0)])
 
-    # Get total count
-    count_query = "SELECT COUNT(*) as count FROM audit_logs WHERE 1=1"
-    count_params = []
-    if username:
-        count_query += " AND username = %s"
-        count_params.append(username)
-    if action:
-        count_query += " AND action LIKE %s"
-        count_params.append(f"%{action}%")
+    cur.execute(query, page_params)
+    logs = cur.fetchall()
 
-    cur.execute(count_query, count_params)
-    total = cur.fetchone()["count"]
+    total, total_is_estimate = count_audit_logs(cur, where, params)
 
     cur.close()
     conn.close()
 
-    return {"logs": logs, "total": total, "limit": limit, "offset": offset}
+    next_cursor = encode_audit_cursor(logs[-1]) if len(logs) == limit else None
+    return {
+        "logs": logs,
+        "total": total,
+        "total_is_estimate": total_is_estimate,
+        "limit": limit,
+        "offset": offset,
+        "next_cursor": next_cursor
+    }
 
-# ============= COMPANY SETTINGS ENDPOINTS =============
+def search_audit_archives(cur, start, end, username, action, action_prefix, before, limit):
+    """Scan archived partitions newest first, stopping once `limit` rows match."""
+    query = "SELECT * FROM audit_archives WHERE TRUE"
+    params = []
+    if start:
+        query += " AND range_end > %s"
+        params.append(start)
+    if end:
+        query += " AND range_start <= %s"
+        params.append(end)
+    if before:
+        query += " AND range_start <= %s"
+        params.append(before[0])
+    cur.execute(query + " ORDER BY range_start DESC", params)
+    archives = cur.fetchall()
+
+    matches = []
+    for archive in archives:
+        if not os.path.exists(archive["path"]):
+            continue
+        with gzip.open(archive["path"], "rt", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                timestamp = datetime.fromisoformat(row["timestamp"])
+                if before and (timestamp, row["id"]) >= before:
+                    continue
+                if end and timestamp > end:
+                    continue
+                if start and timestamp < start:
+                    break  # rows are newest first
+                if username and row["username"] != username:
+                    continue
+                if action and row["action"] != action:
+                    continue
+                if action_prefix and not (row["action"] or "").startswith(action_prefix):
+                    continue
+                row["timestamp"] = timestamp
+                matches.append(row)
+                if len(matches) >= limit:
+                    return matches
+    return matches
+
+@app.get("/admin/audit-logs/archive")
+async def get_archived_audit_logs(
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    username: Optional[str] = None,
+    action: Optional[str] = None,
+    action_prefix: Optional[str] = None,
+    user: dict = Depends(require_permission("view_audit_logs"))
+):
+    """Search audit history that has been archived out of the database.
 
-@app.get("/admin/company-settings")
-async def get_company_settings(user: dict = Depends(require_permission("manage_settings"))):
-    """Get company settings (admin only)"""
+    Same filters and cursor as /admin/audit-logs; narrow with start/end so only
+    the matching monthly archives are read.
+    """
+    limit = max(1, min(limit, 1000))
+    before = decode_audit_cursor(cursor) if cursor else None
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute("SELECT key, value FROM company_settings")
-    rows = cur.fetchall()
+    try:
+        logs = await run_in_threadpool(
+            search_audit_archives, cur, start, end, username, action, action_prefix, before, limit
+        )
+    finally:
+        cur.close()
+        conn.close()
+    next_cursor = encode_audit_cursor(logs[-1]) if len(logs) == limit else None
+    return {"logs": logs, "limit": limit, "next_cursor": next_cursor}
+
+@app.get("/admin/audit-logs/archives")
+async def list_audit_archives(user: dict = Depends(require_permission("view_audit_logs"))):
+    """List archived audit partitions"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM audit_archives ORDER BY range_start DESC")
+    archives = cur.fetchall()
     cur.close()
     conn.close()
+    return {"archives": archives, "retention_months": AUDIT_RETENTION_MONTHS}
 
-    # Convert to dictionary
-    settings = {}
-    for row in rows:
-        settings[row["key"]] = row["value"]
+@app.post("/admin/audit-logs/archive")
+async def archive_audit_logs_now(
+    retention_months: Optional[int] = None,
+    user: dict = Depends(require_permission("manage_settings"))
+):
+    """Archive audit partitions older than the retention window right away"""
+    try:
+        archived = await run_in_threadpool(archive_old_audit_partitions, retention_months)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Audit archival failed: {e}")
+    if archived:
+        log_audit(user["username"], "audit_archive", details={"partitions": [a["partition"] for a in archived]})
+    return {"archived": archived}
+
+@app.get("/admin/db/replicas")
+async def get_replica_status(user: dict = Depends(require_permission("manage_settings"))):
+    """Replica lag and health as of the last check, and how reads were routed."""
+    return replica_router.snapshot()
+
+@app.get("/admin/audit-logs/stats")
+async def get_audit_log_stats(user: dict = Depends(require_permission("view_audit_logs"))):
+    """Counters for the buffered audit writer (queued, written, dropped, failed)"""
+    return audit_writer.snapshot()
+
+# ============= COMPANY SETTINGS ENDPOINTS =============
 
-    return settings
+@app.get("/admin/company-settings")
+async def get_company_settings(request: Request, response: Response, user: dict = Depends(require_permission("manage_settings"))):
+    """Get company settings (admin only)"""
+    settings, etag = get_cached_company_settings()
+    return etag_response(request, response, settings, etag)
 
 @app.patch("/admin/company-settings")
 async def update_company_settings(settings: CompanySettingsUpdate, user: dict = Depends(require_permission("manage_settings"))):
@@ -1394,11 +4696,17 @@ async def update_company_settings(settings: CompanySettingsUpdate, user: dict =
             VALUES (%s, %s)
             ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
         """, (key, Json(value)))
+    settings_cache.notify(cur, "company")
 
     conn.commit()
     cur.close()
     conn.close()
 
+    # Write through so hot paths see the new defaults immediately
+    cached = settings_cache.peek("company")
+    if cached is not None:
+        settings_cache.put("company", {**cached, **settings_dict})
+
     # Log the action
     log_audit(user["username"], "company_settings_updated", "settings", None, settings_dict)
 
@@ -1428,3 +4736,476 @@ async def get_current_user_info(current_user: str = Depends(get_current_user)):
 
     return user_dict
 
+
+# ============= DUPLICATE DETECTION ENDPOINTS =============
+
+DEDUPE_NUM_PERM = 64
+DEDUPE_BANDS = 16  # 16 bands x 4 rows: pairs above ~0.5 Jaccard usually collide
+DEDUPE_THRESHOLD = float(os.getenv("DEDUPE_THRESHOLD", "0.6"))
+DEDUPE_MAX_BUCKET = 200  # Ignore huge buckets from generic titles like "Chair"
+DEDUPE_FILL_COLUMNS = [col for col, col_type in PRODUCT_CONTENT_COLUMNS if col_type != "BOOLEAN"]
+
+def dedupe_tokens(product):
+    """Shingle set for near-duplicate matching.
+
+    Title and brand words are normalized and order-insensitive, so
+    "Payback Executive L-Desk" and "Payback L Desk - Executive" match.
+    Rounded dimensions keep different sizes of the same model apart.
+    """
+    tokens = set(normalize_category_value(product.get("title")).split())
+    tokens.update("brand:" + word for word in normalize_category_value(product.get("brand")).split())
+    for dim in ("width", "depth", "height"):
+        if product.get(dim):
+            tokens.add(f"{dim}:{round(product[dim])}")
+    return tokens
+
+def minhash_signatures(token_sets):
+    """MinHash signatures (one row per token set) using multiply-shift hashing."""
+    rng = np.random.RandomState(20240101)
+    a = rng.randint(1, 2 ** 63, size=DEDUPE_NUM_PERM, dtype=np.uint64) | np.uint64(1)
+    b = rng.randint(0, 2 ** 63, size=DEDUPE_NUM_PERM, dtype=np.uint64)
+    hashes = np.fromiter(
+        (zlib.crc32(token.encode("utf-8")) for tokens in token_sets for token in tokens),
+        dtype=np.uint64
+    )
+    offsets = np.cumsum([0] + [len(tokens) for tokens in token_sets[:-1]])
+    signatures = np.empty((len(token_sets), DEDUPE_NUM_PERM), dtype=np.uint64)
+    shift = np.uint64(32)
+    for i in range(DEDUPE_NUM_PERM):
+        # uint64 arithmetic wraps, which is what multiply-shift relies on
+        signatures[:, i] = np.minimum.reduceat((a[i] * hashes + b[i]) >> shift, offsets)
+    return signatures
+
+def find_duplicate_clusters(products):
+    """Group near-duplicate products with MinHash/LSH.
+
+    Candidates come from LSH band collisions and are confirmed with the
+    exact Jaccard similarity of their token sets. Returns
+    (clusters, candidate_pairs) where clusters are (product_ids, similarity).
+    """
+    items = [(product["id"], dedupe_tokens(product)) for product in products]
+    items = [(product_id, tokens) for product_id, tokens in items if tokens]
+    if len(items) < 2:
+        return [], 0
+    token_sets = [tokens for _, tokens in items]
+    signatures = minhash_signatures(token_sets)
+
+    rows = DEDUPE_NUM_PERM // DEDUPE_BANDS
+    mix = np.random.RandomState(7).randint(1, 2 ** 63, size=rows, dtype=np.uint64) | np.uint64(1)
+    candidates = set()
+    for band in range(DEDUPE_BANDS):
+        # Collapse each band to one key and bucket by sorting; only
+        # buckets with several members are visited in Python
+        keys = (signatures[:, band * rows:(band + 1) * rows] * mix).sum(axis=1)
+        order = np.argsort(keys, kind="stable")
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(keys[order])) + 1))
+        sizes = np.diff(np.concatenate((starts, [len(items)])))
+        shared = (sizes > 1) & (sizes <= DEDUPE_MAX_BUCKET)
+        for start, size in zip(starts[shared], sizes[shared]):
+            members = order[start:start + size].tolist()
+            for i, left in enumerate(members):
+                for right in members[i + 1:]:
+                    candidates.add((left, right) if left < right else (right, left))
+
+    parent = list(range(len(items)))
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    edge_scores = defaultdict(list)
+    for left, right in candidates:
+        union = len(token_sets[left] | token_sets[right])
+        score = len(token_sets[left] & token_sets[right]) / union
+        if score >= DEDUPE_THRESHOLD:
+            root_left, root_right = find(left), find(right)
+            if root_left != root_right:
+                parent[root_right] = root_left
+            edge_scores[(left, right)] = score
+
+    groups = defaultdict(list)
+    for index in range(len(items)):
+        groups[find(index)].append(index)
+    scores = defaultdict(list)
+    for (left, _), score in edge_scores.items():
+        scores[find(left)].append(score)
+    clusters = [
+        (sorted(items[index][0] for index in members), round(sum(scores[root]) / len(scores[root]), 4))
+        for root, members in groups.items() if len(members) > 1
+    ]
+    return clusters, len(candidates)
+
+def run_duplicate_scan():
+    """Rebuild pending duplicate clusters for the whole catalog."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT id, title, brand, width, depth, height FROM products")
+    products = cur.fetchall()
+    clusters, candidate_pairs = find_duplicate_clusters(products)
+
+    # Clusters a reviewer already dismissed stay dismissed
+    cur.execute("SELECT product_ids FROM duplicate_clusters WHERE status = 'dismissed'")
+    dismissed = {tuple(sorted(row["product_ids"])) for row in cur.fetchall()}
+    clusters = [cluster for cluster in clusters if tuple(cluster[0]) not in dismissed]
+
+    cur.execute("DELETE FROM duplicate_clusters WHERE status = 'pending'")
+    if clusters:
+        execute_values(cur, "INSERT INTO duplicate_clusters (product_ids, similarity) VALUES %s", clusters)
+    conn.commit()
+    cur.close()
+    conn.close()
+    return {"products_scanned": len(products), "candidate_pairs": candidate_pairs, "clusters": len(clusters)}
+
+@app.post("/admin/duplicates/scan")
+async def scan_duplicates(user: dict = Depends(require_permission("write"))):
+    """Run the near-duplicate detection job (admin/manager only)"""
+    result = await run_in_threadpool(run_duplicate_scan)
+    log_audit(user["username"], "duplicate_scan", "products", None, result)
+    return result
+
+@app.get("/admin/duplicates")
+async def get_duplicate_clusters(
+    status: str = "pending",
+    limit: int = 50,
+    offset: int = 0,
+    user: dict = Depends(require_permission("write"))
+):
+    """List duplicate clusters with their products, most similar first (admin/manager only)"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT * FROM duplicate_clusters WHERE status = %s
+        ORDER BY similarity DESC, id LIMIT %s OFFSET %s
+    """, (status, limit, offset))
+    clusters = cur.fetchall()
+    product_ids = list({product_id for cluster in clusters for product_id in cluster["product_ids"]})
+    cur.execute("""
+        SELECT id, title, brand, vendor, sku, upc, price, qty, width, depth, height, image_url, out_of_stock
+        FROM products WHERE id = ANY(%s)
+    """, (product_ids,))
+    products = {row["id"]: row for row in cur.fetchall()}
+    cur.close()
+    conn.close()
+
+    results = []
+    for cluster in clusters:
+        members = [products[product_id] for product_id in cluster["product_ids"] if product_id in products]
+        # Clusters whose products were merged or deleted elsewhere are no longer actionable
+        if status == "pending" and len(members) < 2:
+            continue
+        results.append({**cluster, "products": members})
+    return {"clusters": results, "limit": limit, "offset": offset}
+
+@app.post("/admin/duplicates/{cluster_id}/merge")
+async def merge_duplicate_cluster(cluster_id: int, merge: DuplicateMerge, user: dict = Depends(require_permission("delete"))):
+    """Merge a duplicate cluster into one product (admin/manager only).
+
+    Empty fields on the kept product are filled from the others, which are
+    then deleted.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM duplicate_clusters WHERE id = %s FOR UPDATE", (cluster_id,))
+    cluster = cur.fetchone()
+    if not cluster or cluster["status"] != "pending":
+        cur.close()
+        conn.close()
+        raise HTTPException(status_code=404, detail="Pending duplicate cluster not found")
+    if merge.keep_id not in cluster["product_ids"]:
+        cur.close()
+        conn.close()
+        raise HTTPException(status_code=400, detail="keep_id must be one of the cluster's products")
+
+    cur.execute("SELECT * FROM products WHERE id = ANY(%s) ORDER BY id", (cluster["product_ids"],))
+    rows = {row["id"]: row for row in cur.fetchall()}
+    if merge.keep_id not in rows:
+        cur.close()
+        conn.close()
+        raise HTTPException(status_code=404, detail="Product not found")
+    kept = rows.pop(merge.keep_id)
+    fills = {}
+    for column in DEDUPE_FILL_COLUMNS:
+        if kept.get(column) in (None, ""):
+            for other in rows.values():
+                if other.get(column) not in (None, ""):
+                    fills[column] = other[column]
+                    break
+    if fills:
+        cur.execute(
+            f"UPDATE products SET {', '.join(f'{column} = %s' for column in fills)} WHERE id = %s",
+            list(fills.values()) + [merge.keep_id]
+        )
+    removed_ids = list(rows.keys())
+    cur.execute("DELETE FROM products WHERE id = ANY(%s)", (removed_ids,))
+    cur.execute("""
+        UPDATE duplicate_clusters SET status = 'merged', kept_id = %s, reviewed_by = %s, reviewed_at = NOW()
+        WHERE id = %s
+    """, (merge.keep_id, user["username"], cluster_id))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+    log_audit(user["username"], "duplicates_merged", "product", str(merge.keep_id),
+              {"cluster_id": cluster_id, "removed_ids": removed_ids, "filled": list(fills.keys())})
+    return {"message": "Duplicates merged", "kept_id": merge.keep_id, "removed_ids": removed_ids}
+
+@app.post("/admin/duplicates/{cluster_id}/dismiss")
+async def dismiss_duplicate_cluster(cluster_id: int, user: dict = Depends(require_permission("write"))):
+    """Mark a duplicate cluster as not duplicates (admin/manager only)"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE duplicate_clusters SET status = 'dismissed', reviewed_by = %s, reviewed_at = NOW()
+        WHERE id = %s AND status = 'pending'
+    """, (user["username"], cluster_id))
+    if cur.rowcount == 0:
+        cur.close()
+        conn.close()
+        raise HTTPException(status_code=404, detail="Pending duplicate cluster not found")
+    conn.commit()
+    cur.close()
+    conn.close()
+    log_audit(user["username"], "duplicates_dismissed", "duplicate_cluster", str(cluster_id))
+    return {"message": "Duplicate cluster dismissed"}
+
+# ============= RELATED PRODUCTS ENDPOINTS =============
+
+RELATED_TOP_K = int(os.getenv("RELATED_TOP_K", "12"))
+RELATED_HOUR = int(os.getenv("RELATED_HOUR", "2"))  # local time the nightly rebuild runs
+RELATED_HASH_DIM = 128
+# Similarity matrix cells computed per batch (~64MB of float32)
+RELATED_BATCH_CELLS = 16 * 1024 * 1024
+RELATED_GROUP = 64
+RELATED_WEIGHTS = {
+    "category": 3.0,
+    "style": 1.5,
+    "material": 1.0,
+    "color": 1.0,
+    "brand": 1.0,
+    "width": 0.5,
+    "depth": 0.5,
+    "height": 0.5,
+    "price": 1.0,
+}
+RELATED_TEXT_FIELDS = ["category", "style", "material", "color", "brand"]
+RELATED_NUMERIC_FIELDS = ["width", "depth", "height", "price"]
+
+def related_tokens(product):
+    """Normalized tokens per text field.
+
+    Categories contribute every level of their path, so "Chairs > Task Chairs"
+    still partly matches "Chairs > Guest Chairs". Style, material and color
+    may hold comma-separated multi-values.
+    """
+    path = product.get("category_path") or ""
+    levels = path.split("/") if path else []
+    tokens = {"category": ["/".join(levels[:depth]) for depth in range(1, len(levels) + 1)]}
+    for field in ("style", "material", "color"):
+        parts = (normalize_category_value(part) for part in (product.get(field) or "").split(","))
+        tokens[field] = [part for part in parts if part]
+    brand = normalize_category_value(product.get("brand"))
+    tokens["brand"] = [brand] if brand else []
+    return tokens
+
+def related_feature_matrix(products):
+    """Encode products as L2-normalized float32 rows, so a dot product is cosine similarity.
+
+    Text tokens are feature-hashed (signed) into RELATED_HASH_DIM columns;
+    dimensions and price are log-scaled z-scores, with missing values at the
+    mean so they neither attract nor repel.
+    """
+    rows, cols, vals = [], [], []
+    for index, product in enumerate(products):
+        for field, tokens in related_tokens(product).items():
+            if not tokens:
+                continue
+            weight = RELATED_WEIGHTS[field] / len(tokens) ** 0.5
+            for token in tokens:
+                h = zlib.crc32(f"{field}:{token}".encode("utf-8"))
+                rows.append(index)
+                cols.append(h % RELATED_HASH_DIM)
+                vals.append(weight if h & 0x80000000 else -weight)
+    matrix = np.zeros((len(products), RELATED_HASH_DIM + len(RELATED_NUMERIC_FIELDS)), dtype=np.float32)
+    np.add.at(matrix, (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)), np.array(vals, dtype=np.float32))
+
+    for offset, field in enumerate(RELATED_NUMERIC_FIELDS):
+        values = np.array([product.get(field) for product in products], dtype=np.float64)
+        present = np.isfinite(values) & (values > 0)
+        if present.sum() < 2:
+            continue
+        logs = np.log1p(values[present])
+        spread = logs.std() or 1.0
+        column = np.zeros(len(products), dtype=np.float32)
+        column[present] = np.clip((logs - logs.mean()) / spread, -3, 3)
+        matrix[:, RELATED_HASH_DIM + offset] = column * RELATED_WEIGHTS[field]
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def nearest_neighbors(matrix, candidate_mask, k: int):
+    """Top-k most similar candidate rows for every row, by batched matrix products.
+
+    Selecting the top k out of every full similarity row is what dominates,
+    so candidates are taken in groups of RELATED_GROUP columns: the k groups
+    with the highest maxima must hold the k best scores, and only those
+    k * RELATED_GROUP cells are ranked. Returns (indices, scores) of shape
+    (rows, k), best first; a row's own index is never returned and unfilled
+    slots have index -1.
+    """
+    candidates = np.flatnonzero(candidate_mask)
+    total, count = len(matrix), len(candidates)
+    indices = np.full((total, k), -1, dtype=np.int64)
+    scores = np.full((total, k), -np.inf, dtype=np.float32)
+    if not count or not k:
+        return indices, scores
+    take = min(k, count)
+    groups = -(-count // RELATED_GROUP)
+    padded = groups * RELATED_GROUP
+    candidate_matrix = np.zeros((matrix.shape[1], padded), dtype=np.float32)
+    candidate_matrix[:, :count] = matrix[candidates].T
+    # Padding columns map to -1 and always score -inf
+    column_ids = np.full(padded, -1, dtype=np.int64)
+    column_ids[:count] = candidates
+    batch = max(1, RELATED_BATCH_CELLS // padded)
+    for start in range(0, total, batch):
+        stop = min(start + batch, total)
+        rows = stop - start
+        similarity = matrix[start:stop] @ candidate_matrix
+        similarity[:, count:] = -np.inf
+        # Knock out each row's own column
+        own = np.arange(start, stop)
+        position = np.minimum(np.searchsorted(candidates, own), count - 1)
+        is_candidate = candidates[position] == own
+        similarity[np.flatnonzero(is_candidate), position[is_candidate]] = -np.inf
+        if take < groups:
+            group_max = similarity.reshape(rows, groups, RELATED_GROUP).max(axis=2)
+            best_groups = np.argpartition(group_max, groups - take, axis=1)[:, groups - take:]
+            columns = (best_groups[:, :, None] * RELATED_GROUP + np.arange(RELATED_GROUP)).reshape(rows, -1)
+        else:
+            columns = np.broadcast_to(np.arange(padded), (rows, padded))
+        pool = np.take_along_axis(similarity, columns, axis=1)
+        top = np.argpartition(pool, pool.shape[1] - take, axis=1)[:, pool.shape[1] - take:]
+        top_scores = np.take_along_axis(pool, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(np.take_along_axis(columns, top, axis=1), order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        indices[start:stop, :take] = np.where(np.isfinite(top_scores), column_ids[top], -1)
+        scores[start:stop, :take] = top_scores
+    return indices, scores
+
+def compute_related_rows(products, k: int = RELATED_TOP_K):
+    """(product_id, rank, related_id, score) rows; only in-stock products are suggested."""
+    if len(products) < 2:
+        return []
+    matrix = related_feature_matrix(products)
+    in_stock = np.array([not product.get("out_of_stock") for product in products])
+    indices, scores = nearest_neighbors(matrix, in_stock, k)
+    ids = [product["id"] for product in products]
+    rows = []
+    for row, product_id in enumerate(ids):
+        for rank in range(k):
+            neighbor = indices[row, rank]
+            if neighbor < 0:
+                break
+            rows.append((product_id, rank + 1, ids[neighbor], round(float(scores[row, rank]), 4)))
+    return rows
+
+def run_related_products(day: date = None) -> dict:
+    """Recompute related_products for the whole catalog in one transaction,
+    recording the run against `day` (today in New York by default)."""
+    day = day or datetime.now(pytz.timezone('America/New_York')).date()
+    started = time.monotonic()
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('related_products'))")
+        cur.execute("""
+            SELECT id, category_path, style, material, color, brand, width, depth, height, price, out_of_stock
+            FROM products ORDER BY id
+        """)
+        products = cur.fetchall()
+        rows = compute_related_rows(products)
+        computed = time.monotonic() - started
+        cur.execute("DELETE FROM related_products")
+        if rows:
+            execute_values(cur, "INSERT INTO related_products (product_id, rank, related_id, score) VALUES %s",
+                           rows, page_size=5000)
+        cur.execute("""
+            INSERT INTO related_products_runs (day, products, rows) VALUES (%s, %s, %s)
+            ON CONFLICT (day) DO UPDATE SET products = EXCLUDED.products, rows = EXCLUDED.rows, finished_at = NOW()
+        """, (day, len(products), len(rows)))
+        settings_cache.notify(cur, "catalog:related")
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    settings_cache.invalidate("catalog:related")
+    return {
+        "products": len(products),
+        "rows": len(rows),
+        "compute_seconds": round(computed, 2),
+        "total_seconds": round(time.monotonic() - started, 2),
+    }
+
+def related_products_done(day: date) -> bool:
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM related_products_runs WHERE day >= %s LIMIT 1", (day,))
+    done = cur.fetchone() is not None
+    cur.close()
+    conn.close()
+    return done
+
+async def schedule_related_products():
+    est_tz = pytz.timezone('America/New_York')
+    while True:
+        now = datetime.now(est_tz)
+        try:
+            # Catch up if the process was down at RELATED_HOUR
+            if now.hour >= RELATED_HOUR and not await run_in_threadpool(related_products_done, now.date()):
+                await run_in_threadpool(run_related_products, now.date())
+        except Exception as e:
+            print(f"Related products error: {e}")
+        next_run = est_tz.localize(datetime.combine(now.date(), datetime.min.time()).replace(hour=RELATED_HOUR))
+        if next_run <= now:
+            next_run = est_tz.localize(datetime.combine(now.date() + timedelta(days=1), datetime.min.time()).replace(hour=RELATED_HOUR))
+        await asyncio.sleep((next_run - now).total_seconds())
+
+@app.on_event("startup")
+async def start_related_products():
+    asyncio.create_task(schedule_related_products())
+
+@app.get("/products/{id}/related")
+async def get_related_products(id: int, request: Request, response: Response, limit: int = 6):
+    """In-stock products most similar to this one, from the nightly related_products table."""
+    limit = max(1, min(limit, RELATED_TOP_K))
+
+    # One entry per product whatever the limit; the response is a prefix of it
+    def load():
+        conn = replica_router.connect([], consistent=True)
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT p.*, r.score
+            FROM related_products r
+            JOIN products p ON p.id = r.related_id
+            WHERE r.product_id = %s AND NOT COALESCE(p.out_of_stock, FALSE)
+            ORDER BY r.rank
+        """, (id,))
+        products = cur.fetchall()
+        cur.close()
+        conn.close()
+        return products
+
+    products, etag = settings_cache.get(f"catalog:related:{id}", load)
+    related = {"product_id": id, "products": products[:limit]}
+    return etag_response(request, response, related, f'{etag[:-1]}-{limit}"')
+
+@app.post("/admin/related-products/rebuild")
+async def rebuild_related_products(user: dict = Depends(require_permission("write"))):
+    """Recompute related products now instead of waiting for the nightly run"""
+    result = await run_in_threadpool(run_related_products)
+    log_audit(user["username"], "related_products_rebuilt", "products", None, result)
+    return result
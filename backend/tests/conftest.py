@@ -0,0 +1,39 @@
+"""Shared fixtures for the backend tests.
+
+Importing the backend runs its migrations, so the suite needs a scratch
+Postgres reachable through the usual DB_* variables, e.g.:
+    DB_HOST=localhost DB_NAME=npp_test DB_PASSWORD=... python -m pytest backend/tests
+
+A throwaway one is enough (CI uses the postgres:13 service in ci-cd.yml):
+    docker run --rm -d -p 5432:5432 -e POSTGRES_DB=npp_test -e POSTGRES_PASSWORD=test postgres:13
+
+Tests that touch the database are skipped when it cannot be reached. Some of
+them clear tables (email_outbox, ...), so never point them at real data.
+"""
+
+import os
+import sys
+
+import psycopg2
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+@pytest.fixture(scope="session")
+def backend():
+    try:
+        import main
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"database not reachable: {e}")
+    return main
+
+
+@pytest.fixture
+def db(backend):
+    conn = backend.get_db_connection()
+    conn.autocommit = True
+    cur = conn.cursor()
+    yield cur
+    cur.close()
+    conn.close()
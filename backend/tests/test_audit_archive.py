@@ -0,0 +1,73 @@
+"""Audit retention: archiving old partitions to gzipped NDJSON and searching the archives."""
+
+import gzip
+import hashlib
+import json
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+PARTITION = "audit_logs_y1999m01"
+START, END = datetime(1999, 1, 1), datetime(1999, 2, 1)
+
+
+@pytest.fixture
+def old_partition(backend, db, tmp_path, monkeypatch):
+    monkeypatch.setattr(backend, "AUDIT_ARCHIVE_DIR", str(tmp_path))
+    db.execute(f"CREATE TABLE {PARTITION} PARTITION OF audit_logs FOR VALUES FROM (%s) TO (%s)", (START, END))
+    db.execute("""
+        INSERT INTO audit_logs (timestamp, username, action, details)
+        SELECT '1999-01-01'::timestamp + n * interval '1 day', CASE WHEN n % 2 = 0 THEN 'alice' ELSE 'bob' END,
+               'product_updated', jsonb_build_object('n', n)
+        FROM generate_series(0, 9) n
+    """)
+    yield tmp_path
+    db.execute(f"DROP TABLE IF EXISTS {PARTITION}")
+    db.execute("DELETE FROM audit_archives WHERE partition_name = %s", (PARTITION,))
+
+
+def test_archive_writes_the_file_then_drops_the_partition(backend, db, old_partition):
+    result = backend.archive_audit_partition(PARTITION, START, END)
+
+    assert result["rows"] == 10
+    with gzip.open(result["path"], "rt", encoding="utf-8") as f:
+        lines = f.readlines()
+    rows = [json.loads(line) for line in lines]
+    assert [row["details"]["n"] for row in rows] == list(range(9, -1, -1))  # newest first
+    db.execute("SELECT * FROM audit_archives WHERE partition_name = %s", (PARTITION,))
+    archive = db.fetchone()
+    assert archive["row_count"] == 10
+    assert archive["sha256"] == hashlib.sha256("".join(lines).encode()).hexdigest()
+    assert not list(old_partition.glob("*.tmp"))
+    db.execute("SELECT to_regclass(%s) AS partition", (PARTITION,))
+    assert db.fetchone()["partition"] is None
+
+
+def test_only_partitions_past_retention_are_archived(backend, old_partition, monkeypatch):
+    archived = []
+    monkeypatch.setattr(backend, "archive_audit_partition", lambda *args: archived.append(args) or {})
+
+    assert backend.archive_old_audit_partitions(retention_months=0) == []
+    # Everything since 2001 is inside a 300-month window for the next few years
+    backend.archive_old_audit_partitions(retention_months=300)
+
+    assert archived == [(PARTITION, START, END)]
+
+
+def test_archived_rows_are_searchable(backend, old_partition):
+    backend.archive_audit_partition(PARTITION, START, END)
+    backend.app.dependency_overrides[backend.get_current_user_with_role] = lambda: {"username": "tester", "role": "admin"}
+    try:
+        client = TestClient(backend.app)
+        params = {"username": "alice", "start": "1999-01-01T00:00:00", "end": "1999-01-31T00:00:00", "limit": 3}
+        first = client.get("/admin/audit-logs/archive", params=params).json()
+        second = client.get("/admin/audit-logs/archive", params={**params, "cursor": first["next_cursor"]}).json()
+
+        assert [row["details"]["n"] for row in first["logs"]] == [8, 6, 4]
+        assert [row["details"]["n"] for row in second["logs"]] == [2, 0]
+        assert second["next_cursor"] is None
+        listed = client.get("/admin/audit-logs/archives").json()["archives"]
+        assert PARTITION in [archive["partition_name"] for archive in listed]
+    finally:
+        backend.app.dependency_overrides.clear()
@@ -0,0 +1,68 @@
+"""AuditWriter: bounded queue, batched inserts and shutdown drain."""
+
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def cleanup(db):
+    yield
+    db.execute("DELETE FROM audit_logs WHERE username LIKE 'audit-writer-test%'")
+
+
+def event(n, queued_at=None):
+    return (queued_at or time.time(), (f"audit-writer-test-{n}", "test_event", "test", str(n), None, "127.0.0.1"))
+
+
+def idle_writer(backend, **kwargs):
+    writer = backend.AuditWriter(**{"maxsize": 100, "batch_size": 10, "flush_ms": 50, **kwargs})
+    # Any live thread will do, so put() doesn't start the flusher
+    writer.thread = threading.current_thread()
+    return writer
+
+
+def test_full_queue_drops_instead_of_blocking(backend):
+    writer = idle_writer(backend, maxsize=2)
+    for n in range(3):
+        writer.put(event(n))
+    assert writer.snapshot() == {"enqueued": 2, "written": 0, "dropped": 1, "failed": 0, "queued": 2, "capacity": 2}
+
+
+def test_batches_are_capped(backend):
+    writer = idle_writer(backend, batch_size=2)
+    for n in range(5):
+        writer.put(event(n))
+    assert [len(writer.take_batch(0)) for _ in range(4)] == [2, 2, 1, 0]
+
+
+def test_close_drains_the_queue_in_batches(backend, db, cleanup):
+    writer = backend.AuditWriter(maxsize=100, batch_size=3, flush_ms=200)
+    writer.put(event(0, queued_at=time.time() - 120))
+    for n in range(1, 7):
+        writer.put(event(n))
+
+    writer.close()
+
+    assert writer.snapshot()["written"] == 7
+    db.execute("""
+        SELECT username, EXTRACT(EPOCH FROM NOW() - timestamp) AS age
+        FROM audit_logs WHERE username LIKE 'audit-writer-test%' ORDER BY username
+    """)
+    rows = db.fetchall()
+    assert [row["username"] for row in rows] == [f"audit-writer-test-{n}" for n in range(7)]
+    # Stamped with when the event happened, not when it was flushed
+    assert 110 < rows[0]["age"] < 130
+    assert rows[1]["age"] < 10
+
+
+def test_failed_writes_are_counted(backend, monkeypatch):
+    def unavailable():
+        raise RuntimeError("database down")
+
+    monkeypatch.setattr(backend, "get_db_connection", unavailable)
+    writer = backend.AuditWriter(maxsize=10, batch_size=10, flush_ms=10)
+    writer.put(event(0))
+    writer.close()
+    assert writer.snapshot()["failed"] == 1
@@ -0,0 +1,83 @@
+"""Token checks against the cached user state: epoch revocation, disabling and
+cross-worker invalidation."""
+
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+ADMIN = "auth-test-admin"
+USER = "auth-test-user"
+
+
+@pytest.fixture
+def client(backend, db):
+    password = backend.hash_password("not-a-real-password")
+    db.execute("""
+        INSERT INTO users (username, password, role) VALUES (%s, %s, 'admin'), (%s, %s, 'manager')
+    """, (ADMIN, password, USER, password))
+    yield TestClient(backend.app)
+    db.execute("DELETE FROM user_settings WHERE username IN (%s, %s)", (ADMIN, USER))
+    db.execute("DELETE FROM users WHERE username IN (%s, %s)", (ADMIN, USER))
+    backend.invalidate_user_state(ADMIN)
+    backend.invalidate_user_state(USER)
+
+
+def bearer(backend, username, role, epoch=0):
+    return {"Authorization": "Bearer " + backend.issue_tokens(username, role, epoch)["access_token"]}
+
+
+def test_role_change_revokes_existing_tokens(backend, client):
+    user = bearer(backend, USER, "manager")
+    admin = bearer(backend, ADMIN, "admin")
+    assert client.get("/user/me", headers=user).status_code == 200
+    assert client.post("/products/check-duplicates", headers=user, json={}).status_code == 200
+
+    response = client.patch(f"/admin/users/{USER}", headers=admin, json={"role": "viewer"})
+    assert response.status_code == 200
+
+    # Both the plain and the role-checked dependencies reject the old token
+    assert client.get("/user/me", headers=user).status_code == 401
+    assert client.get("/admin/users", headers=user).status_code == 401
+    # A token carrying the new epoch works, with the new role
+    fresh = bearer(backend, USER, "viewer", epoch=1)
+    assert client.get("/user/me", headers=fresh).json()["role"] == "viewer"
+    assert client.get("/admin/users", headers=fresh).status_code == 403
+
+
+def test_refresh_token_is_revoked_too(backend, client):
+    refresh = backend.issue_tokens(USER, "manager", 0)["refresh_token"]
+    assert client.post("/token/refresh", json={"refresh_token": refresh}).status_code == 200
+
+    client.patch(f"/admin/users/{USER}", headers=bearer(backend, ADMIN, "admin"), json={"password": "changed-it"})
+
+    assert client.post("/token/refresh", json={"refresh_token": refresh}).status_code == 401
+
+
+def test_disabled_and_deleted_users_are_rejected(backend, client):
+    user = bearer(backend, USER, "manager")
+    admin = bearer(backend, ADMIN, "admin")
+    client.patch(f"/admin/users/{USER}", headers=admin, json={"is_active": False})
+    # Refused as disabled, whatever epoch the token carries
+    assert client.get("/user/me", headers=user).status_code == 403
+    assert client.get("/user/me", headers=bearer(backend, USER, "manager", epoch=1)).status_code == 403
+
+    assert client.delete(f"/admin/users/{USER}", headers=admin).status_code == 200
+    assert client.get("/user/me", headers=bearer(backend, USER, "manager", epoch=1)).status_code == 403
+
+
+def test_change_announced_by_another_worker_drops_the_cached_state(backend, db, client):
+    user = bearer(backend, USER, "manager")
+    assert client.get("/admin/users", headers=user).status_code == 403  # managers lack manage_users
+    assert client.post("/products/check-duplicates", headers=user, json={}).status_code == 200
+    assert USER in backend.user_state_cache
+
+    # Another worker disables the user and announces it
+    db.execute("UPDATE users SET is_active = FALSE, token_epoch = token_epoch + 1 WHERE username = %s", (USER,))
+    db.execute("SELECT pg_notify(%s, %s)", (backend.SETTINGS_CHANNEL, f"other-worker|{backend.user_state_key(USER)}"))
+    for _ in range(50):
+        if USER not in backend.user_state_cache:
+            break
+        time.sleep(0.1)
+
+    assert client.post("/products/check-duplicates", headers=user, json={}).status_code == 403
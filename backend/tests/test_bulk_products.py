@@ -0,0 +1,100 @@
+"""The /products/bulk endpoints: per-item results in request order."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def client(backend, db):
+    backend.app.dependency_overrides[backend.get_current_user] = lambda: "tester"
+    yield TestClient(backend.app)
+    backend.app.dependency_overrides.clear()
+    db.execute("DELETE FROM products WHERE sku ILIKE 'BULK-TEST-%' OR title LIKE 'Bulk test%'")
+
+
+def product(sku, title=None, **fields):
+    return {"title": title or f"Bulk test {sku}", "sku": sku, "price": 10, **fields}
+
+
+def stored(db, product_id):
+    db.execute("SELECT * FROM products WHERE id = %s", (product_id,))
+    return db.fetchone()
+
+
+def test_create_reports_each_item(backend, db, client):
+    if not backend.SKU_UNIQUE_INDEX_READY:
+        pytest.skip("unique SKU index not built on this database")
+    existing = client.post("/products/bulk", json=[product("BULK-TEST-1")]).json()["results"][0]["product_id"]
+
+    response = client.post("/products/bulk", json=[
+        product("BULK-TEST-2", "Bulk test second"),
+        product(" bulk-test-1 "),            # existing SKU, different case and spacing
+        product("", "Bulk test no sku A"),   # blank SKUs never conflict
+        product("BULK-TEST-3", "Bulk test third"),
+        product("bulk-test-3"),              # repeated within the batch
+        product("", "Bulk test no sku B"),
+    ])
+
+    body = response.json()
+    assert body["created"] == 4
+    statuses = [(item["index"], item["status"]) for item in body["results"]]
+    assert statuses == [(0, "created"), (1, "duplicate_sku"), (2, "created"),
+                        (3, "created"), (4, "duplicate_sku"), (5, "created")]
+    # Every created id points at the row built from that item
+    for item, title in zip(body["results"], ["Bulk test second", None, "Bulk test no sku A",
+                                              "Bulk test third", None, "Bulk test no sku B"]):
+        if title:
+            assert stored(db, item["product_id"])["title"] == title
+        else:
+            assert item["product_id"] is None
+    assert stored(db, existing)["title"] == "Bulk test BULK-TEST-1"
+
+
+def test_update_groups_and_reports_missing(db, client):
+    ids = [item["product_id"] for item in client.post("/products/bulk", json=[
+        product("BULK-TEST-U1"), product("BULK-TEST-U2")]).json()["results"]]
+
+    response = client.patch("/products/bulk", json=[
+        {"id": ids[0], "price": 25},
+        {"id": ids[1], "qty": 7, "price": 30},
+        {"id": 2_000_000_000, "price": 1},
+        {"id": 2_000_000_001},
+    ])
+
+    assert response.json()["results"] == [
+        {"id": ids[0], "status": "updated"},
+        {"id": ids[1], "status": "updated"},
+        {"id": 2_000_000_000, "status": "not_found"},
+        {"id": 2_000_000_001, "status": "no_fields"},
+    ]
+    assert stored(db, ids[0])["price"] == 25
+    assert (stored(db, ids[1])["price"], stored(db, ids[1])["qty"]) == (30, 7)
+    assert client.patch("/products/bulk", json=[{"id": ids[0], "price": 1}, {"id": ids[0], "qty": 1}]).status_code == 400
+
+
+def test_update_sku_conflict_rolls_back(backend, db, client):
+    if not backend.SKU_UNIQUE_INDEX_READY:
+        pytest.skip("unique SKU index not built on this database")
+    ids = [item["product_id"] for item in client.post("/products/bulk", json=[
+        product("BULK-TEST-C1"), product("BULK-TEST-C2")]).json()["results"]]
+
+    response = client.patch("/products/bulk", json=[{"id": ids[0], "price": 99}, {"id": ids[1], "sku": "bulk-test-c1"}])
+
+    assert response.status_code == 409
+    assert stored(db, ids[0])["price"] == 10
+
+
+def test_mark_out_of_stock_and_delete(db, client):
+    ids = [item["product_id"] for item in client.post("/products/bulk", json=[
+        product("BULK-TEST-D1", vendor="Bulk Test Vendor"), product("BULK-TEST-D2", vendor="Bulk Test Vendor"),
+        product("BULK-TEST-D3", vendor="Other Bulk Test Vendor")]).json()["results"]]
+
+    marked = client.post("/products/bulk/mark-out-of-stock", json={"ids": [ids[0], 2_000_000_000]}).json()
+    assert marked["results"] == [{"id": ids[0], "status": "updated"}, {"id": 2_000_000_000, "status": "not_found"}]
+
+    # ids and filters combine with AND
+    deleted = client.post("/products/bulk/delete", json={"ids": ids, "vendor": "Bulk Test Vendor", "out_of_stock": True})
+    assert deleted.status_code == 200
+    assert stored(db, ids[0]) is None
+    assert stored(db, ids[1]) is not None
+    assert client.post("/products/bulk/delete", json={}).status_code == 400
@@ -0,0 +1,61 @@
+"""Category counts kept by the products statement triggers."""
+
+import threading
+import time
+
+
+def category_counts(cur, prefix):
+    cur.execute("SELECT path, product_count, min_price, max_price FROM categories WHERE path LIKE %s ORDER BY path", (prefix + "%",))
+    return [tuple(row.values()) for row in cur.fetchall()]
+
+
+def test_insert_and_delete_maintain_counts(db):
+    db.execute("""
+        INSERT INTO products (title, category, price) VALUES
+            ('c1', 'Category Test > Desks', 100), ('c2', 'Category Test > Desks', 300),
+            ('c3', 'Category Test > Chairs', 50)
+    """)
+    try:
+        assert category_counts(db, "category test") == [
+            ("category test", 3, 50.0, 300.0),
+            ("category test/chairs", 1, 50.0, 50.0),
+            ("category test/desks", 2, 100.0, 300.0),
+        ]
+        db.execute("UPDATE products SET out_of_stock = TRUE WHERE title = 'c2' AND category LIKE 'Category Test%'")
+        assert category_counts(db, "category test/desks") == [("category test/desks", 2, 100.0, 100.0)]
+        db.execute("DELETE FROM products WHERE title = 'c3' AND category LIKE 'Category Test%'")
+        assert category_counts(db, "category test") == [
+            ("category test", 2, 100.0, 100.0),
+            ("category test/desks", 2, 100.0, 100.0),
+        ]
+    finally:
+        db.execute("DELETE FROM products WHERE category LIKE 'Category Test%'")
+    assert category_counts(db, "category test") == []
+
+
+def test_recount_waits_for_concurrent_insert(backend, db):
+    """An UPDATE's recount must not overwrite the delta of an insert that commits while it runs."""
+    db.execute("INSERT INTO products (title, category, price) VALUES ('r0', 'Race Test > Sub', 5)")
+    inserter, updater = backend.db_pool.connect(), backend.db_pool.connect()
+    try:
+        # Insert applies its delta to both nodes and holds them uncommitted
+        inserter.cursor().execute("INSERT INTO products (title, category, price) VALUES ('r1', 'Race Test > Sub', 7)")
+
+        def update():
+            updater.cursor().execute("UPDATE products SET price = 6 WHERE title = 'r0' AND category = 'Race Test > Sub'")
+            updater.commit()
+        thread = threading.Thread(target=update)
+        thread.start()
+        time.sleep(0.3)
+        assert thread.is_alive()  # the recount waits for the insert's locks
+        inserter.commit()
+        thread.join(10)
+
+        assert category_counts(db, "race test") == [
+            ("race test", 2, 6.0, 7.0),
+            ("race test/sub", 2, 6.0, 7.0),
+        ]
+    finally:
+        inserter.close()
+        updater.close()
+        db.execute("DELETE FROM products WHERE category LIKE 'Race Test%'")
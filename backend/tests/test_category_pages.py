@@ -0,0 +1,62 @@
+"""category_key(): the SQL twin of normalize_category_value(), and the category page that looks it up."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+SAMPLES = [
+    "Tables & Desks",
+    "  Café   Chairs ",
+    "Office-Chairs!!",
+    "Chairs > Task Chairs",
+    "Ñandú_Sofas",
+    "",
+]
+
+
+@pytest.mark.parametrize("value", SAMPLES)
+def test_sql_and_python_keys_agree(backend, db, value):
+    db.execute("SELECT category_key(%s) AS key, category_path(%s) AS path", (value, value))
+    row = db.fetchone()
+    assert row["key"] == backend.normalize_category_value(value)
+    assert (row["path"] or "") == backend.category_path_value(value)
+
+
+@pytest.fixture
+def products(db):
+    db.execute("""
+        INSERT INTO products (title, sku, category, price) VALUES
+            ('B Desk', 'CATPAGE-TEST-1', 'Slug Test Tables & Desks', 100),
+            ('A Desk', 'CATPAGE-TEST-2', 'slug test tables and desks', 200),
+            ('C Desk', 'CATPAGE-TEST-3', 'Slug-Test Tables and Desks!', 300),
+            ('Chair', 'CATPAGE-TEST-4', 'Slug Test Chairs', 50)
+        RETURNING id
+    """)
+    yield [row["id"] for row in db.fetchall()]
+    db.execute("DELETE FROM products WHERE sku LIKE 'CATPAGE-TEST-%'")
+
+
+@pytest.fixture
+def client(backend, products):
+    return TestClient(backend.app)
+
+
+def test_spellings_of_a_category_share_one_page(client):
+    response = client.get("/products/category/slug-test-tables-and-desks")
+    body = response.json()
+    assert [p["title"] for p in body["products"]] == ["A Desk", "B Desk", "C Desk"]
+    assert body["total"] == 3
+
+
+def test_paging_keeps_the_total(client):
+    body = client.get("/products/category/Slug Test Tables & Desks", params={"limit": 2, "offset": 2}).json()
+    assert [p["title"] for p in body["products"]] == ["C Desk"]
+    assert (body["total"], body["has_more"]) == (3, False)
+    # Past the end: still the category's total, from the count fallback
+    body = client.get("/products/category/Slug Test Tables & Desks", params={"offset": 10}).json()
+    assert (body["products"], body["total"]) == ([], 3)
+
+
+def test_key_follows_category_updates(client, db, products):
+    db.execute("UPDATE products SET category = 'Slug Test Chairs' WHERE id = %s", (products[0],))
+    assert client.get("/products/category/slug test chairs").json()["total"] == 2
+    assert client.get("/products/category/Unknown Slug Test").status_code == 404
@@ -0,0 +1,62 @@
+"""ConnectionPool reuse, and recovery from sessions the server has dropped."""
+
+import pytest
+
+
+@pytest.fixture
+def pool(backend):
+    pool = backend.ConnectionPool(4, 300)
+    yield pool
+    while pool.idle:
+        backend.psycopg2.extensions.connection.close(pool.idle.pop())
+
+
+def backend_pid(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT pg_backend_pid() AS pid")
+    pid = cur.fetchone()["pid"]
+    conn.rollback()
+    return pid
+
+
+def test_released_connection_is_reused_clean(pool):
+    conn = pool.get()
+    pid = backend_pid(conn)
+    cur = conn.cursor()
+    cur.execute("CREATE TEMP TABLE pool_probe (id INTEGER)")
+    conn.close()  # left mid-transaction: rolled back on release
+
+    again = pool.get()
+    assert again is conn
+    assert backend_pid(again) == pid
+    cur = again.cursor()
+    cur.execute("SELECT to_regclass('pg_temp.pool_probe') AS probe")
+    assert cur.fetchone()["probe"] is None
+    again.close()
+    assert pool.snapshot()["reused"] == 1
+
+
+def test_terminated_session_is_replaced(pool, db):
+    conn = pool.get()
+    pid = backend_pid(conn)
+    conn.close()
+    # What a server restart does to every idle pooled session
+    db.execute("SELECT pg_terminate_backend(%s)", (pid,))
+    db.execute("SELECT pg_sleep(0.2)")
+
+    fresh = pool.get()
+    assert fresh is not conn
+    assert backend_pid(fresh) != pid
+    fresh.close()
+    assert pool.snapshot()["dropped"] == 1
+
+
+def test_long_idle_connection_is_validated(pool, backend, monkeypatch):
+    monkeypatch.setattr(backend, "DB_POOL_VALIDATE_SECONDS", 0)
+    conn = pool.get()
+    conn.close()
+    again = pool.get()
+    assert again is conn
+    # The check runs outside any transaction it leaves behind
+    assert again.info.transaction_status == backend.psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    again.close()
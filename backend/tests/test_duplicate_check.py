@@ -0,0 +1,63 @@
+"""POST /products/check-duplicates resolves many SKUs and UPCs in one request."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def products(db):
+    db.execute("""
+        INSERT INTO products (title, sku, upc) VALUES
+            ('Check test 1', 'CHECK-TEST-1', '000111222333'),
+            ('Check test 2', 'CHECK-TEST-2', NULL),
+            ('Check test 3', '', '000111222444')
+        RETURNING id
+    """)
+    yield [row["id"] for row in db.fetchall()]
+    db.execute("DELETE FROM products WHERE title LIKE 'Check test %'")
+
+
+@pytest.fixture
+def client(backend, products):
+    backend.app.dependency_overrides[backend.get_current_user] = lambda: "tester"
+    yield TestClient(backend.app)
+    backend.app.dependency_overrides.clear()
+
+
+def ids(matches):
+    return [product["id"] for product in matches]
+
+
+def test_maps_each_identifier_as_sent(client, products):
+    first, second, third = products
+
+    body = client.post("/products/check-duplicates", json={
+        "skus": [" check-test-1 ", "CHECK-TEST-2", "CHECK-TEST-404", ""],
+        "upcs": ["000111222444 ", "000111222333", "999"],
+    }).json()
+
+    assert body["duplicate"] is True
+    assert {sku: ids(matches) for sku, matches in body["skus"].items()} == {
+        " check-test-1 ": [first], "CHECK-TEST-2": [second], "CHECK-TEST-404": [], "": []}
+    assert {upc: ids(matches) for upc, matches in body["upcs"].items()} == {
+        "000111222444 ": [third], "000111222333": [first], "999": []}
+
+
+def test_no_matches_and_blank_input(client):
+    assert client.post("/products/check-duplicates", json={"skus": ["CHECK-TEST-404"]}).json() == {
+        "duplicate": False, "skus": {"CHECK-TEST-404": []}, "upcs": {}}
+    # Blank SKUs never match the products stored without one
+    assert client.post("/products/check-duplicates", json={"skus": [" "], "upcs": [""]}).json()["duplicate"] is False
+
+
+def test_agrees_with_the_single_check(client, products):
+    first = products[0]
+    single = client.get("/products/check-duplicate", params={"sku": "check-test-1", "upc": "000111222333"}).json()
+    batch = client.post("/products/check-duplicates", json={"skus": ["check-test-1"], "upcs": ["000111222333"]}).json()
+    assert ids(single["products"]) == ids(batch["skus"]["check-test-1"]) == ids(batch["upcs"]["000111222333"]) == [first]
+
+
+def test_rejects_oversized_batches(backend, client, monkeypatch):
+    monkeypatch.setattr(backend, "BULK_MAX_ITEMS", 2)
+    response = client.post("/products/check-duplicates", json={"skus": ["a", "b"], "upcs": ["c"]})
+    assert response.status_code == 400
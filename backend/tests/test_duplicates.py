@@ -0,0 +1,87 @@
+"""Near-duplicate detection: MinHash/LSH clustering, the scan job and merge/dismiss review."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+def product(id, title, brand=None, width=None, depth=None, height=None):
+    return {"id": id, "title": title, "brand": brand, "width": width, "depth": depth, "height": height}
+
+
+def test_reordered_titles_cluster_and_sizes_stay_apart(backend):
+    clusters, candidate_pairs = backend.find_duplicate_clusters([
+        product(1, "Payback Executive L-Desk", "Acme", 60, 30, 29),
+        product(2, "Payback L Desk - Executive", "ACME", 60.2, 30, 29),
+        product(3, "Oak Desk", width=60),
+        product(4, "Oak Desk", width=72),
+        product(5, "Mesh Task Chair", "Acme"),
+        product(6, ""),
+    ])
+
+    assert clusters == [([1, 2], 1.0)]
+    assert candidate_pairs >= 1
+
+
+def test_fewer_than_two_products(backend):
+    assert backend.find_duplicate_clusters([product(1, "Oak Desk")]) == ([], 0)
+
+
+@pytest.fixture
+def client(backend, db):
+    backend.app.dependency_overrides[backend.get_current_user_with_role] = lambda: {"username": "tester", "role": "admin"}
+    yield TestClient(backend.app)
+    backend.app.dependency_overrides.clear()
+    db.execute("DELETE FROM duplicate_clusters WHERE product_ids && ARRAY(SELECT id FROM products WHERE sku LIKE 'DEDUPE-TEST-%')")
+    db.execute("DELETE FROM products WHERE sku LIKE 'DEDUPE-TEST-%'")
+
+
+def insert_pair(db):
+    db.execute("""
+        INSERT INTO products (title, sku, brand, width, depth, height, price, image_url) VALUES
+            ('Zyxwv Dedupe Test Credenza', 'DEDUPE-TEST-1', 'Qwerty', 66, 20, 30, 500, NULL),
+            ('Credenza Zyxwv - Dedupe Test', 'DEDUPE-TEST-2', 'Qwerty', 66, 20, 30, NULL, 'https://example.com/c.jpg')
+        RETURNING id
+    """)
+    return [row["id"] for row in db.fetchall()]
+
+
+def cluster_for(client, ids, status="pending"):
+    clusters = client.get("/admin/duplicates", params={"status": status, "limit": 1000}).json()["clusters"]
+    return next((c for c in clusters if c["product_ids"] == sorted(ids)), None)
+
+
+def test_scan_then_merge_fills_empty_fields(db, client):
+    keep, other = insert_pair(db)
+    assert client.post("/admin/duplicates/scan").json()["clusters"] >= 1
+    cluster = cluster_for(client, [keep, other])
+    assert cluster is not None
+    assert {p["id"] for p in cluster["products"]} == {keep, other}
+
+    merged = client.post(f"/admin/duplicates/{cluster['id']}/merge", json={"keep_id": keep}).json()
+
+    assert merged["removed_ids"] == [other]
+    db.execute("SELECT price, image_url FROM products WHERE id = ANY(%s)", ([keep, other],))
+    [row] = db.fetchall()
+    assert (row["price"], row["image_url"]) == (500, "https://example.com/c.jpg")
+    # A merged cluster can't be merged again
+    assert client.post(f"/admin/duplicates/{cluster['id']}/merge", json={"keep_id": keep}).status_code == 404
+
+
+def test_merge_rejects_a_product_outside_the_cluster(db, client):
+    ids = insert_pair(db)
+    client.post("/admin/duplicates/scan")
+    cluster = cluster_for(client, ids)
+    response = client.post(f"/admin/duplicates/{cluster['id']}/merge", json={"keep_id": max(ids) + 1_000_000})
+    assert response.status_code == 400
+
+
+def test_dismissed_cluster_survives_rescans(db, client):
+    ids = insert_pair(db)
+    client.post("/admin/duplicates/scan")
+    cluster = cluster_for(client, ids)
+
+    assert client.post(f"/admin/duplicates/{cluster['id']}/dismiss").status_code == 200
+    client.post("/admin/duplicates/scan")
+
+    assert cluster_for(client, ids) is None
+    assert cluster_for(client, ids, "dismissed")["id"] == cluster["id"]
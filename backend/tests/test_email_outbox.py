@@ -0,0 +1,190 @@
+"""OutboxSender against a local SMTP stand-in: delivery, retry/backoff and stale claims."""
+
+import email
+import socketserver
+import threading
+import time
+
+import pytest
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Just enough SMTP for smtplib: records each DATA payload, or rejects it
+    with a 451 while `reject` is positive."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.messages = []
+        self.sessions = 0
+        self.reject = 0
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        server = self.server
+        server.sessions += 1
+        self.reply("220 stand-in ready")
+        data = None
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if data is not None:
+                if line.rstrip(b"\r\n") == b".":
+                    if server.reject:
+                        server.reject -= 1
+                        self.reply("451 try again later")
+                    else:
+                        server.messages.append(b"".join(data).decode())
+                        self.reply("250 queued")
+                    data = None
+                else:
+                    data.append(line)
+                continue
+            command = line.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 stand-in")
+            elif command == "DATA":
+                data = []
+                self.reply("354 end with .")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+@pytest.fixture
+def smtp_server(backend, monkeypatch):
+    server = SMTPStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(backend, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(backend, "SMTP_PORT", server.server_address[1])
+    monkeypatch.setattr(backend, "SMTP_STARTTLS", False)
+    monkeypatch.setattr(backend, "SMTP_FROM", "catalog@example.com")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sender(backend, db, smtp_server):
+    db.execute("DELETE FROM email_outbox")
+    sender = backend.OutboxSender()
+    yield sender
+    sender.close()
+    db.execute("DELETE FROM email_outbox")
+
+
+def queue(backend, db, subject="Quote request"):
+    return backend.queue_email(db, "invoice_request", "sales@example.com", subject, "<p>hello</p>", "buyer@example.com")
+
+
+def outbox_row(db, message_id):
+    db.execute("""
+        SELECT *, EXTRACT(EPOCH FROM next_attempt_at - NOW()) AS due_in
+        FROM email_outbox WHERE id = %s
+    """, (message_id,))
+    return db.fetchone()
+
+
+def test_sends_and_records_delivery(backend, db, sender, smtp_server):
+    first = queue(backend, db, "First")
+    second = queue(backend, db, "Second")
+
+    assert sender.process_batch() == 2
+
+    assert len(smtp_server.messages) == 2
+    delivered = email.message_from_string(smtp_server.messages[0])
+    assert delivered["Subject"] == "First"
+    assert delivered["To"] == "sales@example.com"
+    assert delivered["Reply-To"] == "buyer@example.com"
+    # Both messages went over one SMTP session
+    assert smtp_server.sessions == 1
+    for message_id in (first, second):
+        row = outbox_row(db, message_id)
+        assert row["status"] == "sent"
+        assert row["attempts"] == 1
+        assert row["sent_at"] is not None
+        assert row["claimed_at"] is None
+    assert sender.process_batch() == 0
+
+
+def test_rejected_message_is_retried_with_backoff(backend, db, sender, smtp_server, monkeypatch):
+    monkeypatch.setattr(backend, "OUTBOX_RETRY_BASE_SECONDS", 30)
+    message_id = queue(backend, db)
+    smtp_server.reject = 2
+
+    assert sender.process_batch() == 1
+    row = outbox_row(db, message_id)
+    assert row["status"] == "pending"
+    assert row["attempts"] == 1
+    assert "451" in row["last_error"]
+    assert 25 < row["due_in"] <= 30
+    # Not due yet, so the next poll leaves it alone
+    assert sender.process_batch() == 0
+
+    db.execute("UPDATE email_outbox SET next_attempt_at = NOW() WHERE id = %s", (message_id,))
+    assert sender.process_batch() == 1
+    row = outbox_row(db, message_id)
+    assert row["attempts"] == 2
+    # The delay doubles on each failed attempt
+    assert 55 < row["due_in"] <= 60
+
+    db.execute("UPDATE email_outbox SET next_attempt_at = NOW() WHERE id = %s", (message_id,))
+    assert sender.process_batch() == 1
+    row = outbox_row(db, message_id)
+    assert row["status"] == "sent"
+    assert row["attempts"] == 3
+    assert row["last_error"] is None
+    assert len(smtp_server.messages) == 1
+
+
+def test_gives_up_after_max_attempts(backend, db, sender, smtp_server, monkeypatch):
+    monkeypatch.setattr(backend, "OUTBOX_MAX_ATTEMPTS", 2)
+    message_id = queue(backend, db)
+    smtp_server.reject = 5
+
+    sender.process_batch()
+    db.execute("UPDATE email_outbox SET next_attempt_at = NOW() WHERE id = %s", (message_id,))
+    sender.process_batch()
+
+    row = outbox_row(db, message_id)
+    assert row["status"] == "failed"
+    assert row["attempts"] == 2
+    assert sender.process_batch() == 0
+    assert smtp_server.messages == []
+
+
+def test_reclaims_stale_sending_rows(backend, db, sender, smtp_server):
+    stale = queue(backend, db, "Stale")
+    fresh = queue(backend, db, "Fresh")
+    # Claimed by a sender that died mid-batch, and by one that is still working
+    db.execute("""
+        UPDATE email_outbox SET status = 'sending', claimed_at = NOW() - %s * interval '1 second'
+        WHERE id = %s
+    """, (backend.OUTBOX_CLAIM_TIMEOUT_SECONDS + 60, stale))
+    db.execute("UPDATE email_outbox SET status = 'sending', claimed_at = NOW() WHERE id = %s", (fresh,))
+
+    assert sender.process_batch() == 1
+    assert outbox_row(db, stale)["status"] == "sent"
+    assert outbox_row(db, fresh)["status"] == "sending"
+
+
+def test_background_thread_delivers_queued_mail(backend, db, sender, smtp_server, monkeypatch):
+    monkeypatch.setattr(backend, "OUTBOX_POLL_SECONDS", 0.1)
+    message_id = queue(backend, db)
+    sender.notify()
+    for _ in range(50):
+        if outbox_row(db, message_id)["status"] == "sent":
+            break
+        time.sleep(0.1)
+    assert outbox_row(db, message_id)["status"] == "sent"
@@ -0,0 +1,40 @@
+"""GET /products/fit: footprint bounds with and without rotation."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+SHAPES = {"FIT-TEST-A": (15, 55), "FIT-TEST-B": (25, 50), "FIT-TEST-C": (50, 25), "FIT-TEST-D": (5, 70), "FIT-TEST-E": (30, 30)}
+
+
+@pytest.fixture(scope="module")
+def fit_products(backend):
+    conn = backend.get_db_connection()
+    cur = conn.cursor()
+    for sku, (width, depth) in SHAPES.items():
+        cur.execute("""
+            INSERT INTO products (title, sku, width, depth, height, price, out_of_stock)
+            VALUES (%s, %s, %s, %s, 30, 100, FALSE)
+        """, (sku, sku, width, depth))
+    conn.commit()
+    yield TestClient(backend.app)
+    cur.execute("DELETE FROM products WHERE sku LIKE 'FIT-TEST-%'")
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+@pytest.mark.parametrize("params, expected", [
+    # 15x55 has one side in 10-60 and one in 20-30, but not the right pair
+    ({"min_width": 10, "max_width": 60, "min_depth": 20, "max_depth": 30}, {"B", "C", "E"}),
+    ({"min_width": 10, "max_width": 60, "min_depth": 20, "max_depth": 30, "rotate": "false"}, {"C", "E"}),
+    ({"min_width": 10, "max_width": 60}, {"A", "B", "C", "E"}),
+    ({"max_width": 60, "max_depth": 30}, {"A", "B", "C", "E"}),
+    ({"max_width": 60, "max_depth": 30, "rotate": "false"}, {"C", "E"}),
+    ({"min_width": 20, "min_depth": 40}, {"B", "C"}),
+    ({"max_depth": 10}, {"D"}),
+])
+def test_fit_bounds(fit_products, params, expected):
+    response = fit_products.get("/products/fit", params={**params, "limit": 500})
+    assert response.status_code == 200
+    found = {p["sku"][len("FIT-TEST-"):] for p in response.json()["products"] if p["sku"].startswith("FIT-TEST-")}
+    assert found == expected
@@ -0,0 +1,76 @@
+"""POST /products/import?dry_run=true: the preview matches the real import and writes nothing."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+CSV = (
+    "title,sku,price,qty\n"
+    "Dry run chair,DRYRUN-TEST-1,120,4\n"      # price change on an existing product
+    "Dry run table,DRYRUN-TEST-2,300,1\n"      # new product
+    "Dry run table,DRYRUN-TEST-2,300,6\n"      # same new product again, qty change
+    "Dry run lamp,DRYRUN-TEST-3,40,9\n"        # identical to what is stored
+)
+
+
+@pytest.fixture
+def client(backend, db):
+    db.execute("""
+        INSERT INTO products (title, sku, price, qty) VALUES
+            ('Dry run chair', 'DRYRUN-TEST-1', 100, 4), ('Dry run lamp', 'DRYRUN-TEST-3', 40, 9)
+    """)
+    backend.app.dependency_overrides[backend.get_current_user] = lambda: "tester"
+    yield TestClient(backend.app)
+    backend.app.dependency_overrides.clear()
+    db.execute("DELETE FROM products WHERE sku ILIKE 'DRYRUN-TEST-%'")
+    db.execute("DELETE FROM import_files WHERE filename = 'dryrun-test.csv'")
+
+
+def upload(client, **params):
+    response = client.post("/products/import", params=params,
+                           files={"file": ("dryrun-test.csv", CSV.encode(), "text/csv")})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def snapshot(db):
+    db.execute("SELECT id, title, sku, price, qty FROM products WHERE sku ILIKE 'DRYRUN-TEST-%' ORDER BY id")
+    return db.fetchall()
+
+
+def test_preview_replays_rows_against_the_catalog(db, client):
+    before = snapshot(db)
+
+    preview = upload(client, dry_run="true")
+
+    assert snapshot(db) == before
+    assert preview["dry_run"] is True
+    assert preview["summary"] == {"rows": 4, "inserts": 1, "updates": 2, "unchanged": 1, "skipped": 0, "price_changes": 1}
+    [insert] = preview["inserts"]
+    assert (insert["line"], insert["sku"]) == (3, "DRYRUN-TEST-2")
+    chair, table = preview["updates"]
+    assert chair["product_id"] == before[0]["id"]
+    assert chair["changes"] == {"price": {"before": 100, "after": 120}}
+    # The repeated SKU resolves to the row inserted earlier in the same file
+    assert table["product_id"] is None
+    assert table["changes"] == {"qty": {"before": 1, "after": 6}}
+    assert preview["columns"]["price"]["kind"]
+
+
+def test_preview_agrees_with_the_real_import(db, client):
+    summary = upload(client, dry_run="true")["summary"]
+
+    result = upload(client)
+
+    assert result["inserted"] == summary["inserts"]
+    # The second table row updates the product the first one inserted
+    assert result["updated"] == summary["updates"]
+    assert result["unchanged"] == summary["unchanged"]
+    rows = {row["sku"]: row for row in snapshot(db)}
+    assert rows["DRYRUN-TEST-1"]["price"] == 120
+    assert rows["DRYRUN-TEST-2"]["qty"] == 6
+
+
+def test_preview_limit_truncates_lists_not_counts(client):
+    preview = upload(client, dry_run="true", preview_limit=1)
+    assert len(preview["updates"]) == 1
+    assert preview["summary"]["updates"] == 2
@@ -0,0 +1,80 @@
+"""ingest_watch_dir(): imported files go to done/, bad ones to failed/ and are not retried."""
+
+import os
+import time
+
+import pytest
+
+CSV = (
+    "title,sku,category,price,qty,lead time\n"
+    "Watch Folder Desk,WATCH-TEST-1,Desks,650,5,5-7 Business Days\n"
+)
+
+
+@pytest.fixture
+def watch_dir(backend, db, tmp_path, monkeypatch):
+    monkeypatch.setattr(backend, "IMPORT_WATCH_DIR", str(tmp_path))
+    monkeypatch.setattr(backend, "IMPORT_WATCH_INTERVAL", 1)
+    yield tmp_path
+    db.execute("DELETE FROM products WHERE sku LIKE 'WATCH-TEST-%'")
+    db.execute("DELETE FROM import_files WHERE source = 'watch' AND filename LIKE 'watch-test-%'")
+
+
+def drop(directory, name, contents):
+    path = directory / name
+    path.write_text(contents, encoding="utf-8")
+    # Older than the polling interval, so it isn't mistaken for a partial write
+    old = time.time() - 60
+    os.utime(path, (old, old))
+    return path
+
+
+def import_file(db, name):
+    db.execute("SELECT * FROM import_files WHERE filename = %s AND source = 'watch'", (name,))
+    return db.fetchone()
+
+
+def test_imports_and_moves_to_done(backend, db, watch_dir):
+    drop(watch_dir, "watch-test-ok.csv", CSV)
+
+    results = backend.ingest_watch_dir()
+
+    assert results == [{"filename": "watch-test-ok.csv", "inserted": 1, "updated": 0, "unchanged": 0, "skipped": 0}]
+    assert (watch_dir / "done" / "watch-test-ok.csv").exists()
+    assert not (watch_dir / "watch-test-ok.csv").exists()
+    row = import_file(db, "watch-test-ok.csv")
+    assert row["status"] == "imported"
+    assert row["inserted"] == 1
+
+    # A renamed copy of the same content is recognised and filed without importing
+    drop(watch_dir, "watch-test-copy.csv", CSV)
+    assert backend.ingest_watch_dir() == []
+    assert (watch_dir / "done" / "watch-test-copy.csv").exists()
+
+
+@pytest.mark.parametrize("name, contents, error", [
+    ("watch-test-empty.csv", "", "empty"),
+    ("watch-test-headers.csv", "\ufeff", "headers"),
+])
+def test_failed_file_is_recorded_and_not_retried(backend, db, watch_dir, name, contents, error):
+    drop(watch_dir, name, contents)
+
+    results = backend.ingest_watch_dir()
+
+    assert len(results) == 1 and error in results[0]["error"]
+    assert (watch_dir / "failed" / name).exists()
+    row = import_file(db, name)
+    assert row["status"] == "failed"
+    assert error in row["error"]
+
+    assert backend.ingest_watch_dir() == []
+    # Dropping the same bad file again sends it straight to failed/
+    drop(watch_dir, name, contents)
+    assert backend.ingest_watch_dir() == []
+    assert len(os.listdir(watch_dir / "failed")) == 2
+
+
+def test_fresh_files_wait_for_the_next_pass(backend, watch_dir):
+    (watch_dir / "watch-test-partial.csv").write_text(CSV)
+    assert backend.ingest_watch_dir() == []
+    assert (watch_dir / "watch-test-partial.csv").exists()
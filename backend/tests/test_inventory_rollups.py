@@ -0,0 +1,59 @@
+"""run_inventory_rollup() and the /analytics/inventory time series."""
+
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+
+VENDOR = "Rollup Test Vendor"
+DAY = date(2001, 1, 1)
+
+
+@pytest.fixture
+def client(backend, db):
+    db.execute("""
+        INSERT INTO products (title, sku, vendor, price, qty, out_of_stock) VALUES
+            ('Rollup test 1', 'ROLLUP-TEST-1', %(v)s, 100, 3, FALSE),
+            ('Rollup test 2', 'ROLLUP-TEST-2', %(v)s, 50, 4, FALSE),
+            ('Rollup test 3', 'ROLLUP-TEST-3', %(v)s, 999, 7, TRUE)
+    """, {"v": VENDOR})
+    backend.app.dependency_overrides[backend.get_current_user] = lambda: "tester"
+    yield TestClient(backend.app)
+    backend.app.dependency_overrides.clear()
+    db.execute("DELETE FROM inventory_daily_rollups WHERE day = %s", (DAY,))
+    db.execute("DELETE FROM products WHERE sku LIKE 'ROLLUP-TEST-%'")
+
+
+def test_rollup_counts_only_in_stock_inventory(backend, db, client):
+    assert backend.run_inventory_rollup(DAY) > 0
+    assert backend.inventory_rollup_done(DAY)
+    # Re-running a day replaces it rather than adding rows
+    written = backend.run_inventory_rollup(DAY)
+    db.execute("SELECT COUNT(*) AS n FROM inventory_daily_rollups WHERE day = %s", (DAY,))
+    assert db.fetchone()["n"] == written
+
+    response = client.get("/analytics/inventory", params={
+        "dimension": "vendor", "key": VENDOR, "start": DAY.isoformat(), "end": DAY.isoformat()})
+
+    assert response.status_code == 200
+    [series] = response.json()["series"]
+    assert series["key"] == VENDOR
+    [point] = series["points"]
+    assert point["day"] == DAY.isoformat()
+    assert (point["product_count"], point["in_stock_count"]) == (3, 2)
+    assert point["qty_sum"] == 7
+    assert point["inventory_value"] == 500
+
+
+def test_only_the_default_view_is_cached(backend, client):
+    backend.settings_cache.invalidate("rollups")
+    client.get("/analytics/inventory", params={"dimension": "vendor", "key": VENDOR})
+    client.get("/analytics/inventory", params={"dimension": "vendor", "start": DAY.isoformat()})
+    assert not [k for k in backend.settings_cache.entries if k.startswith("rollups:")]
+
+    client.get("/analytics/inventory", params={"dimension": "vendor"})
+    assert [k.rsplit(":", 1)[0] for k in backend.settings_cache.entries if k.startswith("rollups:")] == ["rollups:vendor"]
+
+
+def test_unknown_dimension_is_rejected(client):
+    assert client.get("/analytics/inventory", params={"dimension": "colour"}).status_code == 400
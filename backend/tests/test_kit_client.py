@@ -0,0 +1,115 @@
+"""KitClient against scripts/mock_kit_server.py: pacing, 429 handling and retries."""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "scripts"))
+
+from mock_kit_server import MockKit, make_handler  # noqa: E402
+
+
+@pytest.fixture
+def kit_server(backend, monkeypatch):
+    servers = []
+
+    def start(**options):
+        kit = MockKit(options.pop("per_minute", 0), 0.0, **options)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(kit))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        monkeypatch.setattr(backend, "KIT_API_URL", f"http://127.0.0.1:{server.server_address[1]}/v4/broadcasts")
+        return kit
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def send(backend, count: int):
+    """Create count broadcasts concurrently; returns the exception (or None) for each."""
+    async def run():
+        async with httpx.AsyncClient(headers={"X-Kit-Api-Key": "test"}, timeout=10) as client:
+            kit = backend.KitClient(client)
+            return await asyncio.gather(
+                *(kit.create_broadcast(f"Deal {n}", "<p>deal</p>") for n in range(count)),
+                return_exceptions=True
+            )
+    return asyncio.run(run())
+
+
+def test_requests_are_paced(backend, kit_server, monkeypatch):
+    monkeypatch.setattr(backend, "KIT_REQUESTS_PER_MINUTE", 600)  # one per 0.1s
+    kit = kit_server()
+
+    assert send(backend, 6) == [None] * 6
+
+    times = [at for at, _ in kit.requests]
+    assert len(kit.broadcasts) == 6
+    assert times[-1] - times[0] >= 0.45
+    assert min(b - a for a, b in zip(times, times[1:])) >= 0.07
+
+
+@pytest.mark.parametrize("http_date", [False, True])
+def test_429_pauses_every_worker_until_retry_after(backend, kit_server, monkeypatch, http_date):
+    monkeypatch.setattr(backend, "KIT_REQUESTS_PER_MINUTE", 6000)
+    # Two requests per 0.5s window; the third gets a 429 with Retry-After
+    kit = kit_server(per_minute=2, window=0.5, http_date=http_date)
+
+    assert send(backend, 4) == [None] * 4
+
+    statuses = [status for _, status in kit.requests]
+    assert statuses.count(201) == 4
+    # Only requests already in flight can hit the limit too
+    assert 1 <= statuses.count(429) <= backend.KIT_CONCURRENCY
+    first_429 = next(at for at, status in kit.requests if status == 429)
+    # Retry-After is at least a second (rounded up, or the next whole
+    # HTTP-date second); nothing new is sent before then
+    assert not [at for at, _ in kit.requests if first_429 + 0.1 < at < first_429 + 0.9]
+    assert kit.requests[-1][0] - first_429 >= 0.9
+
+
+def test_server_errors_are_retried(backend, kit_server, monkeypatch):
+    monkeypatch.setattr(backend, "KIT_REQUESTS_PER_MINUTE", 6000)
+    monkeypatch.setattr(backend.random, "random", lambda: 0.0)  # shortest backoff: 0.5s, 1s, ...
+    kit = kit_server(fail_first=2)
+
+    assert send(backend, 1) == [None]
+    assert [status for _, status in kit.requests] == [503, 503, 201]
+
+
+def test_gives_up_after_max_retries(backend, kit_server, monkeypatch):
+    monkeypatch.setattr(backend, "KIT_REQUESTS_PER_MINUTE", 6000)
+    monkeypatch.setattr(backend, "KIT_MAX_RETRIES", 1)
+    monkeypatch.setattr(backend.random, "random", lambda: 0.0)
+    kit = kit_server(fail_first=5)
+
+    [error] = send(backend, 1)
+    assert isinstance(error, RuntimeError) and "503" in str(error)
+    assert len(kit.requests) == 2
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, 4.0),
+    ("", 4.0),
+    ("7", 7.0),
+    ("1.5", 1.5),
+    ("-3", 0.0),
+    ("not a date", 4.0),
+    (formatdate(0, usegmt=True), 0.0),
+])
+def test_retry_after_seconds(backend, value, expected):
+    assert backend.retry_after_seconds(value, 4.0) == expected
+
+
+def test_retry_after_http_date(backend):
+    value = formatdate(time.time() + 30, usegmt=True)
+    assert 28 <= backend.retry_after_seconds(value, 4.0) <= 30
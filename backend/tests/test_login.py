@@ -0,0 +1,83 @@
+"""/login throttling, client IP resolution behind trusted proxies and off-loop bcrypt."""
+
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+USER = "login-test-user"
+PASSWORD = "not-a-real-password"
+
+
+def test_token_bucket(backend):
+    limiter = backend.TokenBucketLimiter(capacity=2, per_minute=60)
+    assert limiter.consume("a") == 0
+    assert limiter.consume("a") == 0
+    # Empty: the next token arrives within a second at 60/minute
+    assert 0 < limiter.consume("a") <= 1
+    assert limiter.consume("b") == 0
+
+
+def test_trusted_proxies(backend):
+    proxies = backend.TrustedProxies(["10.1.0.0/16", "192.168.0.7", "localhost"])
+    assert "10.1.200.3" in proxies
+    assert "192.168.0.7" in proxies
+    assert "127.0.0.1" in proxies  # resolved from the host name
+    assert "10.2.0.1" not in proxies
+    assert "not-an-ip" not in proxies
+    assert "10.1.0.1" not in backend.TrustedProxies([])
+
+
+@pytest.fixture
+def client(backend, db, monkeypatch):
+    db.execute("INSERT INTO users (username, password, role) VALUES (%s, %s, 'viewer')",
+               (USER, backend.hash_password(PASSWORD)))
+    monkeypatch.setattr(backend, "login_ip_limiter", backend.TokenBucketLimiter(capacity=3, per_minute=1))
+    monkeypatch.setattr(backend, "login_user_limiter", backend.TokenBucketLimiter(capacity=2, per_minute=1))
+    yield TestClient(backend.app)
+    db.execute("DELETE FROM users WHERE username = %s", (USER,))
+    backend.invalidate_user_state(USER)
+
+
+def login(client, password=PASSWORD, username=USER, **headers):
+    return client.post("/login", data={"username": username, "password": password}, headers=headers)
+
+
+def test_password_is_checked_on_the_bcrypt_pool(backend, client, monkeypatch):
+    threads = []
+    verify = backend.verify_password
+
+    def recording_verify(plain, hashed):
+        threads.append(threading.current_thread().name)
+        return verify(plain, hashed)
+
+    monkeypatch.setattr(backend, "verify_password", recording_verify)
+    response = login(client)
+
+    assert response.status_code == 200
+    assert response.json()["username"] == USER
+    assert threads and threads[0].startswith("bcrypt")
+    assert login(client, "wrong").status_code == 401
+
+
+def test_per_user_limit_answers_429_without_checking_the_password(backend, client, monkeypatch):
+    assert login(client, "wrong").status_code == 401
+    assert login(client, "wrong").status_code == 401
+    monkeypatch.setattr(backend, "verify_password", lambda *args: pytest.fail("bcrypt ran while throttled"))
+
+    response = login(client)
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_forwarded_ip_is_only_believed_from_a_trusted_proxy(backend, client, monkeypatch):
+    monkeypatch.setattr(backend, "login_user_limiter", backend.TokenBucketLimiter(capacity=100, per_minute=1))
+    # Untrusted peer: rotating X-Real-IP doesn't buy fresh buckets
+    for n in range(3):
+        assert login(client, "wrong", **{"X-Real-IP": f"203.0.113.{n}"}).status_code == 401
+    assert login(client, "wrong", **{"X-Real-IP": "203.0.113.99"}).status_code == 429
+
+    # Behind a trusted proxy (TestClient's peer is "testclient") each client has its own bucket
+    monkeypatch.setattr(backend, "trusted_proxies", backend.TrustedProxies(["testclient"]))
+    assert login(client, "wrong", **{"X-Real-IP": "203.0.113.99"}).status_code == 401
@@ -0,0 +1,67 @@
+"""product_history trigger: one compact row per changed product per UPDATE statement."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def products(db):
+    db.execute("""
+        INSERT INTO products (title, sku, price, qty, out_of_stock) VALUES
+            ('History test 1', 'HISTORY-TEST-1', 100, 5, FALSE),
+            ('History test 2', 'HISTORY-TEST-2', 50, 0, TRUE)
+        RETURNING id
+    """)
+    yield [row["id"] for row in db.fetchall()]
+    db.execute("DELETE FROM products WHERE sku LIKE 'HISTORY-TEST-%'")
+
+
+def history(db, product_id):
+    db.execute("""
+        SELECT price_old, price_new, qty_old, qty_new, out_of_stock_old, out_of_stock_new
+        FROM product_history WHERE product_id = %s ORDER BY id
+    """, (product_id,))
+    return [tuple(row.values()) for row in db.fetchall()]
+
+
+def test_only_changed_fields_are_recorded(db, products):
+    first, second = products
+    db.execute("UPDATE products SET price = 90, title = 'History test 1 renamed' WHERE id = %s", (first,))
+    # Setting a field to the value it already has is not a change
+    db.execute("UPDATE products SET qty = 3, out_of_stock = FALSE WHERE id = %s", (first,))
+    db.execute("UPDATE products SET title = 'History test 1 again', price = 90 WHERE id = %s", (first,))
+
+    assert history(db, first) == [
+        (100, 90, None, None, None, None),
+        (None, None, 5, 3, None, None),
+    ]
+    assert history(db, second) == []
+
+
+def test_one_statement_records_each_product_once(db, products):
+    db.execute("UPDATE products SET qty = qty + 10, out_of_stock = FALSE WHERE id = ANY(%s)", (products,))
+
+    assert history(db, products[0]) == [(None, None, 5, 15, None, None)]
+    assert history(db, products[1]) == [(None, None, 0, 10, True, False)]
+
+
+def test_history_endpoint(backend, db, products):
+    first = products[0]
+    db.execute("UPDATE products SET price = 80 WHERE id = %s", (first,))
+    db.execute("UPDATE products SET price = 70 WHERE id = %s", (first,))
+    backend.app.dependency_overrides[backend.get_current_user] = lambda: "tester"
+    try:
+        client = TestClient(backend.app)
+        body = client.get(f"/products/{first}/history").json()
+        assert body["current"]["price"] == 70
+        assert [(entry["price_old"], entry["price_new"]) for entry in body["history"]] == [(80, 70), (100, 80)]
+        assert len(client.get(f"/products/{first}/history", params={"limit": 1}).json()["history"]) == 1
+        assert client.get("/products/2000000000/history").status_code == 404
+    finally:
+        backend.app.dependency_overrides.clear()
+
+
+def test_history_goes_with_the_product(db, products):
+    db.execute("UPDATE products SET price = 1 WHERE id = %s", (products[0],))
+    db.execute("DELETE FROM products WHERE id = %s", (products[0],))
+    assert history(db, products[0]) == []
@@ -0,0 +1,79 @@
+"""The lead_time_days() and expiry_date() SQL functions behind the ships-within
+and expires-before filters."""
+
+from datetime import date
+
+import pytest
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("5-7 Business Days", [5, 7]),
+    ("5 to 7 days", [5, 7]),
+    ("3 days", [3, 3]),
+    ("2-3 Weeks", [10, 15]),
+    ("1 week", [5, 5]),
+    ("3wks", [15, 15]),
+    ("2 months", [42, 42]),
+    ("10 business days (2 weeks)", [10, 10]),
+    ("14 calendar days", [10, 10]),
+    ("2 calendar weeks", [10, 10]),
+    ("Ships in 24 hours", [1, 1]),
+    ("48 hrs", [2, 2]),
+    ("12 hours", [1, 1]),
+    ("24-72 hours", [1, 3]),
+    ("In Stock", [0, 0]),
+    ("instock", [0, 0]),
+    ("Ready to ship", [0, 0]),
+    ("Same day", [0, 0]),
+    ("7-5 days", [5, 7]),
+    ("TBD", None),
+    ("", None),
+    (None, None),
+])
+def test_lead_time_days(db, text, expected):
+    db.execute("SELECT lead_time_days(%s) AS days", (text,))
+    assert db.fetchone()["days"] == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("3/31/2026", date(2026, 3, 31)),
+    ("03-31-26", date(2026, 3, 31)),
+    ("2026-03-31", date(2026, 3, 31)),
+    ("6/26", date(2026, 6, 30)),
+    ("06/2026", date(2026, 6, 30)),
+    ("2/2028", date(2028, 2, 29)),
+    ("Jun 2026", date(2026, 6, 30)),
+    ("june 26", date(2026, 6, 30)),
+    ("26-Jun", date(2026, 6, 30)),
+    ("2027", date(2027, 12, 31)),
+    ("12/2026+", date(2026, 12, 31)),
+    ("13/2026", None),
+    ("2/30/2026", None),
+    ("Jux 2026", None),
+    ("no expiry", None),
+    ("", None),
+    (None, None),
+])
+def test_expiry_date(db, text, expected):
+    db.execute("SELECT expiry_date(%s) AS expires_on", (text,))
+    assert db.fetchone()["expires_on"] == expected
+
+
+def test_parsed_columns_follow_writes(db):
+    db.execute("""
+        INSERT INTO products (title, lead_time, exp_date) VALUES ('Parser test', '48 hrs', '6/26')
+        RETURNING id, lead_time_min_days, lead_time_max_days, expires_on
+    """)
+    row = db.fetchone()
+    try:
+        assert (row["lead_time_min_days"], row["lead_time_max_days"]) == (2, 2)
+        assert row["expires_on"] == date(2026, 6, 30)
+        db.execute("""
+            UPDATE products SET lead_time = '2-3 weeks', exp_date = NULL WHERE id = %s
+            RETURNING lead_time_min_days, lead_time_max_days, expires_on
+        """, (row["id"],))
+        updated = db.fetchone()
+        assert (updated["lead_time_min_days"], updated["lead_time_max_days"]) == (10, 15)
+        assert updated["expires_on"] is None
+    finally:
+        db.execute("DELETE FROM products WHERE id = %s", (row["id"],))
@@ -0,0 +1,55 @@
+"""POST /products: normalized-SKU conflicts, rejected or upserted in one statement."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def client(backend, db):
+    if not backend.SKU_UNIQUE_INDEX_READY:
+        pytest.skip("unique SKU index not built on this database")
+    backend.app.dependency_overrides[backend.get_current_user] = lambda: "tester"
+    yield TestClient(backend.app)
+    backend.app.dependency_overrides.clear()
+    db.execute("DELETE FROM products WHERE sku ILIKE 'UPSERT-TEST-%'")
+
+
+def stored(db, product_id):
+    db.execute("SELECT * FROM products WHERE id = %s", (product_id,))
+    return db.fetchone()
+
+
+def test_conflict_is_rejected_with_existing_id(client):
+    created = client.post("/products", json={"title": "Upsert test", "sku": "UPSERT-TEST-1"}).json()
+    assert created["action"] == "inserted"
+
+    response = client.post("/products", json={"title": "Other", "sku": " upsert-test-1 "})
+
+    assert response.status_code == 409
+    assert response.json()["detail"]["product_id"] == created["product_id"]
+
+
+def test_update_overwrites_only_the_fields_sent(db, client):
+    product_id = client.post("/products", json={
+        "title": "Upsert test", "sku": "UPSERT-TEST-2", "price": 100, "qty": 5,
+        "lead_time": "3 days", "fob": "Dallas, TX"}).json()["product_id"]
+
+    response = client.post("/products", params={"on_conflict": "update"}, json={
+        "title": "Upsert test renamed", "sku": "upsert-test-2", "price": 80, "lead_time": None, "fob": ""})
+
+    assert response.json() == {"message": "Existing product updated", "product_id": product_id, "action": "updated"}
+    row = stored(db, product_id)
+    assert (row["title"], row["price"], row["qty"]) == ("Upsert test renamed", 80, 5)
+    # Blank lead time / FOB keep the stored values rather than the company defaults
+    assert (row["lead_time"], row["fob"]) == ("3 days", "Dallas, TX")
+
+    client.post("/products", params={"on_conflict": "update"}, json={
+        "title": "Upsert test renamed", "sku": "UPSERT-TEST-2", "lead_time": "2 weeks"})
+    assert stored(db, product_id)["lead_time"] == "2 weeks"
+
+
+def test_new_product_gets_company_defaults(backend, db, client):
+    defaults = backend.get_cached_company_settings()[0]
+    product_id = client.post("/products", params={"on_conflict": "update"}, json={
+        "title": "Upsert test", "sku": "UPSERT-TEST-3", "lead_time": None}).json()["product_id"]
+    assert stored(db, product_id)["lead_time"] == (defaults.get("default_lead_time") or None)
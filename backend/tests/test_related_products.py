@@ -0,0 +1,118 @@
+"""nearest_neighbors() against a brute-force top-k."""
+
+import numpy as np
+import pytest
+
+
+def brute_force(matrix, mask, k):
+    similarity = (matrix @ matrix.T).astype(np.float32)
+    similarity[:, ~mask] = -np.inf
+    np.fill_diagonal(similarity, -np.inf)
+    return -np.sort(-similarity, axis=1)[:, :k], similarity
+
+
+def check(backend, matrix, mask, k):
+    indices, scores = backend.nearest_neighbors(matrix, mask, k)
+    expected, similarity = brute_force(matrix, mask, k)
+    assert indices.shape == scores.shape == (len(matrix), k)
+    for row in range(len(matrix)):
+        filled = indices[row] >= 0
+        # Best first, and the same scores as an exhaustive search; with ties
+        # any of the equally good neighbours may be picked
+        np.testing.assert_allclose(scores[row][filled], expected[row][:filled.sum()], atol=1e-5)
+        assert np.isneginf(expected[row][filled.sum():]).all()
+        picked = indices[row][filled]
+        assert len(set(picked)) == len(picked)
+        assert row not in picked
+        assert mask[picked].all()
+        np.testing.assert_allclose(similarity[row, picked], scores[row][filled], atol=1e-5)
+        assert np.isneginf(scores[row][~filled]).all()
+    return indices, scores
+
+
+@pytest.fixture
+def small_groups(backend, monkeypatch):
+    # Exercise group pruning and several batches on a small matrix
+    monkeypatch.setattr(backend, "RELATED_GROUP", 4)
+    monkeypatch.setattr(backend, "RELATED_BATCH_CELLS", 64)
+
+
+def unit_rows(rng, rows, dims):
+    matrix = rng.standard_normal((rows, dims)).astype(np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("rows, k, in_stock", [(50, 5, 0.7), (37, 3, 1.0), (64, 12, 0.5), (9, 4, 0.9)])
+def test_matches_brute_force(backend, small_groups, rows, k, in_stock):
+    rng = np.random.default_rng(rows)
+    matrix = unit_rows(rng, rows, 8)
+    mask = rng.random(rows) < in_stock
+    check(backend, matrix, mask, k)
+
+
+def test_fewer_candidates_than_k(backend, small_groups):
+    rng = np.random.default_rng(1)
+    matrix = unit_rows(rng, 20, 6)
+    mask = np.zeros(20, dtype=bool)
+    mask[[2, 7, 11]] = True
+    indices, _ = check(backend, matrix, mask, 6)
+    # Candidates can't suggest themselves, so they get one fewer neighbour
+    assert ((indices >= 0).sum(axis=1) == np.where(mask, 2, 3)).all()
+
+
+def test_ties(backend, small_groups):
+    rng = np.random.default_rng(2)
+    base = unit_rows(rng, 5, 4)
+    # Every row appears four times, so each has three exact duplicates
+    matrix = np.repeat(base, 4, axis=0)
+    mask = np.ones(len(matrix), dtype=bool)
+    indices, scores = check(backend, matrix, mask, 3)
+    for row in range(len(matrix)):
+        assert set(indices[row]) == {row // 4 * 4 + i for i in range(4)} - {row}
+        np.testing.assert_allclose(scores[row], 1.0, atol=1e-5)
+
+
+def test_no_candidates(backend):
+    matrix = unit_rows(np.random.default_rng(3), 5, 4)
+    indices, scores = backend.nearest_neighbors(matrix, np.zeros(5, dtype=bool), 3)
+    assert (indices == -1).all() and np.isneginf(scores).all()
+
+
+def test_endpoint_caches_one_entry_per_product(backend, db):
+    from fastapi.testclient import TestClient
+
+    db.execute("""
+        INSERT INTO products (title, sku) VALUES ('Related A', 'RELATED-TEST-A'), ('Related B', 'RELATED-TEST-B'),
+            ('Related C', 'RELATED-TEST-C')
+        RETURNING id
+    """)
+    a, b, c = [row["id"] for row in db.fetchall()]
+    db.execute("INSERT INTO related_products (product_id, rank, related_id, score) VALUES (%s, 1, %s, 0.9), (%s, 2, %s, 0.5)",
+               (a, b, a, c))
+    client = TestClient(backend.app)
+    try:
+        one = client.get(f"/products/{a}/related", params={"limit": 1})
+        two = client.get(f"/products/{a}/related", params={"limit": 2})
+        assert [p["id"] for p in one.json()["products"]] == [b]
+        assert [p["id"] for p in two.json()["products"]] == [b, c]
+        assert one.headers["ETag"] != two.headers["ETag"]
+        assert [k for k in backend.settings_cache.entries if k.startswith(f"catalog:related:{a}")] == [f"catalog:related:{a}"]
+        again = client.get(f"/products/{a}/related", params={"limit": 2}, headers={"If-None-Match": two.headers["ETag"]})
+        assert again.status_code == 304
+    finally:
+        backend.settings_cache.invalidate("catalog:related")
+        db.execute("DELETE FROM related_products WHERE product_id = %s", (a,))
+        db.execute("DELETE FROM products WHERE sku LIKE 'RELATED-TEST-%'")
+
+
+def test_run_is_recorded_by_new_york_date(backend, db):
+    from datetime import date
+
+    day = date(2099, 1, 1)
+    assert not backend.related_products_done(day)
+    try:
+        backend.run_related_products(day)
+        assert backend.related_products_done(day)
+        assert not backend.related_products_done(date(2099, 1, 2))
+    finally:
+        db.execute("DELETE FROM related_products_runs WHERE day >= %s", (day,))
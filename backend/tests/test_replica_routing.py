@@ -0,0 +1,141 @@
+"""ReplicaRouter: lag checks, read-your-writes stickiness and falling back to the primary."""
+
+import os
+import threading
+
+from fastapi.testclient import TestClient
+from psycopg2.extensions import make_dsn
+
+UNREACHABLE = "host=/nonexistent-replica-socket dbname=npp_furniture"
+
+
+def local_dsn():
+    # The test database stands in for a replica; it isn't in recovery, so it counts as caught up
+    return make_dsn(
+        dbname=os.getenv("DB_NAME", "npp_furniture"), user=os.getenv("DB_USER", "postgres"),
+        password=os.getenv("DB_PASSWORD"), host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT", "5432")
+    )
+
+
+def router(backend, dsns, max_lag=5):
+    replicas = backend.ReplicaRouter(dsns, max_lag=max_lag, check_interval=60, sticky_seconds=60)
+    # Any live thread will do, so start() doesn't launch the monitor
+    replicas.thread = threading.current_thread()
+    return replicas
+
+
+def is_replica(replicas, conn):
+    return any(conn.pool is replica["pool"] for replica in replicas.replicas)
+
+
+def test_reads_go_to_a_checked_replica(backend):
+    replicas = router(backend, [local_dsn()])
+    conn = replicas.connect(["ip:1.2.3.4"])
+    assert not is_replica(replicas, conn)  # never checked yet
+    conn.close()
+
+    replicas.check()
+    conn = replicas.connect(["ip:1.2.3.4"])
+    assert is_replica(replicas, conn)
+    conn.close()
+    assert replicas.stats == {"replica": 1, "sticky": 0, "fallback": 1}
+    assert replicas.snapshot()["replicas"][0]["healthy"] is True
+
+
+def test_lag_is_measured_from_the_replay_position(backend, monkeypatch):
+    replicas = router(backend, [local_dsn()], max_lag=5)
+    monkeypatch.setattr(replicas, "primary_lsn", lambda: backend.lsn_to_int("1/00000100"))
+
+    monkeypatch.setattr(replicas, "replica_position", lambda conn: {
+        "in_recovery": True, "replay_lsn": "1/00000100", "replay_age": 600})
+    replicas.check()
+    # Replayed everything the primary has: an idle primary doesn't make it stale
+    assert (replicas.replicas[0]["lag"], replicas.replicas[0]["caught_up"]) == (0.0, True)
+
+    monkeypatch.setattr(replicas, "replica_position", lambda conn: {
+        "in_recovery": True, "replay_lsn": "1/000000FF", "replay_age": 600})
+    replicas.check()
+    assert (replicas.replicas[0]["lag"], replicas.replicas[0]["caught_up"]) == (600.0, False)
+    assert replicas.candidates() == []
+
+
+def test_writers_read_from_the_primary_for_a_while(backend):
+    replicas = router(backend, [local_dsn()])
+    replicas.check()
+    replicas.mark_write(["user:alice"])
+
+    conn = replicas.connect(["ip:1.2.3.4", "user:alice"])
+    assert not is_replica(replicas, conn)
+    conn.close()
+    conn = replicas.connect(["ip:5.6.7.8", "user:bob"])
+    assert is_replica(replicas, conn)
+    conn.close()
+    assert (replicas.stats["sticky"], replicas.stats["replica"]) == (1, 1)
+
+
+def test_consistent_reads_wait_for_a_check_after_the_last_change(backend):
+    replicas = router(backend, [local_dsn()])
+    replicas.check()
+    assert len(replicas.candidates(consistent=True)) == 1
+
+    replicas.mark_changed()
+    assert replicas.candidates(consistent=True) == []
+    assert len(replicas.candidates()) == 1  # plain reads accept the lag
+
+    replicas.check()
+    assert len(replicas.candidates(consistent=True)) == 1
+
+
+def test_unreachable_replicas_are_skipped(backend):
+    replicas = router(backend, [UNREACHABLE, local_dsn()])
+    replicas.check()
+    down, up = replicas.replicas
+    assert down["lag"] is None and down["error"]
+    assert replicas.candidates() == [up]
+
+    # A replica that fails between checks is marked down and the next one is tried
+    down.update(lag=0.0, caught_up=True, error=None)
+    for _ in range(2):
+        conn = replicas.connect([])
+        assert conn.pool is up["pool"]
+        conn.close()
+    assert down["lag"] is None
+    assert replicas.stats["replica"] == 2
+
+
+def test_no_healthy_replica_falls_back_to_the_primary(backend):
+    replicas = router(backend, [UNREACHABLE])
+    replicas.check()
+    conn = replicas.connect([])
+    conn.close()
+    assert replicas.stats == {"replica": 0, "sticky": 0, "fallback": 1}
+
+
+def test_snapshot_hides_passwords(backend):
+    snapshot = router(backend, ["host=a password=secret"]).snapshot()
+    assert snapshot["replicas"][0]["dsn"] == "host=a password=***"
+
+
+def test_candidates_take_turns(backend):
+    replicas = router(backend, ["host=a", "host=b", "host=c"])
+    for replica in replicas.replicas:
+        replica["lag"] = 0.0
+    firsts = [replicas.candidates()[0]["dsn"] for _ in range(4)]
+    assert firsts == ["host=a", "host=b", "host=c", "host=a"]
+
+
+def test_successful_writes_make_the_client_sticky(backend, monkeypatch):
+    replicas = router(backend, ["host=a"])
+    monkeypatch.setattr(backend, "replica_router", replicas)
+    client = TestClient(backend.app)
+
+    client.get("/")
+    assert client.post("/products/check-duplicates", json={}).status_code == 401
+    assert replicas.sticky == {}  # reads and rejected writes don't count
+
+    backend.app.dependency_overrides[backend.get_current_user] = lambda: "tester"
+    try:
+        assert client.post("/products/check-duplicates", json={}).status_code == 200
+    finally:
+        backend.app.dependency_overrides.clear()
+    assert replicas.is_sticky(["ip:testclient"])
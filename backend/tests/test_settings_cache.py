@@ -0,0 +1,105 @@
+"""SettingsCache: size bound, eviction, and the user and company settings it serves."""
+
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def cache(backend, monkeypatch):
+    monkeypatch.setattr(backend, "SETTINGS_CACHE_SIZE", 3)
+    cache = backend.SettingsCache()
+    # Any live thread will do, so get() doesn't start a LISTEN connection
+    cache.listener = threading.current_thread()
+    return cache
+
+
+def test_least_recently_used_entry_is_evicted(cache):
+    for key in ("a", "b", "c"):
+        cache.put(key, key)
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a", lambda: pytest.fail("should be cached")) == ("a", cache.etag("a"))
+
+    cache.put("d", "d")
+
+    assert list(cache.entries) == ["c", "a", "d"]
+
+
+def test_expired_entries_go_before_live_ones(cache):
+    for key in ("x", "y", "stale"):
+        cache.put(key, key)
+    # Most recently used, but past its TTL
+    _, value, etag = cache.entries["stale"]
+    cache.entries["stale"] = (0, value, etag)
+
+    cache.put("z", "z")
+
+    assert list(cache.entries) == ["x", "y", "z"]
+
+
+def test_walking_many_keys_stays_bounded(cache):
+    for n in range(100):
+        cache.get(f"catalog:related:{n}", lambda: [])
+    assert len(cache.entries) == 3
+
+
+USER = "settings-cache-test"
+
+
+@pytest.fixture
+def client(backend, db):
+    db.execute("SELECT key, value FROM company_settings")
+    company = db.fetchall()
+    backend.app.dependency_overrides[backend.get_current_user] = lambda: USER
+    backend.app.dependency_overrides[backend.get_current_user_with_role] = lambda: {"username": USER, "role": "admin"}
+    yield TestClient(backend.app)
+    backend.app.dependency_overrides.clear()
+    db.execute("DELETE FROM user_settings WHERE username = %s", (USER,))
+    db.execute("DELETE FROM company_settings")
+    for row in company:
+        db.execute("INSERT INTO company_settings (key, value) VALUES (%s, %s::jsonb)", (row["key"], backend.Json(row["value"])))
+    backend.settings_cache.invalidate()
+
+
+def wait_until(condition):
+    for _ in range(50):
+        if condition():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def test_user_settings_are_served_from_cache_with_etags(backend, client, monkeypatch):
+    first = client.get("/user/settings")
+    assert first.json() == backend.DEFAULT_USER_SETTINGS
+
+    client.patch("/user/settings", json={"theme": "dark", "textScale": 1.25})
+    # Written through: the next read doesn't touch the database
+    monkeypatch.setattr(backend, "get_db_connection", lambda: pytest.fail("settings read from the database"))
+    second = client.get("/user/settings")
+    assert second.json()["theme"] == "dark"
+    assert second.headers["ETag"] != first.headers["ETag"]
+    assert client.get("/user/settings", headers={"If-None-Match": second.headers["ETag"]}).status_code == 304
+
+
+def test_change_from_another_worker_is_picked_up(backend, db, client):
+    client.get("/user/settings")
+    assert backend.settings_cache.peek(backend.user_settings_key(USER)) is not None
+
+    db.execute("INSERT INTO user_settings (username, settings) VALUES (%s, '{\"theme\": \"blue\"}')", (USER,))
+    db.execute("SELECT pg_notify(%s, %s)", (backend.SETTINGS_CHANNEL, f"other-worker|{backend.user_settings_key(USER)}"))
+
+    assert wait_until(lambda: backend.settings_cache.peek(backend.user_settings_key(USER)) is None)
+    assert client.get("/user/settings").json() == {"theme": "blue"}
+
+
+def test_company_settings_update_reaches_defaults_immediately(backend, client):
+    client.get("/admin/company-settings")
+
+    response = client.patch("/admin/company-settings", json={"default_fob": "Settings Test, TX"})
+
+    assert response.status_code == 200
+    assert backend.company_default("default_fob") == "Settings Test, TX"
+    assert client.get("/admin/company-settings").json()["default_fob"] == "Settings Test, TX"
@@ -0,0 +1,55 @@
+"""/analytics/vendors aggregates, date filtering and caching."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+VENDOR = "Vendor Analytics Test"
+
+
+@pytest.fixture
+def client(backend, db):
+    db.execute("""
+        INSERT INTO products (title, sku, vendor, moq, lead_time, out_of_stock, offer_date) VALUES
+            ('Vendor test 1', 'VENDOR-TEST-1', %(v)s, 10, '2-3 weeks', FALSE, '2026-01-05'),
+            ('Vendor test 2', 'VENDOR-TEST-2', %(v)s, 20, '2-3 weeks', FALSE, '2026-02-05'),
+            ('Vendor test 3', 'VENDOR-TEST-3', %(v)s, 0, '5 days', TRUE, '2026-03-05')
+    """, {"v": VENDOR})
+    backend.settings_cache.invalidate("catalog:vendors")
+    backend.app.dependency_overrides[backend.get_current_user] = lambda: "tester"
+    yield TestClient(backend.app)
+    backend.app.dependency_overrides.clear()
+    backend.settings_cache.invalidate("catalog:vendors")
+    db.execute("DELETE FROM products WHERE sku LIKE 'VENDOR-TEST-%'")
+
+
+def vendor(response):
+    assert response.status_code == 200
+    return next(v for v in response.json() if v["name"] == VENDOR)
+
+
+def test_aggregates(client):
+    row = vendor(client.get("/analytics/vendors"))
+    assert row["total_products"] == 3
+    assert row["active_products"] == 2
+    assert row["out_of_stock"] == 1
+    assert row["active_rate"] == 67
+    # MOQ 0 means "not set" and is left out of the average
+    assert row["avg_moq"] == 15
+    assert row["common_lead_time"] == "2-3 weeks"
+
+
+def test_date_range_is_inclusive_and_not_cached(backend, client):
+    row = vendor(client.get("/analytics/vendors", params={"start": "2026-02-05", "end": "2026-03-05"}))
+    assert row["total_products"] == 2
+    assert row["out_of_stock"] == 1
+    client.get("/analytics/vendors", params={"start": "2026-01-01"})
+    client.get("/analytics/vendors")
+    # Only the unfiltered result is kept (the catalog NOTIFY from the setup
+    # insert may since have dropped that too)
+    assert {k for k in backend.settings_cache.entries if k.startswith("catalog:vendors")} <= {"catalog:vendors"}
+
+
+def test_etag_revalidation(client):
+    first = client.get("/analytics/vendors")
+    again = client.get("/analytics/vendors", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
@@ -27,6 +27,33 @@ async function login(username, password) {
   }
 }
 
+// Trade the stored refresh token for a new access token; returns null if it is
+// missing or no longer accepted so callers can fall back to the login page.
+async function refreshAccessToken() {
+  const refreshToken = localStorage.getItem("refresh_token");
+  if (!refreshToken) {
+    return null;
+  }
+  try {
+    const response = await fetch(`${API_BASE_URL}/token/refresh`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ refresh_token: refreshToken }),
+    });
+    if (!response.ok) {
+      localStorage.removeItem("refresh_token");
+      return null;
+    }
+    const data = await response.json();
+    localStorage.setItem("token", data.access_token);
+    localStorage.setItem("refresh_token", data.refresh_token);
+    return data.access_token;
+  } catch (error) {
+    console.error("Token refresh failed:", error);
+    return null;
+  }
+}
+
 function requireToken() {
   const token = localStorage.getItem("token");
   if (!token) {
@@ -86,10 +113,62 @@ async function fetchProductFilters() {
   }
 }
 
-async function createProduct(data) {
+async function fetchCategories() {
+  try {
+    const response = await fetch(`${API_BASE_URL}/categories`, {
+      headers: { "Content-Type": "application/json" },
+    });
+    if (!response.ok) {
+      const errorText = await response.text();
+      throw new Error(`HTTP ${response.status}: ${errorText}`);
+    }
+    return await response.json();
+  } catch (error) {
+    console.error("Fetch categories error:", error);
+    throw error;
+  }
+}
+
+async function fetchRelatedProducts(productId, limit = 6) {
+  try {
+    const response = await fetch(`${API_BASE_URL}/products/${productId}/related?limit=${limit}`, {
+      headers: { "Content-Type": "application/json" },
+    });
+    if (!response.ok) {
+      const errorText = await response.text();
+      throw new Error(`HTTP ${response.status}: ${errorText}`);
+    }
+    return await response.json();
+  } catch (error) {
+    console.error("Fetch related products error:", error);
+    throw error;
+  }
+}
+
+async function fetchVendorAnalytics(start = "", end = "") {
   const token = requireToken();
+  const params = new URLSearchParams();
+  if (start) params.set("start", start);
+  if (end) params.set("end", end);
   try {
-    const response = await fetch(`${API_BASE_URL}/products`, {
+    const response = await fetch(`${API_BASE_URL}/analytics/vendors?${params.toString()}`, {
+      headers: withAuthHeaders(token, { "Content-Type": "application/json" }),
+    });
+    if (!response.ok) {
+      const errorText = await response.text();
+      throw new Error(`HTTP ${response.status}: ${errorText}`);
+    }
+    return await response.json();
+  } catch (error) {
+    console.error("Fetch vendor analytics error:", error);
+    throw error;
+  }
+}
+
+async function createProduct(data, onConflict = "reject") {
+  const token = requireToken();
+  try {
+    const response = await fetch(`${API_BASE_URL}/products?on_conflict=${onConflict}`, {
       method: "POST",
       headers: withAuthHeaders(token, { "Content-Type": "application/json" }),
       body: JSON.stringify(data),
@@ -160,6 +239,99 @@ async function markOutOfStock(id) {
   }
 }
 
+async function createBroadcast(productIds, mode = "individual") {
+  const token = requireToken();
+  try {
+    const response = await fetch(`${API_BASE_URL}/broadcasts`, {
+      method: "POST",
+      headers: withAuthHeaders(token, { "Content-Type": "application/json" }),
+      body: JSON.stringify({ product_ids: productIds, mode }),
+    });
+    if (!response.ok) {
+      const errorText = await response.text();
+      throw new Error(`HTTP ${response.status}: ${errorText}`);
+    }
+    return await response.json();
+  } catch (error) {
+    console.error("Create broadcast error:", error);
+    throw error;
+  }
+}
+
+async function fetchBroadcastJob(jobId) {
+  const token = requireToken();
+  try {
+    const response = await fetch(`${API_BASE_URL}/broadcasts/${jobId}`, {
+      headers: withAuthHeaders(token, { "Content-Type": "application/json" }),
+    });
+    if (!response.ok) {
+      const errorText = await response.text();
+      throw new Error(`HTTP ${response.status}: ${errorText}`);
+    }
+    return await response.json();
+  } catch (error) {
+    console.error(`Fetch broadcast job error for ${jobId}:`, error);
+    throw error;
+  }
+}
+
+async function bulkUpdateProducts(items) {
+  const token = requireToken();
+  try {
+    const response = await fetch(`${API_BASE_URL}/products/bulk`, {
+      method: "PATCH",
+      headers: withAuthHeaders(token, { "Content-Type": "application/json" }),
+      body: JSON.stringify(items),
+    });
+    if (!response.ok) {
+      const errorText = await response.text();
+      throw new Error(`HTTP ${response.status}: ${errorText}`);
+    }
+    return await response.json();
+  } catch (error) {
+    console.error("Bulk update products error:", error);
+    throw error;
+  }
+}
+
+async function bulkMarkOutOfStock(ids) {
+  const token = requireToken();
+  try {
+    const response = await fetch(`${API_BASE_URL}/products/bulk/mark-out-of-stock`, {
+      method: "POST",
+      headers: withAuthHeaders(token, { "Content-Type": "application/json" }),
+      body: JSON.stringify({ ids }),
+    });
+    if (!response.ok) {
+      const errorText = await response.text();
+      throw new Error(`HTTP ${response.status}: ${errorText}`);
+    }
+    return await response.json();
+  } catch (error) {
+    console.error("Bulk mark out-of-stock error:", error);
+    throw error;
+  }
+}
+
+async function bulkDeleteProducts(criteria) {
+  const token = requireToken();
+  try {
+    const response = await fetch(`${API_BASE_URL}/products/bulk/delete`, {
+      method: "POST",
+      headers: withAuthHeaders(token, { "Content-Type": "application/json" }),
+      body: JSON.stringify(criteria),
+    });
+    if (!response.ok) {
+      const errorText = await response.text();
+      throw new Error(`HTTP ${response.status}: ${errorText}`);
+    }
+    return await response.json();
+  } catch (error) {
+    console.error("Bulk delete products error:", error);
+    throw error;
+  }
+}
+
 async function uploadProducts(file) {
   const token = requireToken();
   try {
@@ -181,11 +353,32 @@ async function uploadProducts(file) {
   }
 }
 
-async function fetchProductsByCategory(category) {
+async function previewProductImport(file) {
+  const token = requireToken();
+  try {
+    const formData = new FormData();
+    formData.append("file", file);
+    const response = await fetch(`${API_BASE_URL}/products/import?dry_run=true`, {
+      method: "POST",
+      headers: withAuthHeaders(token),
+      body: formData,
+    });
+    if (!response.ok) {
+      const errorText = await response.text();
+      throw new Error(`HTTP ${response.status}: ${errorText}`);
+    }
+    return await response.json();
+  } catch (error) {
+    console.error("Preview import error:", error);
+    throw error;
+  }
+}
+
+async function fetchProductsByCategory(category, offset = 0, limit = 200) {
   const token = localStorage.getItem("token");
   const headers = token ? withAuthHeaders(token) : {};
   try {
-    const response = await fetch(`${API_BASE_URL}/products/category/${encodeURIComponent(category)}`, {
+    const response = await fetch(`${API_BASE_URL}/products/category/${encodeURIComponent(category)}?limit=${limit}&offset=${offset}`, {
       headers,
     });
     if (!response.ok) {
@@ -239,6 +432,25 @@ async function checkDuplicate(sku, upc) {
   }
 }
 
+async function checkDuplicates(skus = [], upcs = []) {
+  const token = requireToken();
+  try {
+    const response = await fetch(`${API_BASE_URL}/products/check-duplicates`, {
+      method: "POST",
+      headers: withAuthHeaders(token, { "Content-Type": "application/json" }),
+      body: JSON.stringify({ skus, upcs }),
+    });
+    if (!response.ok) {
+      const errorText = await response.text();
+      throw new Error(`HTTP ${response.status}: ${errorText}`);
+    }
+    return await response.json();
+  } catch (error) {
+    console.error("Check duplicates error:", error);
+    throw error;
+  }
+}
+
 export async function fetchUserSettings() {
   const token = localStorage.getItem("token");
   if (!token) {
@@ -390,10 +602,14 @@ async function deleteUser(username) {
   }
 }
 
-async function fetchAuditLogs(limit = 100, offset = 0) {
+async function fetchAuditLogs(limit = 100, cursor = null) {
   const token = requireToken();
+  const params = new URLSearchParams({ limit });
+  if (cursor) {
+    params.set("cursor", cursor);
+  }
   try {
-    const response = await fetch(`${API_BASE_URL}/admin/audit-logs?limit=${limit}&offset=${offset}`, {
+    const response = await fetch(`${API_BASE_URL}/admin/audit-logs?${params.toString()}`, {
       headers: withAuthHeaders(token, { "Content-Type": "application/json" }),
     });
     if (!response.ok) {
@@ -462,18 +678,29 @@ async function fetchCurrentUser() {
 
 export {
   login,
+  refreshAccessToken,
   fetchProducts,
   fetchPublicProducts,
   fetchProductFilters,
+  fetchCategories,
+  fetchRelatedProducts,
+  fetchVendorAnalytics,
   fetchProductsByCategory,
   createProduct,
   updateProduct,
   deleteProduct,
   markOutOfStock,
+  bulkUpdateProducts,
+  createBroadcast,
+  fetchBroadcastJob,
+  bulkMarkOutOfStock,
+  bulkDeleteProducts,
   searchProducts,
   uploadProducts,
+  previewProductImport,
   requestInvoice,
   checkDuplicate,
+  checkDuplicates,
   // Admin functions
   fetchUsers,
   createUser,
@@ -430,15 +430,18 @@ function UsersTab({ currentUser }) {
 // Audit Logs Tab
 function AuditLogsTab() {
   const [logs, setLogs] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState(null);
 
   const loadLogs = useCallback(async () => {
     setLoading(true);
     setError(null);
     try {
-      const data = await fetchAuditLogs(100, 0);
+      const data = await fetchAuditLogs(100);
       setLogs(data.logs || []);
+      setNextCursor(data.next_cursor || null);
     } catch (err) {
       setError(err.message);
     } finally {
@@ -446,6 +449,20 @@ function AuditLogsTab() {
     }
   }, []);
 
+  const loadMoreLogs = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const data = await fetchAuditLogs(100, nextCursor);
+      setLogs((prev) => [...prev, ...(data.logs || [])]);
+      setNextCursor(data.next_cursor || null);
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     loadLogs();
   }, [loadLogs]);
@@ -537,6 +554,14 @@ function AuditLogsTab() {
           </TableBody>
         </Table>
       </TableContainer>
+
+      {nextCursor && (
+        <Box sx={{ display: "flex", justifyContent: "center", mt: 2 }}>
+          <Button variant="outlined" onClick={loadMoreLogs} disabled={loadingMore}>
+            {loadingMore ? "Loading..." : "Load More"}
+          </Button>
+        </Box>
+      )}
     </Box>
   );
 }
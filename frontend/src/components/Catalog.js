@@ -1144,6 +1144,7 @@ const Catalog = () => {
           isSelected={selectedProduct ? !!selectedForInvoice[selectedProduct.id] : false}
           selectedQty={selectedProduct ? selectedForInvoice[selectedProduct.id] : null}
           onQtyChange={(qty) => selectedProduct && updateInvoiceQty(selectedProduct.id, qty)}
+          onSelectProduct={handleOpenDetail}
         />
 
         {/* Snackbar for notifications */}
@@ -14,6 +14,8 @@ const CategoryPage = () => {
   const [products, setProducts] = useState([]);
   const [error, setError] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [hasMore, setHasMore] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [displayCategory, setDisplayCategory] = useState(safeCategory);
   const categoryLabel = displayCategory || safeCategory;
 
@@ -28,6 +30,7 @@ const CategoryPage = () => {
       .then((payload) => {
         if (!isMounted) return;
         setProducts(payload?.products ?? []);
+        setHasMore(Boolean(payload?.has_more));
         const rawCategory = typeof payload?.category === 'string' ? payload.category.trim() : '';
         setDisplayCategory(rawCategory || safeCategory);
       })
@@ -45,6 +48,19 @@ const CategoryPage = () => {
     };
   }, [safeCategory]);
 
+  const loadMore = () => {
+    setLoadingMore(true);
+    fetchProductsByCategory(safeCategory, products.length)
+      .then((payload) => {
+        setProducts((prev) => [...prev, ...(payload?.products ?? [])]);
+        setHasMore(Boolean(payload?.has_more));
+      })
+      .catch(() => {
+        setError("We couldn't load more products right now. Please try again later.");
+      })
+      .finally(() => setLoadingMore(false));
+  };
+
   if (loading) {
     return <div>Loading {categoryLabel} products.</div>;
   }
@@ -63,7 +79,7 @@ const CategoryPage = () => {
       <div style={{ display: "flex", flexWrap: "wrap", gap: "16px" }}>
         {products.map((product) => (
           <article
-            key={`${product.title}-${product.price}`}
+            key={product.id ?? `${product.title}-${product.price}`}
             style={{
               border: "1px solid #ddd",
               borderRadius: "8px",
@@ -98,6 +114,25 @@ const CategoryPage = () => {
           </article>
         ))}
       </div>
+      {hasMore && (
+        <button
+          type="button"
+          onClick={loadMore}
+          disabled={loadingMore}
+          style={{
+            display: "block",
+            margin: "24px auto",
+            padding: "10px 24px",
+            borderRadius: "4px",
+            border: "1px solid #1976d2",
+            backgroundColor: "#fff",
+            color: "#1976d2",
+            cursor: "pointer",
+          }}
+        >
+          {loadingMore ? "Loading..." : "Load more"}
+        </button>
+      )}
     </div>
   );
 };
@@ -38,7 +38,7 @@ import AdminPanelSettingsIcon from "@mui/icons-material/AdminPanelSettings";
 import SettingsDialog from "./SettingsDialog";
 import ProductFormDialog from "./ProductFormDialog";
 import VendorPerformance from "./VendorPerformance";
-import { fetchProducts, createProduct, updateProduct, deleteProduct, markOutOfStock, searchProducts, uploadProducts, fetchCurrentUser } from "../api";
+import { fetchProducts, createProduct, updateProduct, deleteProduct, markOutOfStock, bulkUpdateProducts, bulkMarkOutOfStock, searchProducts, uploadProducts, previewProductImport, fetchCurrentUser, refreshAccessToken } from "../api";
 import { sendIndividualEmails, sendGroupEmail } from "../emailSender";
 import * as XLSX from "xlsx";
 import jwtDecode from "jwt-decode";
@@ -160,8 +160,16 @@ const InternalProductList = ({ onBack }) => {
     if (!file) return;
     setUploading(true);
     try {
+      const preview = await previewProductImport(file);
+      const { summary } = preview;
+      const proceed = window.confirm(
+        `Import preview: ${summary.inserts} new, ${summary.updates} updated ` +
+        `(${summary.price_changes} price changes), ${summary.unchanged} unchanged, ` +
+        `${summary.skipped} skipped. Continue?`
+      );
+      if (!proceed) return;
       const result = await uploadProducts(file);
-      alert(`Import complete: ${result.inserted} inserted, ${result.updated} updated, ${result.skipped} skipped`);
+      alert(`Import complete: ${result.inserted} inserted, ${result.updated} updated, ${result.unchanged} unchanged, ${result.skipped} skipped`);
       await loadProducts();
     } catch (error) {
       console.error("Upload products error:", error);
@@ -172,21 +180,36 @@ const InternalProductList = ({ onBack }) => {
   };
 
   useEffect(() => {
-    const token = localStorage.getItem("token");
-    if (!token) {
-      navigate("/login");
-      return;
-    }
-    try {
-      const decodedToken = jwtDecode(token);
-      const expirationTime = decodedToken.exp * 1000;
-      const currentTime = Date.now();
-      if (expirationTime < currentTime) {
+    const startSession = async () => {
+      let token = localStorage.getItem("token");
+      let expired = !token;
+      if (token) {
+        try {
+          expired = jwtDecode(token).exp * 1000 < Date.now();
+        } catch (error) {
+          expired = true;
+        }
+      }
+      if (expired) {
+        token = await refreshAccessToken();
+      }
+      return token;
+    };
+    startSession().then((token) => {
+      if (!token) {
         localStorage.removeItem("token");
         localStorage.removeItem("tokenExpiration");
         navigate("/login");
         return;
       }
+      initSession(token);
+    });
+  }, [navigate]);
+
+  const initSession = (token) => {
+    try {
+      const decodedToken = jwtDecode(token);
+      const expirationTime = decodedToken.exp * 1000;
       localStorage.setItem("tokenExpiration", expirationTime);
       loadProducts();
       // Fetch current user info for role
@@ -201,7 +224,7 @@ const InternalProductList = ({ onBack }) => {
       localStorage.removeItem("tokenExpiration");
       navigate("/login");
     }
-  }, [navigate]);
+  };
 
   useEffect(() => {
     // Use settings for default sort, fallback to offer_date desc
@@ -496,7 +519,18 @@ const InternalProductList = ({ onBack }) => {
       console.log("Prepared API payload:", updatedFormData);
       if (dialogMode === "add") {
         console.log("Creating product with data:", updatedFormData);
-        const response = await createProduct(updatedFormData);
+        let response;
+        try {
+          response = await createProduct(updatedFormData);
+        } catch (error) {
+          if (!error.message.includes("HTTP 409")) {
+            throw error;
+          }
+          if (!window.confirm(`A product with SKU "${updatedFormData.sku}" already exists. Update it with these details instead?`)) {
+            return;
+          }
+          response = await createProduct(updatedFormData, "update");
+        }
         console.log("Create product response:", response);
         localStorage.removeItem("productFormData");
       } else {
@@ -990,10 +1024,8 @@ const InternalProductList = ({ onBack }) => {
     }
     setBulkActionLoading(true);
     try {
-      await Promise.all(
-        selectedIds.map((id) =>
-          updateProduct(Number(id), { [bulkEditField]: valueToApply })
-        )
+      await bulkUpdateProducts(
+        selectedIds.map((id) => ({ id: Number(id), [bulkEditField]: valueToApply }))
       );
       alert(`Updated ${selectedIds.length} product${selectedIds.length === 1 ? "" : "s"}.`);
       setBulkEditOpen(false);
@@ -1034,7 +1066,7 @@ const InternalProductList = ({ onBack }) => {
         timestamp: new Date().toISOString(),
       };
 
-      await Promise.all(selectedIds.map((id) => markOutOfStock(Number(id))));
+      await bulkMarkOutOfStock(selectedIds.map((id) => Number(id)));
 
       // Add to undo stack (keep last 10 operations)
       setUndoStack((prev) => [...prev.slice(-9), undoAction]);
@@ -1076,10 +1108,8 @@ const InternalProductList = ({ onBack }) => {
       };
 
       // Mark in stock by updating out_of_stock to false
-      await Promise.all(
-        selectedIds.map((id) =>
-          updateProduct(Number(id), { out_of_stock: false })
-        )
+      await bulkUpdateProducts(
+        selectedIds.map((id) => ({ id: Number(id), out_of_stock: false }))
       );
 
       // Add to undo stack (keep last 10 operations)
@@ -1113,10 +1143,8 @@ const InternalProductList = ({ onBack }) => {
     setBulkActionLoading(true);
     try {
       // Restore original values
-      await Promise.all(
-        lastAction.products.map((p) =>
-          updateProduct(p.id, { out_of_stock: p.out_of_stock })
-        )
+      await bulkUpdateProducts(
+        lastAction.products.map((p) => ({ id: p.id, out_of_stock: p.out_of_stock }))
       );
 
       // Remove from undo stack
@@ -1259,6 +1287,7 @@ const InternalProductList = ({ onBack }) => {
 
   const handleLogout = () => {
     localStorage.removeItem("token");
+    localStorage.removeItem("refresh_token");
     localStorage.removeItem("tokenExpiration");
     localStorage.removeItem("sortModel");
     navigate("/login");
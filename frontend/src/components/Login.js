@@ -15,9 +15,12 @@ const Login = () => {
     const finalUsername = username.trim() === "" ? "joey" : username.trim();
     try {
       const response = await login(finalUsername, password);
-      const { access_token } = response;
+      const { access_token, refresh_token } = response;
       if (access_token) {
         localStorage.setItem("token", access_token);
+        if (refresh_token) {
+          localStorage.setItem("refresh_token", refresh_token);
+        }
         navigate("/products");
       } else {
         setError("Login failed: No token received");
@@ -1,4 +1,4 @@
-import React, { useState } from "react";
+import React, { useEffect, useState } from "react";
 import {
   Box,
   Button,
@@ -12,6 +12,7 @@ import KeyboardArrowDownIcon from "@mui/icons-material/KeyboardArrowDown";
 import ChairIcon from "@mui/icons-material/Chair";
 import MeetingRoomIcon from "@mui/icons-material/MeetingRoom";
 import WeekendIcon from "@mui/icons-material/Weekend";
+import { fetchCategories } from "../api";
 
 // Furniture category structure with icons and subcategories
 const FURNITURE_CATEGORIES = {
@@ -60,9 +61,38 @@ const QUICK_LINKS = [
   { name: "Bulk Orders", color: "#003087" },
 ];
 
+// Loose match between menu labels and taxonomy node names ("Filing & Storage" ~ "filing and storage")
+const categoryKey = (value) =>
+  (value || "").toLowerCase().replace(/&/g, " and ").replace(/[^a-z0-9_\s]/g, " ").replace(/\s+/g, " ").trim();
+
+const formatPrice = (value) => `$${Math.round(value).toLocaleString()}`;
+
 const MegaMenu = ({ onFilterChange }) => {
   const [anchorEl, setAnchorEl] = useState(null);
   const [activeMenu, setActiveMenu] = useState(null);
+  const [categoryStats, setCategoryStats] = useState({});
+
+  useEffect(() => {
+    fetchCategories()
+      .then((tree) => {
+        const stats = {};
+        (tree || []).forEach((node) => {
+          stats[node.path] = node;
+        });
+        setCategoryStats(stats);
+      })
+      .catch(() => setCategoryStats({}));
+  }, []);
+
+  const describeCategory = (menuKey, item) => {
+    const node = menuKey === "Shop by Category" ? categoryStats[categoryKey(item.name)] : null;
+    if (!node || !node.active_count) return item.description;
+    const range =
+      node.min_price != null && node.max_price != null
+        ? ` · ${formatPrice(node.min_price)}–${formatPrice(node.max_price)}`
+        : "";
+    return `${node.active_count} in stock${range}`;
+  };
 
   const handleMenuOpen = (event, menuKey) => {
     setAnchorEl(event.currentTarget);
@@ -213,7 +243,7 @@ const MegaMenu = ({ onFilterChange }) => {
                             variant="body2"
                             sx={{ color: "#666", fontSize: "0.8rem" }}
                           >
-                            {item.description}
+                            {describeCategory(menuKey, item)}
                           </Typography>
                         </Box>
                       </Box>
@@ -1,4 +1,4 @@
-import React, { useState } from "react";
+import React, { useEffect, useState } from "react";
 import {
   Dialog,
   DialogContent,
@@ -26,6 +26,7 @@ import ScaleIcon from "@mui/icons-material/Scale";
 import BuildIcon from "@mui/icons-material/Build";
 import VerifiedIcon from "@mui/icons-material/Verified";
 import ProductImageGallery from "./ProductImageGallery";
+import { fetchRelatedProducts } from "../api";
 
 const ProductDetailModal = ({
   open,
@@ -35,8 +36,29 @@ const ProductDetailModal = ({
   isSelected,
   selectedQty,
   onQtyChange,
+  onSelectProduct,
 }) => {
   const [localQty, setLocalQty] = useState(selectedQty || product?.moq || 1);
+  const [related, setRelated] = useState([]);
+  const productId = product?.id;
+
+  useEffect(() => {
+    if (!open || !productId) {
+      setRelated([]);
+      return undefined;
+    }
+    let cancelled = false;
+    fetchRelatedProducts(productId)
+      .then((data) => {
+        if (!cancelled) setRelated(data.products || []);
+      })
+      .catch(() => {
+        if (!cancelled) setRelated([]);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [open, productId]);
 
   if (!product) return null;
 
@@ -343,6 +365,46 @@ const ProductDetailModal = ({
             )}
           </Grid>
         </Grid>
+
+        {/* Similar Products */}
+        {related.length > 0 && (
+          <Box sx={{ mt: 4 }}>
+            <Divider sx={{ mb: 2 }} />
+            <Typography variant="h6" sx={{ fontWeight: 600, mb: 2, color: "#003087" }}>
+              {qty > 0 ? "Similar Products" : "Available Alternatives"}
+            </Typography>
+            <Grid container spacing={2}>
+              {related.map((item) => (
+                <Grid item xs={6} sm={4} md={2} key={item.id}>
+                  <Box
+                    onClick={() => onSelectProduct && onSelectProduct(item)}
+                    sx={{
+                      cursor: onSelectProduct ? "pointer" : "default",
+                      border: "1px solid #e0e0e0",
+                      borderRadius: 1,
+                      p: 1,
+                      height: "100%",
+                      "&:hover": onSelectProduct ? { borderColor: "#003087" } : {},
+                    }}
+                  >
+                    <Box
+                      component="img"
+                      src={item.image_url || "https://via.placeholder.com/150"}
+                      alt={item.title}
+                      sx={{ width: "100%", height: 100, objectFit: "contain", mb: 1 }}
+                    />
+                    <Typography variant="body2" sx={{ fontWeight: 600 }} noWrap title={item.title}>
+                      {item.title}
+                    </Typography>
+                    <Typography variant="body2" sx={{ color: "#003087" }}>
+                      ${parseFloat(item.price || 0).toLocaleString()}
+                    </Typography>
+                  </Box>
+                </Grid>
+              ))}
+            </Grid>
+          </Box>
+        )}
       </DialogContent>
     </Dialog>
   );
@@ -12,8 +12,9 @@ import {
   Button,
   CircularProgress,
   Chip,
+  TextField,
 } from "@mui/material";
-import { fetchProducts } from "../api";
+import { fetchVendorAnalytics } from "../api";
 import { SettingsContext } from "../settings/SettingsContext";
 
 const VendorPerformance = ({ onBack }) => {
@@ -21,75 +22,29 @@ const VendorPerformance = ({ onBack }) => {
   const [vendors, setVendors] = useState([]);
   const [loading, setLoading] = useState(true);
 
+  const [startDate, setStartDate] = useState("");
+  const [endDate, setEndDate] = useState("");
+
   useEffect(() => {
     loadVendorData();
-  }, []);
+  }, [startDate, endDate]);
 
   const loadVendorData = async () => {
     try {
       setLoading(true);
-      const response = await fetchProducts();
-      const products = response.products || [];
-
-      // Group products by vendor
-      const vendorMap = {};
-      products.forEach((product) => {
-        const vendorName = product.vendor || "Unknown";
-        if (!vendorMap[vendorName]) {
-          vendorMap[vendorName] = {
-            name: vendorName,
-            totalProducts: 0,
-            activeProducts: 0,
-            outOfStock: 0,
-            leadTimes: [],
-            moqs: [],
-          };
-        }
-
-        vendorMap[vendorName].totalProducts++;
-        if (!product.out_of_stock) {
-          vendorMap[vendorName].activeProducts++;
-        } else {
-          vendorMap[vendorName].outOfStock++;
-        }
-
-        if (product.lead_time) {
-          vendorMap[vendorName].leadTimes.push(product.lead_time);
-        }
-        if (product.moq) {
-          vendorMap[vendorName].moqs.push(parseInt(product.moq, 10));
-        }
-      });
-
-      // Calculate averages and format data
-      const vendorStats = Object.values(vendorMap).map((vendor) => {
-        const avgMOQ = vendor.moqs.length > 0
-          ? Math.round(vendor.moqs.reduce((a, b) => a + b, 0) / vendor.moqs.length)
-          : 0;
-
-        // Get most common lead time
-        const leadTimeFreq = {};
-        vendor.leadTimes.forEach((lt) => {
-          leadTimeFreq[lt] = (leadTimeFreq[lt] || 0) + 1;
-        });
-        const commonLeadTime = Object.keys(leadTimeFreq).length > 0
-          ? Object.keys(leadTimeFreq).reduce((a, b) => leadTimeFreq[a] > leadTimeFreq[b] ? a : b)
-          : "N/A";
-
-        return {
-          ...vendor,
-          avgMOQ,
-          commonLeadTime,
-          activeRate: vendor.totalProducts > 0
-            ? Math.round((vendor.activeProducts / vendor.totalProducts) * 100)
-            : 0,
-        };
-      });
-
-      // Sort by total products (most active vendors first)
-      vendorStats.sort((a, b) => b.totalProducts - a.totalProducts);
-
-      setVendors(vendorStats);
+      // Aggregated server-side (GROUP BY vendor), so this is one small response
+      const rows = await fetchVendorAnalytics(startDate, endDate);
+      setVendors(
+        rows.map((vendor) => ({
+          name: vendor.name,
+          totalProducts: vendor.total_products,
+          activeProducts: vendor.active_products,
+          outOfStock: vendor.out_of_stock,
+          avgMOQ: vendor.avg_moq,
+          commonLeadTime: vendor.common_lead_time || "N/A",
+          activeRate: vendor.active_rate,
+        }))
+      );
       setLoading(false);
     } catch (error) {
       console.error("Error loading vendor data:", error);
@@ -122,6 +77,25 @@ const VendorPerformance = ({ onBack }) => {
         View performance metrics and statistics for all your vendors.
       </Typography>
 
+      <Box sx={{ display: "flex", gap: 2, mb: 3 }}>
+        <TextField
+          label="Offer date from"
+          type="date"
+          size="small"
+          value={startDate}
+          onChange={(e) => setStartDate(e.target.value)}
+          InputLabelProps={{ shrink: true }}
+        />
+        <TextField
+          label="Offer date to"
+          type="date"
+          size="small"
+          value={endDate}
+          onChange={(e) => setEndDate(e.target.value)}
+          InputLabelProps={{ shrink: true }}
+        />
+      </Box>
+
       <TableContainer component={Paper} sx={{ boxShadow: 3 }}>
         <Table>
           <TableHead>
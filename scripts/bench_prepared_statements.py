@@ -0,0 +1,106 @@
+"""Measure what the prepared-statement registry saves on the import and auth paths.
+
+Usage (from the repo root, with the usual DB_* variables pointing at a
+database that already has products):
+    python scripts/bench_prepared_statements.py --lookups 20000 --logins 2000
+
+Reports, for each path, wall time with plain cur.execute() against EXECUTE of
+the registered statement on one pooled connection, and the server's own
+planning time for one execution of each (EXPLAIN ANALYZE).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import main  # noqa: E402
+
+
+def planning_ms(cur, sql: str, params: tuple) -> float:
+    cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params)
+    return cur.fetchone()["QUERY PLAN"][0]["Planning Time"]
+
+
+def bench(cur, name: str, params_list: list) -> dict:
+    sql, _ = main.prepared_statements.statements[name]
+    start = time.perf_counter()
+    for params in params_list:
+        cur.execute(sql, params)
+        cur.fetchall()
+    plain = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for params in params_list:
+        main.prepared_statements.execute(cur, name, params)
+        cur.fetchall()
+    prepared = time.perf_counter() - start
+
+    params = params_list[0]
+    placeholders = f" ({', '.join(['%s'] * len(params))})" if params else ""
+    return {
+        "plain_s": plain,
+        "prepared_s": prepared,
+        "plain_plan_ms": planning_ms(cur, sql, params),
+        "prepared_plan_ms": planning_ms(cur, f"EXECUTE {name}{placeholders}", params),
+    }
+
+
+def report(label: str, count: int, result: dict):
+    saved = result["plain_s"] - result["prepared_s"]
+    print(f"{label} ({count} executions)")
+    print(f"  plain     {result['plain_s']:.3f}s  ({result['plain_s'] / count * 1e6:.0f} us each, planning {result['plain_plan_ms']:.3f} ms)")
+    print(f"  prepared  {result['prepared_s']:.3f}s  ({result['prepared_s'] / count * 1e6:.0f} us each, planning {result['prepared_plan_ms']:.3f} ms)")
+    print(f"  saved     {saved:.3f}s ({saved / result['plain_s'] * 100:.0f}%)")
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookups", type=int, default=20000, help="import SKU/title lookups to run")
+    parser.add_argument("--logins", type=int, default=2000, help="role lookups / connections to run")
+    args = parser.parse_args()
+
+    conn = main.get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT sku, title FROM products WHERE sku IS NOT NULL AND title IS NOT NULL LIMIT 1000")
+    products = cur.fetchall() or [{"sku": "missing", "title": "missing"}]
+    cur.execute("SELECT username FROM users LIMIT 50")
+    users = [row["username"] for row in cur.fetchall()]
+
+    skus = [(main.sku_key(products[i % len(products)]["sku"]),) for i in range(args.lookups)]
+    titles = [(products[i % len(products)]["title"],) for i in range(args.lookups)]
+    report("import SKU lookup", args.lookups, bench(cur, main.IMPORT_SKU_LOOKUP_SQL, skus))
+    report("import title lookup", args.lookups, bench(cur, main.IMPORT_TITLE_LOOKUP_SQL, titles))
+    logins = [(users[i % len(users)],) for i in range(args.logins)]
+    report("auth role lookup", args.logins, bench(cur, main.USER_STATE_SQL, logins))
+    cur.close()
+    conn.close()
+
+    # The auth path used to open a connection per lookup; now it reuses a
+    # pooled session that already has the statement prepared.
+    start = time.perf_counter()
+    for (username,) in logins:
+        conn = main.db_pool.connect()
+        cur = conn.cursor()
+        cur.execute(main.prepared_statements.statements[main.USER_STATE_SQL][0], (username,))
+        cur.fetchone()
+        conn.discard = True
+        conn.close()
+    fresh = time.perf_counter() - start
+    start = time.perf_counter()
+    for (username,) in logins:
+        conn = main.get_db_connection()
+        cur = conn.cursor()
+        main.prepared_statements.execute(cur, main.USER_STATE_SQL, (username,))
+        cur.fetchone()
+        conn.close()
+    pooled = time.perf_counter() - start
+    print(f"auth role lookup incl. connection ({args.logins} requests)")
+    print(f"  new connection + plain  {fresh:.3f}s  ({fresh / args.logins * 1e6:.0f} us each)")
+    print(f"  pooled + prepared       {pooled:.3f}s  ({pooled / args.logins * 1e6:.0f} us each)")
+
+
+if __name__ == "__main__":
+    main_bench()
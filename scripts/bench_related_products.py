@@ -0,0 +1,95 @@
+"""Benchmark the related-products encoder and top-K search on a synthetic catalog.
+
+Usage (from the repo root; needs the usual DB_* variables because importing
+the backend runs its migrations):
+    python scripts/bench_related_products.py --products 100000 --k 12
+
+Nothing is written to the database; the products are generated in memory.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import numpy as np  # noqa: E402
+
+import main  # noqa: E402
+
+CATEGORIES = {
+    "chairs": ["task chairs", "guest chairs", "executive chairs", "stools"],
+    "desks": ["l desks", "standing desks", "writing desks", "reception desks"],
+    "tables": ["conference tables", "training tables", "cafe tables"],
+    "storage": ["filing cabinets", "bookcases", "lockers"],
+    "seating": ["sofas", "benches", "lounge chairs"],
+}
+STYLES = ["Modern", "Traditional", "Industrial", "Transitional", "Contemporary", "Mid-Century"]
+MATERIALS = ["Mesh", "Leather", "Laminate", "Steel", "Oak", "Walnut", "Fabric", "Glass"]
+COLORS = ["Black", "Gray", "White", "Espresso", "Cherry", "Navy", "Beige"]
+BRANDS = ["Steelcase", "Herman Miller", "HON", "Global", "OFM", "Lorell", "Safco", "Boss"]
+
+
+def synthetic_products(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    products = []
+    for product_id in range(1, count + 1):
+        top = rng.choice(list(CATEGORIES))
+        products.append({
+            "id": product_id,
+            "category_path": f"{top}/{rng.choice(CATEGORIES[top])}",
+            "style": rng.choice(STYLES),
+            "material": ", ".join(rng.sample(MATERIALS, rng.randint(1, 2))),
+            "color": rng.choice(COLORS),
+            "brand": rng.choice(BRANDS) if rng.random() > 0.1 else None,
+            "width": round(rng.uniform(18, 96), 1) if rng.random() > 0.2 else None,
+            "depth": round(rng.uniform(18, 48), 1) if rng.random() > 0.2 else None,
+            "height": round(rng.uniform(16, 78), 1) if rng.random() > 0.2 else None,
+            "price": round(rng.lognormvariate(5.5, 0.8), 2),
+            "out_of_stock": rng.random() < 0.15,
+        })
+    return products
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--k", type=int, default=main.RELATED_TOP_K)
+    parser.add_argument("--check", type=int, default=200, help="rows to verify against a per-row exact search")
+    args = parser.parse_args()
+
+    products = synthetic_products(args.products)
+    start = time.perf_counter()
+    matrix = main.related_feature_matrix(products)
+    encoded = time.perf_counter() - start
+    in_stock = np.array([not product["out_of_stock"] for product in products])
+
+    start = time.perf_counter()
+    indices, scores = main.nearest_neighbors(matrix, in_stock, args.k)
+    searched = time.perf_counter() - start
+    print(f"{args.products} products, {matrix.shape[1]} features, k={args.k}")
+    print(f"  encode   {encoded:.2f}s")
+    print(f"  top-k    {searched:.2f}s ({searched / args.products * 1e6:.0f} us per product)")
+
+    # Spot-check the batched search against a straightforward per-row search
+    candidates = np.flatnonzero(in_stock)
+    mismatches = 0
+    for row in random.Random(2).sample(range(args.products), min(args.check, args.products)):
+        similarity = matrix[candidates] @ matrix[row]
+        similarity[candidates == row] = -np.inf
+        best = np.sort(similarity)[::-1][:args.k]
+        if not np.allclose(best, scores[row], atol=1e-5):
+            mismatches += 1
+    print(f"  exact-search check: {mismatches} of {min(args.check, args.products)} rows differ")
+
+    same_top = [
+        products[indices[row, 0]]["category_path"] == products[row]["category_path"]
+        for row in range(args.products) if indices[row, 0] >= 0
+    ]
+    print(f"  nearest neighbour shares the category path for {sum(same_top) / len(same_top) * 100:.1f}% of products")
+
+
+if __name__ == "__main__":
+    main_bench()
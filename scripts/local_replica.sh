@@ -0,0 +1,30 @@
+#!/bin/bash
+# Start a streaming read replica of a local Postgres, for exercising DB_REPLICA_DSNS.
+#
+# Usage:
+#   scripts/local_replica.sh [PRIMARY_HOST] [PRIMARY_PORT] [REPLICA_DIR] [REPLICA_PORT]
+#   scripts/local_replica.sh localhost 5432 /tmp/npp_replica 5433
+#
+# The primary must allow replication connections (the postgres image's
+# pg_hba.conf does). Then run the backend with:
+#   DB_REPLICA_DSNS="host=localhost port=5433 dbname=npp_furniture user=postgres password=..."
+# and pause replay on the replica to see lagging reads fall back to the primary:
+#   psql -h localhost -p 5433 -U postgres -c "SELECT pg_wal_replay_pause()"
+
+set -e
+
+PRIMARY_HOST=${1:-localhost}
+PRIMARY_PORT=${2:-5432}
+REPLICA_DIR=${3:-/tmp/npp_replica}
+REPLICA_PORT=${4:-5433}
+
+if [ -e "$REPLICA_DIR" ]; then
+    echo "$REPLICA_DIR already exists; remove it or pick another directory" >&2
+    exit 1
+fi
+
+# -R writes standby.signal and primary_conninfo so the copy starts as a standby
+pg_basebackup -h "$PRIMARY_HOST" -p "$PRIMARY_PORT" -U postgres -D "$REPLICA_DIR" -R -X stream
+pg_ctl -D "$REPLICA_DIR" -o "-p $REPLICA_PORT -k /tmp" -l "$REPLICA_DIR/replica.log" start
+
+echo "Replica listening on port $REPLICA_PORT; stop it with: pg_ctl -D $REPLICA_DIR stop"
@@ -0,0 +1,126 @@
+"""Local stand-in for the Kit broadcasts API, for exercising POST /broadcasts.
+
+Usage:
+    python scripts/mock_kit_server.py                          # listen on 127.0.0.1:8765
+    python scripts/mock_kit_server.py --per-minute 30 --fail-rate 0.1
+    python scripts/mock_kit_server.py --per-minute 30 --http-date --fail-first 3
+
+Point the backend at it with:
+    KIT_API_URL=http://127.0.0.1:8765/v4/broadcasts KIT_API_KEY=test
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockKit:
+    def __init__(self, per_minute: int, fail_rate: float, fail_first: int = 0, http_date: bool = False,
+                 window: float = 60):
+        self.per_minute = per_minute  # requests allowed per window (a minute unless tests shorten it)
+        self.window = window
+        self.fail_rate = fail_rate
+        self.fail_first = fail_first
+        self.http_date = http_date
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.broadcasts = []
+        self.requests = []  # (monotonic time, status) of every request
+
+    def retry_after(self, wait: float) -> str:
+        if self.http_date:
+            # Whole seconds only, so round up to keep the same minimum wait
+            return formatdate(math.ceil(time.time() + wait) + 1, usegmt=True)
+        return str(int(wait) + 1)
+
+    def record(self, status: int):
+        with self.lock:
+            self.requests.append((time.monotonic(), status))
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                return True
+        return random.random() < self.fail_rate
+
+    def admit(self) -> float:
+        """Return 0 if the request fits the rate limit, else seconds to wait."""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= self.window:
+                self.window_start, self.window_count = now, 0
+            if self.per_minute and self.window_count >= self.per_minute:
+                return self.window - (now - self.window_start)
+            self.window_count += 1
+            return 0
+
+
+def make_handler(kit: MockKit):
+    class Handler(BaseHTTPRequestHandler):
+        def reply(self, code: int, body: dict, headers: dict = None):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/v4/broadcasts"):
+                return self.reply(404, {"errors": ["Not Found"]})
+            if not self.headers.get("X-Kit-Api-Key"):
+                return self.reply(401, {"errors": ["API key missing"]})
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            wait = kit.admit()
+            if wait:
+                kit.record(429)
+                return self.reply(429, {"errors": ["Rate limit exceeded"]}, {"Retry-After": kit.retry_after(wait)})
+            if kit.should_fail():
+                kit.record(503)
+                return self.reply(503, {"errors": ["Service unavailable"]})
+            kit.record(201)
+            with kit.lock:
+                kit.broadcasts.append(payload)
+                broadcast_id = len(kit.broadcasts)
+            self.reply(201, {"broadcast": {"id": broadcast_id, "subject": payload.get("subject")}})
+
+        def do_GET(self):
+            with kit.lock:
+                self.reply(200, {"count": len(kit.broadcasts), "subjects": [b.get("subject") for b in kit.broadcasts]})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--per-minute", type=int, default=0, help="answer 429 beyond this many requests per minute")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--fail-first", type=int, default=0, help="answer the first N requests with 503")
+    parser.add_argument("--http-date", action="store_true", help="send Retry-After as an HTTP-date instead of seconds")
+    args = parser.parse_args()
+
+    kit = MockKit(args.per_minute, args.fail_rate, args.fail_first, args.http_date)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(kit))
+    print(f"Mock Kit listening on http://{args.host}:{args.port}/v4/broadcasts (GET / lists received broadcasts)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()